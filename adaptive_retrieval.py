@@ -0,0 +1,278 @@
+"""
+Adaptive retrieval: fetch questions a few at a time until their clues stop adding
+anything new.
+
+A fixed n over-fetches for well-covered answerlines (the 15th question on Einstein
+repeats the first ten) and under-fetches for rare ones. get_questions_adaptive_async()
+pages through each set's tossups and bonuses `step` questions at a time and, after each
+batch, measures its novelty: the share of the batch's clue terms (content words and
+word pairs from the first sentences, minus stopwords and the query's own words) not
+seen in any earlier batch. Retrieval stops when
+
+    saturated       novelty stayed below `min_novelty` for `patience` batches in a row
+                    (checked once at least `min_questions` are in hand)
+    max_questions   the question budget is reached
+    token_budget    the next question would push the estimated prompt size past
+                    `max_prompt_tokens`
+    exhausted       no set has unread matches left
+    deadline        the Deadline passed (the result is marked partial)
+
+    result = get_questions_adaptive("einstein", ["2019 ACF Regionals"], difficulty=[6, 7])
+    result.questions, result.first_sentences, result.stop_reason, result.novelty
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Union, TYPE_CHECKING
+
+from clue_ranker import STOPWORDS, _plain
+from deadline import DEFAULT_HEDGE_AFTER, Deadline
+from extract_and_filter import (
+    DEFAULT_PROMPT_TOKEN_BUDGET,
+    _build_common_params,
+    _fetch_query_page_async,
+    _normalize_page,
+    _question_array,
+    _request_timeout,
+    _with_deadline,
+    first_n_sentences,
+    get_default_client,
+)
+from prompt_builder import _RE_WORD, question_tokens
+from question_record import QuestionRecord
+
+if TYPE_CHECKING:
+    from qbreader_client import QBReaderClient
+    from question_mirror import QuestionMirror
+
+DEFAULT_STEP = 5
+DEFAULT_MIN_QUESTIONS = 10
+DEFAULT_MAX_QUESTIONS = 60
+DEFAULT_MIN_NOVELTY = 0.2
+DEFAULT_PATIENCE = 2
+
+
+@dataclass
+class AdaptiveResult:
+    questions: List[QuestionRecord]
+    first_sentences: List[str]
+    stop_reason: str
+    novelty: List[float] = field(default_factory=list)  # one entry per batch
+    requests: int = 0
+    prompt_tokens: int = 0
+    skipped: List[Dict[str, Any]] = field(default_factory=list)  # pages given up at the deadline
+
+    @property
+    def partial(self) -> bool:
+        return self.stop_reason == "deadline" or bool(self.skipped)
+
+
+def clue_terms(text: str, query_words: FrozenSet[str] = frozenset()) -> Set[str]:
+    """Content words and adjacent content-word pairs of `text` (HTML allowed)."""
+    words = [w for w in _RE_WORD.findall(_plain(text)) if w not in query_words]
+    content = [w if w not in STOPWORDS and not w.isdigit() else None for w in words]
+    terms = {w for w in content if w}
+    terms.update(f"{a} {b}" for a, b in zip(content, content[1:]) if a and b)
+    return terms
+
+
+class _Stream:
+    """One set's tossups or bonuses, read a page at a time."""
+
+    def __init__(self, params: Dict[str, Any], is_tossup: bool):
+        self.params = params
+        self.key = "tossups" if is_tossup else "bonuses"
+        self.page_param = "tossupPagination" if is_tossup else "bonusPagination"
+        self.next_page = 1
+        self.count: Optional[int] = None
+        self.buffer: List[QuestionRecord] = []
+
+    @property
+    def exhausted(self) -> bool:
+        page_size = int(self.params["maxReturnLength"])
+        return self.count is not None and page_size * (self.next_page - 1) >= self.count
+
+    async def fill(self, fetch_page, query: str, raw_mode: str) -> None:
+        params = dict(self.params)
+        if self.next_page > 1:
+            params[self.page_param] = self.next_page
+        data = await fetch_page(params)
+        self.next_page += 1
+        batch = _question_array(data, self.key)
+        obj = data.get(self.key, {})
+        if isinstance(obj, dict) and "count" in obj:
+            self.count = int(obj["count"])
+        if not batch or self.count is None:
+            # no total reported: assume more only while pages come back full
+            page_size = int(self.params["maxReturnLength"])
+            self.count = page_size * (self.next_page - 2) + len(batch) + (1 if len(batch) == page_size else 0)
+        self.buffer.extend(_normalize_page({self.key: {"questionArray": batch}}, self.params, query, raw_mode))
+
+
+class _StreamPool:
+    """Round-robin over the streams, fetching a stream's next page only when it runs dry."""
+
+    def __init__(self, streams: List[_Stream], fetch_page, query: str, raw_mode: str):
+        self.streams = streams
+        self.fetch_page = fetch_page
+        self.query = query
+        self.raw_mode = raw_mode
+        self.cursor = 0
+        self.requests = 0
+
+    async def take(self, k: int) -> List[QuestionRecord]:
+        out: List[QuestionRecord] = []
+        while len(out) < k:
+            live = [s for s in self.streams if s.buffer or not s.exhausted]
+            if not live:
+                break
+            need = k - len(out)
+            picks = [live[(self.cursor + i) % len(live)] for i in range(need)]
+            dry = [s for s in dict.fromkeys(picks) if not s.buffer and not s.exhausted]
+            if dry:
+                self.requests += len(dry)
+                await asyncio.gather(*(s.fill(self.fetch_page, self.query, self.raw_mode) for s in dry))
+            taken = 0
+            for s in picks:
+                self.cursor += 1
+                if s.buffer:
+                    out.append(s.buffer.pop(0))
+                    taken += 1
+            if not taken and not dry:
+                break
+        return out
+
+
+async def get_questions_adaptive_async(
+    query: str,
+    set_list: Optional[List[str]],
+    base_url: str = "https://www.qbreader.org/api",
+    *,
+    case_sensitive: bool = False,
+    exact_phrase: bool = False,
+    difficulty: Optional[Union[int, str, List[Union[int, str]]]] = None,
+    category: Optional[Union[str, List[str]]] = None,
+    step: int = DEFAULT_STEP,
+    min_questions: int = DEFAULT_MIN_QUESTIONS,
+    max_questions: int = DEFAULT_MAX_QUESTIONS,
+    max_prompt_tokens: Optional[int] = DEFAULT_PROMPT_TOKEN_BUDGET,
+    min_novelty: float = DEFAULT_MIN_NOVELTY,
+    patience: int = DEFAULT_PATIENCE,
+    sentences: int = 2,
+    request_timeout: int = 15,
+    max_concurrency: int = 8,
+    client: Optional["QBReaderClient"] = None,
+    mirror: Optional["QuestionMirror"] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    dedupe_threshold: Optional[float] = None,
+    raw_mode: str = "full",
+    deadline: Optional[Deadline] = None,
+    hedge_after: float = DEFAULT_HEDGE_AFTER,
+) -> AdaptiveResult:
+    """
+    Retrieve questions in batches of `step` until clue novelty levels off or a budget is
+    hit (see the module docstring). Filters, client, mirror, dedupe_threshold and
+    raw_mode mean the same as for get_top_n_questions_async.
+
+    Each set contributes a tossup and a bonus stream, read round-robin so a batch
+    spreads over the sets. A stream fetches a page of `step` questions when it runs dry
+    and hands them out one per pass, so when retrieval stops up to `step` - 1 fetched
+    questions per stream may go unused; that buys one request per stream per `step`
+    questions instead of one per question. The prompt-token estimate is
+    prompt_builder.question_tokens, i.e. the same accounting build_prompt_sections
+    applies to the prompt extract_larger_trends sends.
+
+    With `deadline`, slow pages are hedged and then skipped as in
+    get_top_n_questions_async, and no batch is started after it passes.
+    """
+    if not set_list:
+        set_list = ["undefined"]
+    step = max(1, step)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    dedupe = None
+    if dedupe_threshold is not None:
+        from near_duplicates import NearDuplicateIndex
+        dedupe = NearDuplicateIndex(dedupe_threshold)
+
+    async def _fetch_page(params: Dict[str, Any]) -> Dict[str, Any]:
+        if mirror is not None:
+            return await mirror.query_async(params)
+        async with semaphore:
+            timeout = _request_timeout(request_timeout, deadline)
+            return await _fetch_query_page_async(base_url, params, timeout=timeout, client=client)
+
+    skipped: List[Dict[str, Any]] = []
+    _fetch_one = _with_deadline(_fetch_page, deadline, hedge_after, skipped)
+
+    streams: List[_Stream] = []
+    for set_name in set_list:
+        common = _build_common_params(query, set_name, case_sensitive, exact_phrase, difficulty, category)
+        for question_type in ("tossup", "bonus"):
+            params = dict(common, questionType=question_type, maxReturnLength=step)
+            streams.append(_Stream(params, question_type == "tossup"))
+    pool = _StreamPool(streams, _fetch_one, query, raw_mode)
+
+    query_words = frozenset(_RE_WORD.findall(query.lower()))
+    seen_terms: Set[str] = set()
+    questions: List[QuestionRecord] = []
+    firsts: List[str] = []
+    novelty: List[float] = []
+    tokens = 0
+    flat = 0
+    reason = "exhausted"
+
+    while True:
+        want = min(step, max_questions - len(questions))
+        if want <= 0:
+            reason = "max_questions"
+            break
+        if deadline is not None and deadline.expired:
+            reason = "deadline"
+            break
+        batch = await pool.take(want)
+        if not batch:
+            if skipped:
+                reason = "deadline"
+            break
+        batch_terms: Set[str] = set()
+        over_budget = False
+        for question in batch:
+            text = question["question"] or ""
+            if dedupe is not None and dedupe.add(question["id"] or id(question), text) is not None:
+                continue
+            first = first_n_sentences(text, n=sentences)
+            cost = question_tokens(text, first, len(questions))
+            if max_prompt_tokens is not None and questions and tokens + cost > max_prompt_tokens:
+                over_budget = True
+                break
+            tokens += cost
+            questions.append(question)
+            firsts.append(first)
+            batch_terms |= clue_terms(first, query_words)
+        if batch_terms:
+            novelty.append(len(batch_terms - seen_terms) / len(batch_terms))
+            seen_terms |= batch_terms
+            flat = flat + 1 if novelty[-1] < min_novelty else 0
+        if over_budget:
+            reason = "token_budget"
+            break
+        if len(questions) >= min_questions and flat >= patience:
+            reason = "saturated"
+            break
+
+    return AdaptiveResult(questions, firsts, reason, novelty, pool.requests, tokens, skipped)
+
+
+def get_questions_adaptive(
+    query: str,
+    set_list: Optional[List[str]],
+    base_url: str = "https://www.qbreader.org/api",
+    *,
+    client: Optional["QBReaderClient"] = None,
+    **kwargs: Any,
+) -> AdaptiveResult:
+    """Synchronous wrapper around get_questions_adaptive_async (same keyword arguments)."""
+    client = client or get_default_client()
+    return client.run(get_questions_adaptive_async(query, set_list, base_url, client=client, **kwargs))
@@ -0,0 +1,357 @@
+"""
+Non-interactive batch runner: many answerlines through retrieval + trend extraction.
+
+Input is JSONL (one object per line) or CSV (header row) with these fields:
+    query           answerline to search for (required)
+    id              optional; defaults to a hash of the other fields
+    sets            list, or ";"-separated string of set names (empty = all sets); with
+                    --resolve-sets, entries that aren't exact names are searched for
+                    ("2019 regionals") and replaced by the best match if it scores at
+                    least --resolve-min-score (else the job errors); every substitution
+                    is printed and kept in the record's "set_substitutions"
+    difficulties    list, or ","/";"-separated difficulty keys
+    categories      list, or ","/";"-separated category names
+    exact_phrase    true/false (default false)
+    n               questions to retrieve (default: --n; with --adaptive, the most to retrieve)
+
+Usage:
+    python batch_mode.py queries.jsonl -o results.jsonl [--qb-concurrency 8] [--gemini-concurrency 2]
+
+QBReader requests and Gemini calls run under separate limits, at most --qb-concurrency
+queries are retrieving at once (a query waiting on Gemini doesn't count), each finished
+query is appended to the output JSONL immediately, and queries already in the output
+with status "ok" are skipped, so an interrupted run can just be started again. A retried query appends a new line; when an
+id has several lines the last one wins, and at the end of each run the file is
+compacted to that one line per id.
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import metrics
+from adaptive_retrieval import get_questions_adaptive_async
+from deadline import Deadline, is_partial
+from extract_and_filter import (
+    extract_larger_trends,
+    first_n_sentences,
+    get_gemini_client,
+    get_top_n_questions_async,
+    parse_gemini_response,
+)
+from qbreader_client import DEFAULT_BASE_URL, get_default_client
+from set_index import SetNameIndex, get_set_index
+from set_list_snapshot import get_set_list_snapshot
+
+DEFAULT_N = 20
+
+# --resolve-sets: lowest search score a non-exact set entry may be replaced at. Matches
+# containing every word score >= 1; trigram (typo) matches score below 1
+RESOLVE_MIN_SCORE = 0.6
+
+
+def _split_field(value: Any, seps: str = ",;") -> Optional[List[str]]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (list, tuple)):
+        items = [str(v).strip() for v in value]
+    else:
+        text = str(value)
+        for sep in seps[1:]:
+            text = text.replace(sep, seps[0])
+        items = [p.strip() for p in text.split(seps[0])]
+    items = [i for i in items if i]
+    return items or None
+
+
+def _truthy(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y")
+    return bool(value)
+
+
+def normalize_job(raw: Dict[str, Any], default_n: int = DEFAULT_N) -> Dict[str, Any]:
+    """Clean one input row into a job dict with a stable id."""
+    query = str(raw.get("query") or "").strip()
+    if not query:
+        raise ValueError(f"row has no query: {raw!r}")
+    job = {
+        "query": query,
+        # set names can contain commas, so only ";" separates them in a string
+        "sets": _split_field(raw.get("sets"), ";"),
+        "difficulties": _split_field(raw.get("difficulties")),
+        "categories": _split_field(raw.get("categories")),
+        "exact_phrase": _truthy(raw.get("exact_phrase", False)),
+        "n": int(raw.get("n") or default_n),
+    }
+    job_id = str(raw.get("id") or "").strip()
+    if not job_id:
+        blob = json.dumps(job, sort_keys=True)
+        job_id = hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+    job["id"] = job_id
+    return job
+
+
+def load_jobs(path: Path, default_n: int = DEFAULT_N) -> List[Dict[str, Any]]:
+    """Read jobs from a .jsonl or .csv file."""
+    rows: List[Dict[str, Any]] = []
+    with path.open(encoding="utf-8", newline="") as f:
+        if path.suffix.lower() == ".csv":
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    return [normalize_job(r, default_n) for r in rows]
+
+
+def _latest_records(output: Path) -> Dict[str, Dict[str, Any]]:
+    """{id: last record written for it} in order of first appearance."""
+    latest: Dict[str, Dict[str, Any]] = {}
+    if not output.exists():
+        return latest
+    with output.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a half-written last line from an interrupted run
+            latest[str(rec.get("id"))] = rec
+    return latest
+
+
+def finished_ids(output: Path) -> Set[str]:
+    """Ids whose latest line in `output` has status "ok" (the checkpoint)."""
+    return {job_id for job_id, rec in _latest_records(output).items() if rec.get("status") == "ok"}
+
+
+def compact_output(output: Path) -> int:
+    """Rewrite `output` with only the last line per id; returns how many lines were dropped."""
+    if not output.exists():
+        return 0
+    with output.open(encoding="utf-8") as f:
+        lines = sum(1 for line in f if line.strip())
+    latest = _latest_records(output)
+    if lines == len(latest):
+        return 0
+    tmp = output.with_name(output.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        for rec in latest.values():
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    os.replace(tmp, output)
+    return lines - len(latest)
+
+
+def resolve_sets(
+    set_index: SetNameIndex, terms: List[str], min_score: float = RESOLVE_MIN_SCORE
+) -> Tuple[List[str], Dict[str, str]]:
+    """
+    (set names, {term: name} for every term that wasn't an exact name) for one job.
+    Raises ValueError for terms with no match scoring at least `min_score`.
+    """
+    names: List[str] = []
+    substitutions: Dict[str, str] = {}
+    unresolved: List[str] = []
+    for term in terms:
+        if term in set_index.exact:
+            names.append(term)
+            continue
+        best = set_index.search(term, limit=1)
+        if not best or best[0].score < min_score:
+            unresolved.append(f"{term!r}" + (f" (best: {best[0].name!r}, score {best[0].score:.2f})" if best else ""))
+            continue
+        names.append(best[0].name)
+        substitutions[term] = best[0].name
+    if unresolved:
+        raise ValueError(f"no set matches {', '.join(unresolved)} well enough")
+    return list(dict.fromkeys(names)), substitutions
+
+
+async def run_batch(
+    jobs: List[Dict[str, Any]],
+    output: Path,
+    *,
+    base_url: str = DEFAULT_BASE_URL,
+    qb_concurrency: int = 8,
+    gemini_concurrency: int = 2,
+    use_llm: bool = True,
+    dedupe_threshold: Optional[float] = 0.8,
+    set_index: Optional[SetNameIndex] = None,
+    resolve_min_score: float = RESOLVE_MIN_SCORE,
+    adaptive: bool = False,
+    deadline: Optional[float] = None,
+) -> Dict[str, int]:
+    """
+    Run every job not already finished in `output`, appending one JSON line per job,
+    with at most `qb_concurrency` jobs retrieving at once (a job gives up its slot
+    before its Gemini call, so slow replies don't hold up retrieval for the next jobs);
+    the file is compacted to the last line per id afterwards. With `set_index`, each job's set entries are
+    resolved against it first (see resolve_sets). With `adaptive`, each job's n is only
+    an upper bound: questions are fetched until their clues stop adding new vocabulary
+    (see adaptive_retrieval). With `deadline` (seconds), each job gets that long from
+    its start (jobs waiting for a slot don't spend their budget); a job cut short is
+    written with status "partial" and, like errors, retried on the next run.
+
+    Returns:
+        {"skipped": .., "ok": .., "partial": .., "error": ..}
+    """
+    done = finished_ids(output)
+    pending = [j for j in jobs if j["id"] not in done]
+    counts = {"skipped": len(jobs) - len(pending), "ok": 0, "partial": 0, "error": 0}
+    if not pending:
+        return counts
+
+    qb_semaphore = asyncio.Semaphore(max(1, qb_concurrency))
+    gemini_semaphore = asyncio.Semaphore(max(1, gemini_concurrency))
+    job_slots = asyncio.Semaphore(max(1, qb_concurrency))
+    write_lock = asyncio.Lock()
+    gemini_client = get_gemini_client() if use_llm else None
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("a", encoding="utf-8") as out:
+
+        async def _write(rec: Dict[str, Any]) -> None:
+            async with write_lock:
+                out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                out.flush()
+
+        async def _run(job: Dict[str, Any]) -> None:
+            rec: Dict[str, Any] = {"id": job["id"], "query": job["query"]}
+            try:
+                async with job_slots:
+                    questions, unfiltered, filtered, partial, job_deadline = await _retrieve(job, rec)
+                rec["questions"] = len(questions)
+                if use_llm and questions:
+                    async with gemini_semaphore:
+                        reply = await asyncio.to_thread(
+                            extract_larger_trends,
+                            job["query"],
+                            unfiltered,
+                            filtered,
+                            gemini_client,
+                            on_field=lambda name, value: None,
+                            deadline=job_deadline,
+                        )
+                    if reply is not None:
+                        rec["trends"] = parse_gemini_response(reply.text)
+                        rec["cache_hit"] = reply.cache_hit
+                        partial = partial or reply.partial
+                else:
+                    rec["first_sentences"] = filtered
+                rec["status"] = "partial" if partial else "ok"
+                counts[rec["status"]] += 1
+            except Exception as exc:  # keep going; errored jobs are retried on the next run
+                rec["status"] = "error"
+                rec["error"] = f"{type(exc).__name__}: {exc}"
+                counts["error"] += 1
+            await _write(rec)
+            print(f"[{counts['ok'] + counts['partial'] + counts['error']}/{len(pending)}] {job['query']}: {rec['status']}")
+
+        async def _retrieve(job: Dict[str, Any], rec: Dict[str, Any]):
+            """(questions, unfiltered, filtered, partial, deadline); runs while holding a job slot."""
+            job_deadline = Deadline(deadline) if deadline is not None else None
+            sets = job["sets"]
+            if sets and set_index is not None:
+                sets, substitutions = resolve_sets(set_index, sets, resolve_min_score)
+                rec["sets"] = sets
+                if substitutions:
+                    rec["set_substitutions"] = substitutions
+                    for term, name in substitutions.items():
+                        print(f"  {job['id']}: set {term!r} -> {name!r}")
+            if adaptive:
+                result = await get_questions_adaptive_async(
+                    job["query"],
+                    sets,
+                    base_url,
+                    exact_phrase=job["exact_phrase"],
+                    difficulty=job["difficulties"],
+                    category=job["categories"],
+                    max_questions=job["n"],
+                    semaphore=qb_semaphore,
+                    dedupe_threshold=dedupe_threshold,
+                    raw_mode="none",
+                    deadline=job_deadline,
+                )
+                questions, filtered = result.questions, result.first_sentences
+                unfiltered = [q.get("question") for q in questions]
+                rec["stop_reason"] = result.stop_reason
+                partial = result.partial
+            else:
+                questions = await get_top_n_questions_async(
+                    job["query"],
+                    sets,
+                    job["n"],
+                    base_url,
+                    exact_phrase=job["exact_phrase"],
+                    difficulty=job["difficulties"],
+                    category=job["categories"],
+                    semaphore=qb_semaphore,
+                    dedupe_threshold=dedupe_threshold,
+                    raw_mode="none",
+                    deadline=job_deadline,
+                )
+                partial = is_partial(questions)
+                unfiltered = [q.get("question") for q in questions]
+                filtered = [first_n_sentences(q, n=2) for q in unfiltered]
+            return questions, unfiltered, filtered, partial, job_deadline
+
+        try:
+            await asyncio.gather(*(_run(j) for j in pending))
+        finally:
+            await get_default_client().aclose()
+    compact_output(output)
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run many answerlines through the pipeline.")
+    parser.add_argument("input", type=Path, help="queries as .jsonl or .csv")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="results .jsonl (also the checkpoint)")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("-n", type=int, default=DEFAULT_N, help="questions per query if the row doesn't say")
+    parser.add_argument("--qb-concurrency", type=int, default=8, help="max QBReader requests in flight")
+    parser.add_argument("--gemini-concurrency", type=int, default=2, help="max Gemini calls in flight")
+    parser.add_argument("--dedupe-threshold", type=float, default=0.8,
+                        help="drop near-duplicate questions at this similarity (0 = keep all)")
+    parser.add_argument("--resolve-sets", action="store_true",
+                        help="match set entries that aren't exact names against the set list")
+    parser.add_argument("--resolve-min-score", type=float, default=RESOLVE_MIN_SCORE,
+                        help="fail a job whose set entry has no match scoring at least this "
+                             "(>= 1: every word matched; below 1: typo-tolerant match)")
+    parser.add_argument("--no-llm", action="store_true", help="retrieval + sentence extraction only")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="stop retrieving once new questions stop adding new clues (n becomes a cap)")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="seconds each query may take before a partial result is written")
+    parser.add_argument("--metrics", type=Path, default=None, metavar="METRICS.jsonl",
+                        help="append a JSON line per pipeline stage, then the run's totals, to this file")
+    args = parser.parse_args(argv)
+    if args.metrics is not None:
+        metrics.enable(args.metrics)
+
+    jobs = load_jobs(args.input, args.n)
+    index = get_set_index(get_set_list_snapshot(args.base_url)) if args.resolve_sets else None
+    counts = asyncio.run(run_batch(
+        jobs,
+        args.output,
+        base_url=args.base_url,
+        qb_concurrency=args.qb_concurrency,
+        gemini_concurrency=args.gemini_concurrency,
+        use_llm=not args.no_llm,
+        dedupe_threshold=args.dedupe_threshold or None,
+        set_index=index,
+        resolve_min_score=args.resolve_min_score,
+        adaptive=args.adaptive,
+        deadline=args.deadline,
+    ))
+    if args.metrics is not None:
+        metrics.write_jsonl(args.metrics)
+    print(f"Done: {counts['ok']} ok, {counts['partial']} partial, {counts['error']} failed, "
+          f"{counts['skipped']} already finished")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Corpus-scale text preprocessing on all cores.
+
+preprocess_questions() runs _strip_html + first_n_sentences over many question texts
+with a process pool, sending work in sized chunks and returning results in input order.
+Small inputs skip the pool entirely, since spinning up workers costs more than it saves.
+"""
+
+import math
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from extract_and_filter import _strip_html, first_n_sentences
+
+# below this many questions the serial path wins (pool start-up is ~100ms+ per worker)
+MIN_PARALLEL_QUESTIONS = 2000
+
+
+def _preprocess_chunk(args: Tuple[Sequence[Optional[str]], int]) -> List[Tuple[str, str]]:
+    """Worker entry point: (clean text, first n sentences) for each text in the chunk."""
+    texts, n = args
+    return [(_strip_html(t or ""), first_n_sentences(t or "", n)) for t in texts]
+
+
+def _default_chunk_size(total: int, workers: int) -> int:
+    # ~4 chunks per worker keeps the pool balanced without drowning in pickling overhead
+    return max(256, min(5000, math.ceil(total / (workers * 4))))
+
+
+def preprocess_questions(
+    html_texts: Sequence[Optional[str]],
+    n: int = 2,
+    *,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    min_parallel: int = MIN_PARALLEL_QUESTIONS,
+    executor: Optional[Executor] = None,
+) -> List[Tuple[str, str]]:
+    """
+    Strip HTML and pull the first `n` sentences from every text.
+
+    Parameters:
+        html_texts: question texts (HTML allowed; None treated as "").
+        workers: pool size (default: os.cpu_count()); ignored when `executor` is given.
+        chunk_size: texts per task sent to a worker (default: sized from the input).
+        min_parallel: inputs shorter than this are processed in-process.
+        executor: reuse an existing pool (e.g. across nightly job steps).
+
+    Returns:
+        List of (clean_text, first_sentences) tuples, in the same order as `html_texts`.
+    """
+    texts = list(html_texts)
+    workers = workers or os.cpu_count() or 1
+    if len(texts) < min_parallel or (executor is None and workers <= 1):
+        return _preprocess_chunk((texts, n))
+
+    size = chunk_size or _default_chunk_size(len(texts), workers)
+    chunks = [(texts[i:i + size], n) for i in range(0, len(texts), size)]
+
+    results: List[Tuple[str, str]] = []
+    if executor is not None:
+        for part in executor.map(_preprocess_chunk, chunks):
+            results.extend(part)
+        return results
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map yields in submission order, so output lines up with input
+        for part in pool.map(_preprocess_chunk, chunks):
+            results.extend(part)
+    return results
@@ -0,0 +1,186 @@
+"""
+Benchmark: the whole pipeline (set list -> get_top_n_questions -> first_n_sentences ->
+extract_larger_trends) against local stand-ins for QBReader and Gemini (stand_ins.py).
+
+Run from the repo root:
+    python benchmarks/bench_pipeline.py [--sets 1,5,20] [--n 20,60] [--runs 20]
+        [--latency-ms 30] [--jitter-ms 20] [--error-rate 0.02] [--page-size 100]
+        [--gemini-first-ms 300] [--gemini-chunk-ms 40]
+        [--out results.jsonl] [--baseline old.jsonl --max-regression 0.2]
+
+Prints one JSON object for the settings, then one per (set count, n) with queries/sec,
+p50/p99 latency (end to end and per stage), mean questions returned, stub requests and
+injected errors per query, and peak traced memory. Timing runs are untraced; peak
+memory comes from one extra run under tracemalloc. The response and trend caches are
+off, so every run does the full network and Gemini work.
+
+With --baseline (a previous --out file), each case's end-to-end p50 is compared with the
+baseline's and the exit status is 1 if any got worse by more than --max-regression.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from extract_and_filter import extract_larger_trends, first_n_sentences, get_set_list, get_top_n_questions  # noqa: E402
+from qbreader_client import QBReaderClient  # noqa: E402
+from stand_ins import FakeGenai, StubQBReader  # noqa: E402
+
+STAGES = ("retrieve", "sentences", "trends")
+
+
+def _ints(text: str) -> List[int]:
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile (no interpolation), so small samples give an observed value."""
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), math.ceil(pct / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def run_query(sets: List[str], n: int, base_url: str, client: QBReaderClient, genai: FakeGenai) -> Dict[str, float]:
+    """One end-to-end query; returns seconds per stage plus the question count."""
+    with contextlib.redirect_stdout(io.StringIO()):  # the pipeline's progress prints
+        t0 = time.perf_counter()
+        questions = get_top_n_questions("stub answer", sets, n, base_url, client=client, raw_mode="none")
+        t1 = time.perf_counter()
+        unfiltered = [q["question"] for q in questions]
+        filtered = [first_n_sentences(text, n=2) for text in unfiltered]
+        t2 = time.perf_counter()
+        if questions:
+            extract_larger_trends("stub answer", unfiltered, filtered, genai,
+                                  use_cache=False, on_field=lambda name, value: None)
+        t3 = time.perf_counter()
+    return {"retrieve": t1 - t0, "sentences": t2 - t1, "trends": t3 - t2, "total": t3 - t0,
+            "questions": len(questions)}
+
+
+def bench_case(stub: StubQBReader, set_count: int, n: int, args: argparse.Namespace) -> Dict:
+    sets = stub.set_names[:set_count]
+    # no response cache and no rate limit: measure the pipeline, not the throttle
+    client = QBReaderClient(rate=10_000, burst=10_000, backoff_base=0.01, backoff_max=0.05, cache=None)
+    genai = FakeGenai(first_chunk_ms=args.gemini_first_ms, chunk_ms=args.gemini_chunk_ms)
+
+    run_query(sets, n, stub.base_url, client, genai)  # warm-up (imports, connection pool)
+    requests_before, errors_before = stub.requests, stub.errors
+    samples = []
+    wall = time.perf_counter()
+    for _ in range(args.runs):
+        samples.append(run_query(sets, n, stub.base_url, client, genai))
+    wall = time.perf_counter() - wall
+    requests = stub.requests - requests_before
+    errors = stub.errors - errors_before
+
+    tracemalloc.start()
+    run_query(sets, n, stub.base_url, client, genai)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    client.close()
+
+    totals = [s["total"] for s in samples]
+    return {
+        "sets": set_count,
+        "n": n,
+        "runs": args.runs,
+        "queries_per_sec": round(args.runs / wall, 2),
+        "latency_ms": {"p50": round(percentile(totals, 50) * 1000, 1), "p99": round(percentile(totals, 99) * 1000, 1)},
+        "stages_ms": {
+            stage: {
+                "p50": round(percentile([s[stage] for s in samples], 50) * 1000, 2),
+                "p99": round(percentile([s[stage] for s in samples], 99) * 1000, 2),
+            }
+            for stage in STAGES
+        },
+        "questions_mean": round(sum(s["questions"] for s in samples) / len(samples), 1),
+        "stub_requests_per_query": round(requests / args.runs, 1),
+        "injected_errors_per_query": round(errors / args.runs, 2),
+        "peak_traced_mb": round(peak / 2**20, 2),
+    }
+
+
+def _load_baseline(path: Path) -> Dict[tuple, Dict]:
+    cases = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        rec = json.loads(line)
+        if "sets" in rec and "n" in rec and "latency_ms" in rec:
+            cases[(rec["sets"], rec["n"])] = rec
+    return cases
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sets", type=_ints, default=[1, 5, 20], help="comma-separated set counts")
+    parser.add_argument("--n", type=_ints, default=[20, 60], help="comma-separated question counts")
+    parser.add_argument("--runs", type=int, default=20, help="timed queries per case")
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of /query calls answered 429/503")
+    parser.add_argument("--page-size", type=int, default=100, help="stub's maxReturnLength cap")
+    parser.add_argument("--matches-per-set", type=int, default=40)
+    parser.add_argument("--gemini-first-ms", type=float, default=300.0)
+    parser.add_argument("--gemini-chunk-ms", type=float, default=40.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", type=Path, default=None, help="also write the JSON lines here")
+    parser.add_argument("--baseline", type=Path, default=None, help="earlier --out file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p50 slowdown vs. baseline")
+    args = parser.parse_args()
+
+    lines = []
+
+    def emit(rec: Dict) -> None:
+        lines.append(rec)
+        print(json.dumps(rec), flush=True)
+
+    emit({
+        "bench": "pipeline",
+        "python": platform.python_version(),
+        "settings": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+    })
+    baseline = _load_baseline(args.baseline) if args.baseline else {}
+    regressions = []
+
+    with StubQBReader(
+        sets=max(args.sets),
+        matches_per_set=args.matches_per_set,
+        page_size=args.page_size,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    ) as stub:
+        with contextlib.redirect_stdout(io.StringIO()):
+            get_set_list(stub.base_url, client=QBReaderClient(cache=None))
+        for set_count in args.sets:
+            for n in args.n:
+                rec = bench_case(stub, set_count, n, args)
+                old: Optional[Dict] = baseline.get((set_count, n))
+                if old is not None:
+                    change = rec["latency_ms"]["p50"] / max(old["latency_ms"]["p50"], 1e-9) - 1
+                    rec["p50_change_vs_baseline"] = round(change, 3)
+                    if change > args.max_regression:
+                        regressions.append((set_count, n))
+                emit(rec)
+
+    if args.out is not None:
+        args.out.write_text("".join(json.dumps(rec) + "\n" for rec in lines), encoding="utf-8")
+    if regressions:
+        print(json.dumps({"regressions": [{"sets": s, "n": n} for s, n in regressions],
+                          "max_regression": args.max_regression, "ok": False}))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
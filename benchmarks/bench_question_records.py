@@ -0,0 +1,169 @@
+"""
+Benchmark: memory held by normalized questions -- legacy dicts vs. QuestionRecord.
+
+Run from the repo root:  python benchmarks/bench_question_records.py [--questions 50000]
+
+Each case parses a synthetic /query-style JSON corpus, normalizes it, then drops the
+parsed pages (as a caller does once it has its results). Prints one JSON object per
+case with the memory still retained by the results, the peak while normalizing, and
+the normalization time.
+"""
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from extract_and_filter import _normalize_bonuses, _normalize_tossups  # noqa: E402
+
+# --- the previous dict-per-question normalization, for comparison ------------
+
+
+def legacy_normalize_tossups(tossup_array: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{
+        "type": "tossup",
+        "id": t.get("_id") or t.get("id"),
+        "answer": t.get("answer", t.get("answerline", "")),
+        "question": t.get("question", ""),
+        "setName": t.get("setName"),
+        "raw": t,
+    } for t in tossup_array]
+
+
+def legacy_normalize_bonuses(bonus_array: List[Dict[str, Any]], query: Optional[str] = None) -> List[Dict[str, Any]]:
+    out = []
+    q = (query or "").strip().lower()
+    for b in bonus_array:
+        raw_parts = b.get("parts") or b.get("questions")  # often a list
+        # If parts is a list, try to find the part whose answer contains the query
+        chosen_text = None
+        if isinstance(raw_parts, list) and raw_parts:
+            for part in raw_parts:
+                if isinstance(part, dict):
+                    part_answer = (part.get("answer") or part.get("answerline") or "").lower()
+                    part_text = part.get("question") or part.get("text") or ""
+                else:
+                    part_answer = ""
+                    part_text = str(part)
+                if q and q in part_answer:
+                    chosen_text = part_text
+                    break
+            # if no matching part, fall back to joining/first part
+            if chosen_text is None:
+                # if parts are dicts use their 'question' fields, otherwise join strings
+                if isinstance(raw_parts[0], dict):
+                    chosen_text = raw_parts[0].get("question") or raw_parts[0].get("text") or ""
+                else:
+                    chosen_text = " ".join(str(p) for p in raw_parts)
+        else:
+            # not a list — use text fields as before
+            chosen_text = b.get("text") or b.get("question") or ""
+
+        answer = b.get("answer", b.get("answerline", ""))
+        out.append({
+            "type": "bonus",
+            "id": b.get("_id") or b.get("id"),
+            "answer": answer,
+            "question": chosen_text,
+            "setName": b.get("setName"),
+            "raw": b,
+        })
+    return out
+
+
+# --- synthetic corpus (field layout follows QBReader /query results) ---------
+
+_WORDS = ("this physicist theory relativity paper photoelectric effect Nobel prize "
+          "equation mass energy light quantum Brownian motion annus mirabilis").split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)) + "."
+
+
+def make_corpus(count: int, seed: int = 0) -> str:
+    """JSON text of {"tossups": [...], "bonuses": [...]} with `count` questions total."""
+    rng = random.Random(seed)
+    sets = [f"{year} {name}" for year in range(2000, 2025) for name in ("ACF Regionals", "PACE NSC", "NASAT")]
+    tossups, bonuses = [], []
+    for i in range(count):
+        set_name = rng.choice(sets)
+        common = {
+            "_id": f"{i:024x}",
+            "category": "Science",
+            "subcategory": "Physics",
+            "difficulty": rng.randint(1, 10),
+            "number": rng.randint(1, 20),
+            "packet": {"_id": f"p{i % 500:023x}", "name": f"Packet {i % 20}", "number": i % 20},
+            "set": {"_id": f"s{i % 75:023x}", "name": set_name, "year": int(set_name[:4]), "standard": True},
+            "setName": set_name,
+            "createdAt": "2023-01-01T00:00:00.000Z",
+            "updatedAt": "2024-01-01T00:00:00.000Z",
+        }
+        if i % 2 == 0:
+            question = _text(rng, 110)
+            tossups.append(dict(common, question=question, question_sanitized=question,
+                                answer="<b><u>Albert Einstein</u></b>", answer_sanitized="Albert Einstein"))
+        else:
+            parts = [_text(rng, 30) for _ in range(3)]
+            answers = ["<b>Albert Einstein</b>", "<b>photon</b>", "<b>Bern</b>"]
+            bonuses.append(dict(common, leadin=_text(rng, 20), parts=parts, parts_sanitized=parts,
+                                answers=answers, answers_sanitized=answers, answer="Albert Einstein"))
+    return json.dumps({"tossups": tossups, "bonuses": bonuses})
+
+
+def _measure(name: str, corpus: str, normalize: Callable[[Dict[str, Any]], list]) -> Dict[str, Any]:
+    # timing runs untraced: tracemalloc slows allocation-heavy code (json.dumps) several-fold
+    pages = json.loads(corpus)
+    start = time.perf_counter()
+    normalize(pages)
+    seconds = time.perf_counter() - start
+    del pages
+
+    gc.collect()
+    tracemalloc.start()
+    pages = json.loads(corpus)
+    results = normalize(pages)
+    del pages
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(results)
+    del results
+    return {
+        "impl": name,
+        "questions": count,
+        "retained_mb": round(retained / 2**20, 2),
+        "retained_bytes_per_question": round(retained / count),
+        "peak_mb": round(peak / 2**20, 2),
+        "normalize_seconds": round(seconds, 4),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=50000)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.questions)
+    cases = [
+        ("legacy_dict", lambda p: legacy_normalize_tossups(p["tossups"]) + legacy_normalize_bonuses(p["bonuses"])),
+    ]
+    for mode in ("full", "lazy", "none"):
+        cases.append((
+            f"record_raw_{mode}",
+            lambda p, mode=mode: _normalize_tossups(p["tossups"], mode) + _normalize_bonuses(p["bonuses"], None, mode),
+        ))
+    for name, normalize in cases:
+        print(json.dumps(_measure(name, corpus, normalize)))
+
+
+if __name__ == "__main__":
+    main()
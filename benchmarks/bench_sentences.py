@@ -0,0 +1,118 @@
+"""
+Benchmark: single-pass sentence scanner vs. the old regex-based first_n_sentences.
+
+Run from the repo root:  python benchmarks/bench_sentences.py [--questions 5000] [--repeat 3]
+
+Prints one JSON object per (corpus, implementation) with total seconds and questions/sec,
+plus how often the two implementations disagree.
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from extract_and_filter import _strip_html, first_n_sentences  # noqa: E402
+
+# --- the previous implementation, kept verbatim for comparison ---------------
+
+_SENTENCE_RE = re.compile(r"""
+    (               # capture one sentence
+      .*?           # minimal text
+      [\.!?]        # sentence-ending punctuation
+    )
+    (?=             # only accept if followed by:
+      \s+["'(\[]?[A-Z0-9]   # whitespace then optional quote/parens then uppercase/digit (next sentence start)
+      |$            # or end of string
+    )
+""", re.VERBOSE | re.DOTALL)
+
+
+def legacy_first_n_sentences(html_text: str, n: int = 2) -> str:
+    s = _strip_html(html_text)
+    if not s:
+        return ""
+    sentences: List[str] = []
+    for m in _SENTENCE_RE.finditer(s):
+        sentences.append(m.group(1).strip())
+        if len(sentences) >= n:
+            break
+    if sentences:
+        return " ".join(sentences)
+    parts = re.split(r"\.\s+|\?\s+|!\s+", s)
+    if len(parts) <= n:
+        return s
+    return ". ".join(p.strip() for p in parts[:n]) + (". " if not s.endswith((".", "?", "!")) else "")
+
+
+# --- synthetic corpora -------------------------------------------------------
+
+_WORDS = ("this physicist theory relativity paper photoelectric effect Nobel prize "
+          "equation mass energy light quantum Brownian motion annus mirabilis").split()
+_ABBREV = ["St.", "Dr.", "U.S.", "Mr.", "e.g.", "J. S.", "Gen.", "Mt."]
+
+
+def _sentence(rng: random.Random, abbrev_rate: float) -> str:
+    words = []
+    for _ in range(rng.randint(8, 25)):
+        if rng.random() < abbrev_rate:
+            words.append(rng.choice(_ABBREV))
+        words.append(rng.choice(_WORDS))
+    words[0] = words[0].capitalize()
+    return " ".join(words) + rng.choice(".....?!")
+
+
+def make_corpus(kind: str, count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(count):
+        if kind == "typical":
+            sents = [_sentence(rng, 0.02) for _ in range(rng.randint(5, 8))]
+        elif kind == "abbreviation-heavy":
+            sents = [_sentence(rng, 0.25) for _ in range(rng.randint(6, 10))]
+        else:  # "long-unpunctuated": no boundary for a long stretch, lots of stray dots
+            sents = [" ".join(rng.choice(_WORDS) + rng.choice(["", ".", ""]) for _ in range(400))]
+        text = " ".join(sents)
+        out.append(f"<b>{text[:40]}</b>{text[40:]} (*) For 10 points, name this.")
+    return out
+
+
+def _time(fn: Callable[[str, int], str], corpus: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in corpus:
+            fn(text, 2)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for kind in ("typical", "abbreviation-heavy", "long-unpunctuated"):
+        corpus = make_corpus(kind, args.questions)
+        disagree = sum(first_n_sentences(t, 2) != legacy_first_n_sentences(t, 2) for t in corpus)
+        for name, fn in (("legacy_regex", legacy_first_n_sentences), ("scanner", first_n_sentences)):
+            seconds = _time(fn, corpus, args.repeat)
+            print(json.dumps({
+                "corpus": kind,
+                "impl": name,
+                "questions": len(corpus),
+                "seconds": round(seconds, 4),
+                "questions_per_sec": round(len(corpus) / seconds, 1),
+                "outputs_differ": disagree,
+            }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: CLI cold start -- time to import extract_and_filter and to have the set list
+ready for the first prompt (served from a warm local snapshot, no network).
+
+Run from the repo root:  python benchmarks/bench_startup.py [--runs 10] [--target-ms 150]
+
+Every run is a fresh interpreter. Prints one JSON object per measurement with the
+median/max milliseconds (interpreter start-up itself subtracted) and which heavy
+modules were already loaded, and exits non-zero if the median time to first prompt
+is over --target-ms.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ("google.genai", "requests", "aiohttp", "tenacity", "numpy")
+
+_FIRST_PROMPT = """
+import sys, time, json
+t0 = time.perf_counter()
+import extract_and_filter
+t1 = time.perf_counter()
+from set_list_snapshot import get_set_list_snapshot
+sets = get_set_list_snapshot("http://snapshot.invalid/api", path=sys.argv[1], refresh_after=float("inf"))
+t2 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "first_prompt_ms": (t2 - t0) * 1000,
+    "sets": len(sets),
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def _run(code: str, *args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-c", code, *args],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+
+
+def _summary(name: str, values: List[float], **extra) -> Dict:
+    return dict({
+        "measure": name,
+        "runs": len(values),
+        "median_ms": round(statistics.median(values), 1),
+        "max_ms": round(max(values), 1),
+    }, **extra)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--target-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = Path(tmp) / "set_list.json"
+        snapshot.write_text(json.dumps({
+            "base_url": "http://snapshot.invalid/api",
+            "fetched_at": time.time(),
+            "digest": "bench",
+            "sets": [f"{year} Set {i}" for year in range(1990, 2026) for i in range(60)],
+        }), encoding="utf-8")
+
+        bare, process, imports, prompts = [], [], [], []
+        loaded: List[str] = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            _run("pass")
+            bare.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            out = json.loads(_run(_FIRST_PROMPT, str(snapshot)).stdout)
+            process.append((time.perf_counter() - start) * 1000)
+            imports.append(out["import_ms"])
+            prompts.append(out["first_prompt_ms"])
+            loaded = out["loaded"]
+
+    interpreter = statistics.median(bare)
+    print(json.dumps(_summary("interpreter_startup", bare)))
+    print(json.dumps(_summary("import_extract_and_filter", imports, heavy_modules_loaded=loaded)))
+    print(json.dumps(_summary("first_prompt_in_process", prompts)))
+    print(json.dumps(_summary("first_prompt_wall_minus_interpreter", [p - interpreter for p in process])))
+
+    median_prompt = statistics.median(prompts)
+    if median_prompt > args.target_ms:
+        print(json.dumps({"target_ms": args.target_ms, "median_first_prompt_ms": round(median_prompt, 1),
+                          "ok": False}))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
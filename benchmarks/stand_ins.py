@@ -0,0 +1,220 @@
+"""
+Local stand-ins for the two network services, so the pipeline can be measured offline.
+
+StubQBReader   an aiohttp server answering /api/set-list and /api/query like QBReader
+               (set filter, tossup/bonus type, maxReturnLength capped at `page_size`,
+               tossupPagination/bonusPagination, match counts), with configurable
+               latency and injected 429/503 errors. Runs on its own thread:
+
+                   with StubQBReader(sets=50, latency_ms=40, error_rate=0.02) as qb:
+                       get_top_n_questions("einstein", qb.set_names[:5], 20, qb.base_url)
+
+FakeGenai      a drop-in for the genai client: client.models.generate_content_stream()
+               yields chunks with .text (a valid trend JSON reply) and, on the last one,
+               .usage_metadata, after a configurable first-token delay and per-chunk pace.
+
+Everything is seeded, so two runs with the same settings see the same questions,
+latencies and errors.
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+from aiohttp import web
+
+_WORDS = (
+    "theory field particle wave quantum relativity light speed mass energy clock frame "
+    "observer paradox photon electron lattice crystal entropy equation tensor curvature "
+    "orbit planet star nebula comet emperor dynasty treaty battle novel poem sonata "
+    "symphony painting cathedral river mountain island empire republic revolution"
+).split()
+
+
+def _question_text(rng: random.Random, sentences: int) -> str:
+    out = []
+    for i in range(sentences):
+        words = [rng.choice(_WORDS) for _ in range(rng.randint(10, 24))]
+        if i == 0:
+            words[0] = "<b>" + words[0].capitalize()
+            words[-1] += "</b>"
+        else:
+            words[0] = words[0].capitalize()
+        out.append(" ".join(words) + rng.choice((".", ".", ".", "!", "?")))
+    out.append("For 10 points, name this answer.")
+    return " ".join(out)
+
+
+class StubQBReader:
+    """
+    Parameters:
+        sets: number of set names served by /set-list.
+        matches_per_set: tossups (and bonuses) per set that match any query.
+        page_size: cap on maxReturnLength, like the real API.
+        latency_ms / jitter_ms: per-request delay, latency + uniform(0, jitter).
+        error_rate: share of /query requests answered 503 or 429 (Retry-After: 0).
+        seed: makes question text, latencies and errors reproducible.
+    """
+
+    def __init__(
+        self,
+        *,
+        sets: int = 50,
+        matches_per_set: int = 40,
+        page_size: int = 100,
+        latency_ms: float = 30.0,
+        jitter_ms: float = 20.0,
+        error_rate: float = 0.0,
+        seed: int = 1,
+    ):
+        self.set_names = [f"{2000 + i % 25} Stub Set {i}" for i in range(sets)]
+        self.matches_per_set = matches_per_set
+        self.page_size = page_size
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._seed = seed
+        self._corpus: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.base_url = ""
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # --- data ---
+
+    def _questions(self, set_name: str) -> Dict[str, List[Dict[str, Any]]]:
+        corpus = self._corpus.get(set_name)
+        if corpus is None:
+            rng = random.Random(f"{self._seed}:{set_name}")
+            tossups = [{
+                "_id": f"{set_name}/t{i}",
+                "setName": set_name,
+                "answer": "<b>Answer</b> [accept alternate]",
+                "question": _question_text(rng, rng.randint(4, 7)),
+            } for i in range(self.matches_per_set)]
+            bonuses = [{
+                "_id": f"{set_name}/b{i}",
+                "setName": set_name,
+                "leadin": "Answer these questions about a topic.",
+                "parts": [{"question": _question_text(rng, 2), "answer": f"part answer {j}"} for j in range(3)],
+            } for i in range(self.matches_per_set)]
+            corpus = self._corpus[set_name] = {"tossups": tossups, "bonuses": bonuses}
+        return corpus
+
+    # --- handlers ---
+
+    async def _delay(self) -> None:
+        await asyncio.sleep((self.latency_ms + self._rng.uniform(0, self.jitter_ms)) / 1000)
+
+    def _json(self, data: Any) -> web.Response:
+        body = json.dumps(data).encode("utf-8")
+        self.bytes_sent += len(body)
+        return web.Response(body=body, content_type="application/json")
+
+    async def _set_list(self, request: web.Request) -> web.Response:
+        await self._delay()
+        return self._json(self.set_names)
+
+    async def _query(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await self._delay()
+        if self._rng.random() < self.error_rate:
+            self.errors += 1
+            status = self._rng.choice((429, 503))
+            return web.Response(status=status, headers={"Retry-After": "0"})
+        q = request.query
+        size = min(int(q.get("maxReturnLength", 25)), self.page_size)
+        names = [q["setName"]] if q.get("setName") else self.set_names
+        qtype = q.get("questionType", "all")
+        out = {}
+        for key, kind, page_param in (("tossups", "tossup", "tossupPagination"),
+                                      ("bonuses", "bonus", "bonusPagination")):
+            if qtype not in ("all", kind):
+                out[key] = {"count": 0, "questionArray": []}
+                continue
+            matches = [item for name in names if name in self.set_names for item in self._questions(name)[key]]
+            page = max(1, int(q.get(page_param, 1)))
+            out[key] = {"count": len(matches), "questionArray": matches[(page - 1) * size:page * size]}
+        return self._json(out)
+
+    # --- lifecycle ---
+
+    def start(self) -> "StubQBReader":
+        started = threading.Event()
+
+        def _serve() -> None:
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            app = web.Application()
+            app.router.add_get("/api/set-list", self._set_list)
+            app.router.add_get("/api/query", self._query)
+            self._runner = web.AppRunner(app, access_log=None)
+            self._loop.run_until_complete(self._runner.setup())
+            site = web.TCPSite(self._runner, "127.0.0.1", 0)
+            self._loop.run_until_complete(site.start())
+            port = self._runner.addresses[0][1]
+            self.base_url = f"http://127.0.0.1:{port}/api"
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self._runner.cleanup())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=_serve, name="stub-qbreader", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "StubQBReader":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class FakeGenai:
+    """
+    Stand-in for genai.Client: only models.generate_content_stream(model=, contents=).
+
+    Parameters:
+        first_chunk_ms: delay before the first chunk (time to first token).
+        chunk_ms: delay between later chunks.
+        chunks: how many pieces the reply is streamed in.
+    """
+
+    def __init__(self, *, first_chunk_ms: float = 300.0, chunk_ms: float = 40.0, chunks: int = 8):
+        self.first_chunk_ms = first_chunk_ms
+        self.chunk_ms = chunk_ms
+        self.chunks = max(1, chunks)
+        self.calls = 0
+        self.models = SimpleNamespace(generate_content_stream=self.generate_content_stream)
+
+    def generate_content_stream(self, model: str, contents: str) -> Iterator[Any]:
+        self.calls += 1
+        reply = json.dumps({
+            "overall_summary": "A stand-in summary. " * 12,
+            "power_summary": "A stand-in power summary. " * 8,
+            "hard_questions": [f"Stand-in hard question {i}?" for i in range(3)],
+            "related_entities": [f"Related {i}" for i in range(5)],
+        })
+        step = -(-len(reply) // self.chunks)
+        time.sleep(self.first_chunk_ms / 1000)
+        for i in range(0, len(reply), step):
+            if i:
+                time.sleep(self.chunk_ms / 1000)
+            last = i + step >= len(reply)
+            usage = SimpleNamespace(prompt_token_count=len(contents) // 4,
+                                    candidates_token_count=len(reply) // 4) if last else None
+            yield SimpleNamespace(text=reply[i:i + step], usage_metadata=usage)
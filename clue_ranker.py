@@ -0,0 +1,294 @@
+"""
+Local clue-phrase ranking: which n-grams come up often, and early, across the questions.
+
+rank_clues() tokenizes every question once, builds all 1..3-gram ids with NumPy (no
+per-phrase Python loops), and scores each phrase by
+
+    sum over questions containing it of  earliness * (power_boost if in the power part)
+    times an IDF weight from an optional background corpus
+
+where earliness = 1 - (position of the phrase's first occurrence / question length).
+Phrases made of stopwords, giveaway boilerplate ("for 10 points") or words from the
+query itself are skipped, and a phrase is dropped from the output when a longer phrase
+containing it is already ranked with the same support.
+
+No network calls: use it as an offline summary (summarize_clues) or to pick which clues
+are worth sending to Gemini (extract_larger_trends(..., clue_prefilter=k)).
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from extract_and_filter import _split_sentences
+
+_RE_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by for from had has have he her his in into is it its
+of on or she that the their them then there these they this those to was were which
+who whom with while also after before over under about than not one two three
+name identify give what ftp points point 10 ten each
+man woman person people thing work figure
+""".split())
+
+# between sentences/questions: no n-gram may span one
+_BOUNDARY = -1
+_INT64_MAX = int(np.iinfo(np.int64).max)
+
+
+def _packed_ids_fit(base: int, max_n: int) -> bool:
+    """True if every phrase of up to `max_n` words packs into one int64 id (see rank_clues)."""
+    return (max_n + 1) * base ** max_n <= _INT64_MAX
+
+
+@dataclass
+class RankedClue:
+    """One clue phrase and why it ranked where it did."""
+    phrase: str
+    score: float
+    questions: int          # how many questions contain it
+    mean_position: float    # mean relative position of its first occurrence (0 = start)
+    power_questions: int    # how many questions have it in the power sentences
+
+
+class ClueBackground:
+    """
+    Document frequencies of phrases over a broad corpus (e.g. mirror questions from many
+    answerlines), used as the IDF side of rank_clues. Without one, phrases are weighted
+    by support and earliness only.
+    """
+
+    def __init__(self, ngram_range: Tuple[int, int] = (1, 3)):
+        self.ngram_range = ngram_range
+        self.docs = 0
+        self.df: Dict[str, int] = {}
+
+    def fit(self, texts: Iterable[Optional[str]]) -> "ClueBackground":
+        for text in texts:
+            words = _RE_WORD.findall(_plain(text))
+            self.docs += 1
+            seen = set()
+            lo, hi = self.ngram_range
+            for n in range(lo, hi + 1):
+                for i in range(len(words) - n + 1):
+                    seen.add(" ".join(words[i:i + n]))
+            for phrase in seen:
+                self.df[phrase] = self.df.get(phrase, 0) + 1
+        return self
+
+    def idf(self, phrases: Sequence[str]) -> np.ndarray:
+        df = np.fromiter((self.df.get(p, 0) for p in phrases), dtype=np.float64, count=len(phrases))
+        return np.log((1.0 + self.docs) / (1.0 + df)) + 1.0
+
+
+def _plain(html_text: Optional[str]) -> str:
+    return " ".join(_split_sentences(html_text or "")).lower()
+
+
+def _tokenize(
+    unfiltered: Sequence[Optional[str]],
+    filtered: Sequence[Optional[str]],
+) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Flatten every question into one token stream.
+
+    Returns (vocab, token ids with _BOUNDARY between sentences, question index,
+    relative position in the question, in-power flag) -- all arrays the same length.
+    """
+    vocab: Dict[str, int] = {}
+    ids: List[int] = []
+    qidx: List[int] = []
+    rel: List[float] = []
+    power: List[bool] = []
+    for qi, text in enumerate(unfiltered):
+        sentences = _split_sentences(text or "")
+        n_power = len(_split_sentences(filtered[qi] or "")) if qi < len(filtered) else 0
+        words = [_RE_WORD.findall(s.lower()) for s in sentences]
+        total = max(1, sum(len(w) for w in words))
+        pos = 0
+        for si, sent in enumerate(words):
+            for w in sent:
+                ids.append(vocab.setdefault(w, len(vocab)))
+                qidx.append(qi)
+                rel.append(pos / total)
+                power.append(si < n_power)
+                pos += 1
+            ids.append(_BOUNDARY)
+            qidx.append(qi)
+            rel.append(1.0)
+            power.append(False)
+    words_by_id = [""] * len(vocab)
+    for w, i in vocab.items():
+        words_by_id[i] = w
+    return (
+        words_by_id,
+        np.asarray(ids, dtype=np.int64),
+        np.asarray(qidx, dtype=np.int64),
+        np.asarray(rel, dtype=np.float64),
+        np.asarray(power, dtype=bool),
+    )
+
+
+def rank_clues(
+    unfiltered_sentences: Sequence[Optional[str]],
+    filtered_sentences: Sequence[Optional[str]] = (),
+    *,
+    query: Optional[str] = None,
+    top_k: Optional[int] = 25,
+    ngram_range: Tuple[int, int] = (1, 3),
+    min_questions: int = 2,
+    power_boost: float = 2.0,
+    background: Optional[ClueBackground] = None,
+) -> List[RankedClue]:
+    """
+    Rank clue phrases across the questions for one answerline.
+
+    Parameters:
+        unfiltered_sentences: full question texts (HTML allowed).
+        filtered_sentences: first_n_sentences output for the same questions, marking the
+            power part; occurrences there count `power_boost` times.
+        query: the answerline; phrases containing its words are skipped.
+        top_k: how many phrases to return (None = all).
+        min_questions: ignore phrases found in fewer questions than this.
+        background: document frequencies for the IDF factor.
+
+    Returns:
+        RankedClue list, best first.
+    """
+    vocab, ids, qidx, rel, power = _tokenize(unfiltered_sentences, filtered_sentences)
+    if not len(ids) or not vocab:
+        return []
+
+    skip_words = set(STOPWORDS) | set(_RE_WORD.findall((query or "").lower()))
+    stop = np.fromiter((w in skip_words for w in vocab), dtype=bool, count=len(vocab))
+    query_word = np.fromiter((w in skip_words and w not in STOPWORDS for w in vocab), dtype=bool, count=len(vocab))
+    # a bare number is rarely a clue on its own; "1905 paper" can be
+    numeric = np.fromiter((w.isdigit() for w in vocab), dtype=bool, count=len(vocab))
+    base = len(vocab) + 1
+    safe = np.where(ids == _BOUNDARY, 0, ids)
+    lo, hi = ngram_range
+    # phrase id = its word ids in base len(vocab)+1, tagged with n, while that fits int64
+    # (~1M words for trigrams); otherwise one row per phrase [n, word ids + 1, 0 padding]
+    packed = _packed_ids_fit(base, hi)
+
+    keys, gram_q, gram_rel, gram_power = [], [], [], []
+    for n in range(lo, hi + 1):
+        m = len(ids) - n + 1
+        if m <= 0:
+            continue
+        window = np.stack([ids[i:i + m] for i in range(n)])
+        valid = (window != _BOUNDARY).all(axis=0)
+        first, last = safe[:m], safe[n - 1:n - 1 + m]
+        valid &= ~stop[first] & ~stop[last]
+        if n == 1:
+            valid &= ~numeric[first]
+        # query words anywhere in the phrase, not just at the edges
+        for i in range(1, n - 1):
+            valid &= ~query_word[safe[i:i + m]]
+        idx = np.flatnonzero(valid)
+        if packed:
+            key = np.zeros(len(idx), dtype=np.int64)
+            for i in range(n):
+                key = key * base + (ids[idx + i] + 1)
+            keys.append(key * (hi + 1) + n)
+        else:
+            rows = np.zeros((len(idx), hi + 1), dtype=np.int64)
+            rows[:, 0] = n
+            for i in range(n):
+                rows[:, i + 1] = ids[idx + i] + 1
+            keys.append(rows)
+        gram_q.append(qidx[idx])
+        gram_rel.append(rel[idx])
+        gram_power.append(power[idx])
+    if not keys:
+        return []
+    key = np.concatenate(keys)
+    gq = np.concatenate(gram_q)
+    grel = np.concatenate(gram_rel)
+    gpow = np.concatenate(gram_power)
+    if not len(key):
+        return []
+
+    if packed:
+        phrase_keys, term = np.unique(key, return_inverse=True)
+        phrase_len = phrase_keys % (hi + 1)
+    else:
+        phrase_keys, term = np.unique(key, axis=0, return_inverse=True)
+        term = term.reshape(-1)
+        phrase_len = phrase_keys[:, 0]
+    # first occurrence of each phrase in each question (tokens are in reading order,
+    # but n-grams were concatenated by length, so order by position explicitly)
+    order = np.lexsort((grel, term, gq))
+    pair = gq[order] * len(phrase_keys) + term[order]
+    _, first = np.unique(pair, return_index=True)
+    hit = order[first]
+    t, q_rel, q_pow = term[hit], grel[hit], gpow[hit]
+
+    n_terms = len(phrase_keys)
+    support = np.bincount(t, minlength=n_terms)
+    weight = (1.0 - q_rel) * np.where(q_pow, power_boost, 1.0)
+    score = np.bincount(t, weights=weight, minlength=n_terms)
+    mean_pos = np.bincount(t, weights=q_rel, minlength=n_terms) / np.maximum(support, 1)
+    power_q = np.bincount(t, weights=q_pow.astype(np.float64), minlength=n_terms)
+
+    candidates = np.flatnonzero(support >= min_questions)
+    if not len(candidates):
+        return []
+
+    def _decode(k: int) -> str:
+        n = int(k % (hi + 1))
+        k //= hi + 1
+        words = []
+        for _ in range(n):
+            words.append(vocab[int(k % base) - 1])
+            k //= base
+        return " ".join(reversed(words))
+
+    if packed:
+        phrases = [_decode(int(k)) for k in phrase_keys[candidates]]
+    else:
+        phrases = [" ".join(vocab[w - 1] for w in row[1:row[0] + 1]) for row in phrase_keys[candidates].tolist()]
+    cand_score = score[candidates]
+    if background is not None:
+        cand_score = cand_score * background.idf(phrases)
+    n_words = phrase_len[candidates].astype(np.int64)
+    # ties go to the longer phrase, so "photoelectric effect" beats "photoelectric"
+    ranking = np.lexsort((-n_words, -cand_score))
+
+    out: List[RankedClue] = []
+    for r in ranking:
+        c = candidates[r]
+        phrase = phrases[r]
+        # "photoelectric" adds nothing once "photoelectric effect" is in with the same support
+        if any(f" {phrase} " in f" {kept.phrase} " and kept.questions >= support[c] for kept in out):
+            continue
+        out = [
+            kept for kept in out
+            if not (f" {kept.phrase} " in f" {phrase} " and kept.questions <= support[c])
+        ]
+        out.append(RankedClue(
+            phrase=phrase,
+            score=float(cand_score[r]),
+            questions=int(support[c]),
+            mean_position=float(mean_pos[c]),
+            power_questions=int(power_q[c]),
+        ))
+        if top_k is not None and len(out) >= top_k:
+            break
+    return out
+
+
+def summarize_clues(clues: Sequence[RankedClue], total_questions: Optional[int] = None) -> str:
+    """Plain-text table of ranked clues (an offline stand-in for the Gemini power summary)."""
+    lines = []
+    for i, c in enumerate(clues, 1):
+        of = f"/{total_questions}" if total_questions else ""
+        lines.append(
+            f"{i:>2}. {c.phrase}  ({c.questions}{of} questions, {c.power_questions} in power, "
+            f"avg position {c.mean_position:.0%})"
+        )
+    return "\n".join(lines)
+
@@ -0,0 +1,152 @@
+"""
+Per-invocation deadlines, hedged requests and partial results.
+
+One Deadline is created per query (CLI run, batch job, service request) and handed to
+every stage, so the stages share a single time budget instead of each having its own
+timeout:
+
+    deadline = Deadline(20)                       # seconds from now; None = no limit
+    questions = await get_top_n_questions_async(..., deadline=deadline)
+    if is_partial(questions): ...                 # some pages were skipped
+
+hedged() runs one request against the deadline: if it hasn't answered after
+`hedge_after` seconds (or half the remaining time, whichever is sooner) an identical
+second request is started and the first answer wins; if neither answers before the
+deadline both are cancelled and DeadlineExceeded is raised so the caller can skip it.
+iter_until() does the same for a blocking iterator (the Gemini stream).
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from typing import Any, Awaitable, Callable, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_HEDGE_AFTER = 2.0  # seconds a request may take before a duplicate is sent
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline:
+    """A point in time (monotonic clock) that a whole invocation must finish by."""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds
+        self.expires_at = float("inf") if seconds is None else time.monotonic() + seconds
+
+    @property
+    def bounded(self) -> bool:
+        return self.seconds is not None
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def wait_timeout(self) -> Optional[float]:
+        """remaining() for timeout= arguments: None (wait forever) when there is no limit."""
+        return self.remaining() if self.bounded else None
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def timeout(self, default: float) -> float:
+        """`default` clipped to the time left (for per-request timeouts)."""
+        return min(default, self.remaining())
+
+    def check(self) -> None:
+        if self.expired:
+            raise DeadlineExceeded(f"deadline of {self.seconds}s exceeded")
+
+    def __repr__(self) -> str:
+        return f"Deadline({self.seconds}, remaining={self.remaining():.2f})"
+
+
+class PartialResult(list):
+    """
+    A list of results that came back incomplete because the deadline ran out.
+    `skipped` holds what was given up on (e.g. the params of unanswered requests).
+    """
+
+    partial = True
+
+    def __init__(self, items: Iterable[Any] = (), skipped: Optional[List[Any]] = None):
+        super().__init__(items)
+        self.skipped = list(skipped or [])
+
+
+def is_partial(result: Any) -> bool:
+    """True for results marked incomplete (PartialResult, or anything with partial=True)."""
+    return bool(getattr(result, "partial", False))
+
+
+async def hedged(
+    call: Callable[[], Awaitable[T]],
+    deadline: Deadline,
+    *,
+    hedge_after: float = DEFAULT_HEDGE_AFTER,
+) -> T:
+    """
+    Await call() before `deadline`, sending one duplicate call() if the first is slow.
+    Raises DeadlineExceeded (with both calls cancelled) if neither finishes in time.
+    """
+    if deadline.expired:
+        raise DeadlineExceeded("deadline passed before the request was sent")
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=min(hedge_after, deadline.remaining() / 2))
+        if not done and not deadline.expired:
+            tasks.append(asyncio.ensure_future(call()))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=deadline.wait_timeout(), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                raise DeadlineExceeded("request still running at the deadline")
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()  # the other copy may still succeed
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def iter_until(make_iter: Callable[[], Iterable[T]], deadline: Optional[Deadline]) -> Iterator[T]:
+    """
+    Yield from make_iter() (called, and iterated, on a helper thread) until it ends or
+    `deadline` passes, in which case DeadlineExceeded is raised even if the iterator is
+    blocked. deadline=None iterates directly.
+    """
+    if deadline is None:
+        yield from make_iter()
+        return
+    items: "queue.Queue" = queue.Queue()
+    _END = object()
+
+    def _pump() -> None:
+        try:
+            for item in make_iter():
+                items.put((item, None))
+            items.put((_END, None))
+        except BaseException as exc:  # re-raised on the caller's thread
+            items.put((_END, exc))
+
+    # daemon: an abandoned stream must not keep the process alive
+    threading.Thread(target=_pump, name="deadline-iter", daemon=True).start()
+    while True:
+        try:
+            item, exc = items.get(timeout=deadline.wait_timeout())
+        except queue.Empty:
+            raise DeadlineExceeded("stream still running at the deadline")
+        if item is _END:
+            if exc is not None:
+                raise exc
+            return
+        yield item
@@ -7,28 +7,53 @@ to call get_top_100_questions. Example: "SET A,SET B,SET C"
 Base URL used: https://www.qbreader.org/api
 """
 
-import requests
+import asyncio
 import math
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Union, Tuple, Callable, Awaitable, Iterable, Iterator, AsyncIterator, NamedTuple, TYPE_CHECKING
 import re
-from google import genai
 import os
 from pathlib import Path
 import shlex
+import json
+import hashlib
 
-def get_set_list(base_url: str = "https://www.qbreader.org/api") -> List[str]:
+import metrics
+from deadline import DEFAULT_HEDGE_AFTER, Deadline, DeadlineExceeded, PartialResult, hedged, iter_until
+from question_record import QuestionRecord
+from response_cache import DEFAULT_CACHE_PATH, ResponseCache
+from trend_parser import TrendStreamParser
+
+# google.genai, requests/aiohttp (via qbreader_client) and numpy take most of a second to
+# import, so they're loaded on first use rather than when the CLI starts
+if TYPE_CHECKING:
+    from near_duplicates import NearDuplicateIndex
+    from qbreader_client import QBReaderClient
+    from question_mirror import QuestionMirror
+
+
+def get_default_client() -> "QBReaderClient":
+    """The process-wide QBReaderClient (imports the HTTP stack on first call)."""
+    from qbreader_client import get_default_client as _get_default_client
+    return _get_default_client()
+
+
+def get_set_list(
+    base_url: str = "https://www.qbreader.org/api",
+    client: Optional["QBReaderClient"] = None,
+    refresh: bool = False,
+) -> List[str]:
     """
-    Fetch the list of available sets from /set-list.
+    Fetch the list of available sets from /set-list (`refresh` skips the response cache).
 
     Returns:
         A list of set-name strings.
     Raises:
-        requests.HTTPError on non-2xx responses.
+        requests.HTTPError on non-2xx responses (429/5xx are retried first).
     """
+    client = client or get_default_client()
     url = f"{base_url.rstrip('/')}/set-list"
-    resp = requests.get(url, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
+    with metrics.span("set_list"):
+        data = client.get_json(url, timeout=10, refresh=refresh)
     # the API returns an array of set names (or objects) depending on implementation;
     # normalize to a list of strings if necessary
     if isinstance(data, list):
@@ -47,32 +72,78 @@ def get_set_list(base_url: str = "https://www.qbreader.org/api") -> List[str]:
 
 import math
 from typing import List, Dict, Any, Optional
-import requests
 
 def _fetch_query_page(
     base_url: str,
     params: Dict[str, Any],
     timeout: int = 15,
+    client: Optional["QBReaderClient"] = None,
 ) -> Dict[str, Any]:
+    client = client or get_default_client()
     url = f"{base_url.rstrip('/')}/query"
-    resp = requests.get(url, params=params, timeout=timeout)
-    resp.raise_for_status()
-    return resp.json()
+    return client.get_json(url, params=params, timeout=timeout)
+
 
-def _normalize_tossups(tossup_array: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+async def _fetch_query_page_async(
+    base_url: str,
+    params: Dict[str, Any],
+    timeout: int = 15,
+    client: Optional["QBReaderClient"] = None,
+) -> Dict[str, Any]:
+    """Async twin of _fetch_query_page, going through the client's aiohttp pool."""
+    client = client or get_default_client()
+    url = f"{base_url.rstrip('/')}/query"
+    return await client.get_json_async(url, params=params, timeout=timeout)
+
+
+def _request_timeout(request_timeout: float, deadline: Optional[Deadline]) -> float:
+    """Per-request timeout, never running past the deadline (aiohttp reads 0 as "no limit")."""
+    if deadline is None:
+        return request_timeout
+    return max(0.05, deadline.timeout(request_timeout))
+
+
+def _with_deadline(
+    fetch_page: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+    deadline: Optional[Deadline],
+    hedge_after: float,
+    skipped: List[Dict[str, Any]],
+) -> Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]:
+    """
+    Wrap `fetch_page` so every call is hedged against `deadline` (see deadline.hedged).
+    A page that doesn't arrive in time comes back empty and its params go to `skipped`.
+    """
+    if deadline is None:
+        return fetch_page
+
+    async def _fetch(params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            return await hedged(lambda: fetch_page(params), deadline, hedge_after=hedge_after)
+        except DeadlineExceeded:
+            skipped.append(params)
+            return {}
+
+    return _fetch
+
+def _normalize_tossups(tossup_array: List[Dict[str, Any]], raw_mode: str = "full") -> List[QuestionRecord]:
     out = []
     for t in tossup_array:
-        out.append({
-            "type": "tossup",
-            "id": t.get("_id") or t.get("id"),
-            "answer": t.get("answer", t.get("answerline", "")),
-            "question": t.get("question", ""),
-            "setName": t.get("setName"),
-            "raw": t,
-        })
+        out.append(QuestionRecord(
+            type="tossup",
+            id=t.get("_id") or t.get("id"),
+            answer=t.get("answer", t.get("answerline", "")),
+            question=t.get("question", ""),
+            setName=t.get("setName"),
+            raw=t,
+            raw_mode=raw_mode,
+        ))
     return out
 
-def _normalize_bonuses(bonus_array: List[Dict[str, Any]], query: Optional[str] = None) -> List[Dict[str, Any]]:
+def _normalize_bonuses(
+    bonus_array: List[Dict[str, Any]],
+    query: Optional[str] = None,
+    raw_mode: str = "full",
+) -> List[QuestionRecord]:
     out = []
     q = (query or "").strip().lower()
     for b in bonus_array:
@@ -102,14 +173,15 @@ def _normalize_bonuses(bonus_array: List[Dict[str, Any]], query: Optional[str] =
             chosen_text = b.get("text") or b.get("question") or ""
 
         answer = b.get("answer", b.get("answerline", ""))
-        out.append({
-            "type": "bonus",
-            "id": b.get("_id") or b.get("id"),
-            "answer": answer,
-            "question": chosen_text,
-            "setName": b.get("setName"),
-            "raw": b,
-        })
+        out.append(QuestionRecord(
+            type="bonus",
+            id=b.get("_id") or b.get("id"),
+            answer=answer,
+            question=chosen_text,
+            setName=b.get("setName"),
+            raw=b,
+            raw_mode=raw_mode,
+        ))
     return out
 
 #TODO: allow search by difficulty, set_list, and 
@@ -118,43 +190,50 @@ def _normalize_bonuses(bonus_array: List[Dict[str, Any]], query: Optional[str] =
 #difficulty list = Pop Culture, Middle School, Easy High School, Regular High School, Hard High School, Easy College, Medium College, Regionals College, Nationals College, Open
 #Note that these are listed with a key of 0-10 and a value of above
 
-def get_top_n_questions(
+def _build_common_params(
     query: str,
-    set_list: List[str],
-    n: int,
-    base_url: str = "https://www.qbreader.org/api",
-    *,
+    set_name: str,
     case_sensitive: bool = False,
     exact_phrase: bool = False,
-    # optional: filter by difficulty (int, string, or list of ints/strings)
     difficulty: Optional[Union[int, str, List[Union[int, str]]]] = None,
-    # optional: filter by category (string or list of strings); pass exact category names (e.g., "Literature")
     category: Optional[Union[str, List[str]]] = None,
-    # optional: if you want to override per-request maxReturnLength cap
-    request_timeout: int = 15,
-    ) -> List[Dict[str, Any]]:
-    """
-    Pull the top `n` questions whose ANSWER contains `query`, evenly split across
-    the provided set_list and evenly between tossups and bonuses per-set.
+) -> Dict[str, Any]:
+    """Build the /query params shared by the tossup and bonus requests for one set."""
+    # If set_name == "undefined" we omit 'setName'
+    # so the API searches all sets (the absence of the parameter means "all").
+    common_params = {
+        "queryString": query,
+        "searchType": "answer",
+        "caseSensitive": str(bool(case_sensitive)).lower(),
+        "exactPhrase": str(bool(exact_phrase)).lower(),
+    }
+    if set_name != "undefined":
+        common_params["setName"] = set_name
+
+    # optional difficulty filter: accept int/str or list -> join as comma-separated string
+    if difficulty is not None:
+        if isinstance(difficulty, (list, tuple)):
+            common_params["difficulties"] = ",".join(str(d) for d in difficulty)
+        else:
+            common_params["difficulties"] = str(difficulty)
 
-    Parameters:
-        query: search string to look for inside answerlines (searchType=answer).
-        set_list: list of set names (each will be queried separately).
-        n: total number of questions desired across all sets and types.
-        base_url: QBReader API base.
-        case_sensitive, exact_phrase: forwarded to API.
-        request_timeout: per-request timeout in seconds.
+    # optional category filter: accept str or list -> join as comma-separated string
+    if category is not None:
+        if isinstance(category, (list, tuple)):
+            common_params["categories"] = ",".join(str(c) for c in category)
+        else:
+            common_params["categories"] = str(category)
+    return common_params
 
-    Returns:
-        List[dict] of normalized question dicts (type, id, answer, question, setName, raw).
+
+def _allocate(set_list: List[str], n: int) -> List[Tuple[str, int, int]]:
     """
-    if n <= 0:
-        return []
-    
-    # If no sets were provided, treat as a single 'undefined' set
-    if not set_list:
-        set_list = ["undefined"]
+    Split `n` evenly across sets (earlier sets absorb the remainder), then split each
+    set's share between tossups and bonuses.
 
+    Returns:
+        [(set_name, tossup_count, bonus_count), ...] for every set with a non-zero share.
+    """
     total_sets = len(set_list)
     base_per_set = n // total_sets
     remainder = n % total_sets
@@ -164,9 +243,8 @@ def get_top_n_questions(
         base_per_set + (1 if i < remainder else 0)
         for i in range(total_sets)
     ]
-    results: List[Dict[str, Any]] = []
 
-    # For each set, split its allocation between tossups and bonuses
+    allocations: List[Tuple[str, int, int]] = []
     for idx, set_name in enumerate(set_list):
         per_set_count = per_set_alloc[idx]
         if per_set_count <= 0:
@@ -178,70 +256,407 @@ def get_top_n_questions(
         # (This guarantees tossups + bonuses == per_set_count)
         tossup_count = per_set_count // 2
         bonus_count = per_set_count - tossup_count
-        
-        # Build common params. If set_name == "undefined" we omit 'setName'
-        # so the API searches all sets (the absence of the parameter means "all").
-        common_params = {
-            "queryString": query,
-            "searchType": "answer",
-            "caseSensitive": str(bool(case_sensitive)).lower(),
-            "exactPhrase": str(bool(exact_phrase)).lower(),
-        }
-        if set_name != "undefined":
-            common_params["setName"] = set_name
-
-        # optional difficulty filter: accept int/str or list -> join as comma-separated string
-        if difficulty is not None:
-            if isinstance(difficulty, (list, tuple)):
-                common_params["difficulties"] = ",".join(str(d) for d in difficulty)
-            else:
-                common_params["difficulties"] = str(difficulty)
+        allocations.append((set_name, tossup_count, bonus_count))
+    return allocations
 
-        # optional category filter: accept str or list -> join as comma-separated string
-        if category is not None:
-            if isinstance(category, (list, tuple)):
-                common_params["categories"] = ",".join(str(c) for c in category)
-            else:
-                common_params["categories"] = str(category)
 
-        # Fetch tossups for this set (if requested)
+def _plan_query_requests(
+    query: str,
+    set_list: List[str],
+    n: int,
+    *,
+    case_sensitive: bool = False,
+    exact_phrase: bool = False,
+    difficulty: Optional[Union[int, str, List[Union[int, str]]]] = None,
+    category: Optional[Union[str, List[str]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Work out every /query call needed for `n` questions, in result order.
+
+    Returns:
+        List of params dicts (one per call), ordered by set then tossup-before-bonus.
+    """
+    planned: List[Dict[str, Any]] = []
+    for set_name, tossup_count, bonus_count in _allocate(set_list, n):
+        common_params = _build_common_params(
+            query, set_name, case_sensitive, exact_phrase, difficulty, category
+        )
         if tossup_count > 0:
             params = dict(common_params)
-            params.update({
-                "questionType": "tossup",
-                "maxReturnLength": tossup_count,
-                # tossupPagination could be used for pagination; we request up to tossup_count
-            })
-            try:
-                data = _fetch_query_page(base_url, params, timeout=request_timeout)
-            except requests.HTTPError:
-                # If a set/query fails, continue with others (you can change to re-raise)
-                raise
-            # Normalize tossups
-            tossups_obj = data.get("tossups", {})
-            if isinstance(tossups_obj, dict):
-                tossup_arr = tossups_obj.get("questionArray", [])
-            else:
-                tossup_arr = tossups_obj if isinstance(tossups_obj, list) else []
-            results.extend(_normalize_tossups(tossup_arr))
-
-        # Fetch bonuses for this set (if requested)
+            # tossupPagination could be used for pagination; we request up to tossup_count
+            params.update({"questionType": "tossup", "maxReturnLength": tossup_count})
+            planned.append(params)
         if bonus_count > 0:
             params = dict(common_params)
-            params.update({
-                "questionType": "bonus",
-                "maxReturnLength": bonus_count,
-            })
-            try:
-                data = _fetch_query_page(base_url, params, timeout=request_timeout)
-            except requests.HTTPError:
-                raise
-            bonuses_obj = data.get("bonuses", {})
-            if isinstance(bonuses_obj, dict):
-                bonus_arr = bonuses_obj.get("questionArray", [])
-            else:
-                bonus_arr = bonuses_obj if isinstance(bonuses_obj, list) else []
-            results.extend(_normalize_bonuses(bonus_arr, query))
+            params.update({"questionType": "bonus", "maxReturnLength": bonus_count})
+            planned.append(params)
+    return planned
+
+
+def _question_array(data: Dict[str, Any], key: str) -> List[Dict[str, Any]]:
+    """Pull the question list out of a /query response under `key` ("tossups"/"bonuses")."""
+    obj = data.get(key, {})
+    if isinstance(obj, dict):
+        return obj.get("questionArray", [])
+    return obj if isinstance(obj, list) else []
+
+
+def _normalize_page(
+    data: Dict[str, Any],
+    params: Dict[str, Any],
+    query: str,
+    raw_mode: str = "full",
+) -> List[QuestionRecord]:
+    """Normalize one /query response according to the questionType it was requested with."""
+    with metrics.span("normalize", trace=False):
+        if params.get("questionType") == "tossup":
+            records = _normalize_tossups(_question_array(data, "tossups"), raw_mode)
+        else:
+            records = _normalize_bonuses(_question_array(data, "bonuses"), query, raw_mode)
+    metrics.inc("qbt_questions_normalized_total", len(records))
+    return records
+
+
+def _raw_question_text(raw: Dict[str, Any], key: str, query: str) -> str:
+    """The `question` text a raw tossup/bonus object normalizes to."""
+    if key == "tossups":
+        return _normalize_tossups([raw], "none")[0].question or ""
+    return _normalize_bonuses([raw], query, "none")[0].question or ""
+
+
+def _is_near_duplicate(index: "NearDuplicateIndex", raw: Dict[str, Any], key: str, query: str) -> bool:
+    """Check `raw` against `index`, adding it if it is new."""
+    return index.add(raw.get("_id") or raw.get("id") or id(raw), _raw_question_text(raw, key, query)) is not None
+
+
+def _drop_near_duplicates(slots: List[Dict[str, Any]], index: "NearDuplicateIndex", query: str) -> int:
+    """
+    Remove questions that near-duplicate an earlier one from `slots` (see
+    _refill_shortfall_async), checking only raws added since the last call.
+    Returns how many were removed.
+    """
+    removed = 0
+    for slot in slots:
+        start = slot.get("checked", 0)
+        fresh = slot["raws"][start:]
+        keep = [raw for raw in fresh if not _is_near_duplicate(index, raw, slot["key"], query)]
+        slot["raws"][start:] = keep
+        slot["dropped"] = slot.get("dropped", 0) + len(fresh) - len(keep)
+        slot["checked"] = len(slot["raws"])
+        removed += len(fresh) - len(keep)
+    return removed
+
+
+def _spread_evenly(total: int, capacities: List[int]) -> List[int]:
+    """
+    Split `total` across slots as evenly as possible without exceeding any slot's
+    capacity (water-filling); earlier slots take the remainder, like _allocate.
+    """
+    shares = [0] * len(capacities)
+    remaining = total
+    open_slots = [i for i, cap in enumerate(capacities) if cap > 0]
+    while remaining > 0 and open_slots:
+        each = max(1, remaining // len(open_slots))
+        for i in list(open_slots):
+            if remaining == 0:
+                break
+            take = min(each, capacities[i] - shares[i], remaining)
+            shares[i] += take
+            remaining -= take
+            if shares[i] >= capacities[i]:
+                open_slots.remove(i)
+    return shares
+
+
+async def _refill_shortfall_async(
+    fetch_page: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+    slots: List[Dict[str, Any]],
+    n: int,
+) -> None:
+    """
+    Top up per-set/per-type `slots` until they hold `n` questions in total, using
+    tossupPagination/bonusPagination on the slots whose first page left matches unread.
+
+    Each slot is {"params", "key", "page_param", "raws", "count", "next_page", "spill"}:
+    `params` is the original request (its maxReturnLength is the page size), `count`
+    the API's total match count, `spill` questions already fetched but not yet used.
+    The deficit is spread evenly over slots with spare matches, and only the pages
+    needed for each slot's share are requested. Slots are modified in place.
+    """
+    while True:
+        deficit = n - sum(len(slot["raws"]) for slot in slots)
+        if deficit <= 0:
+            return
+        spare = [max(0, slot["count"] - len(slot["raws"]) - slot.get("dropped", 0)) for slot in slots]
+        shares = _spread_evenly(deficit, spare)
+        if not any(shares):
+            return
+
+        async def _top_up(slot: Dict[str, Any], extra: int) -> int:
+            page_size = int(slot["params"]["maxReturnLength"])
+            target = len(slot["raws"]) + extra
+            while len(slot["raws"]) + len(slot["spill"]) < target:
+                already = page_size * (slot["next_page"] - 1)
+                if already >= slot["count"]:
+                    break
+                params = dict(slot["params"])
+                params[slot["page_param"]] = slot["next_page"]
+                slot["next_page"] += 1
+                batch = _question_array(await fetch_page(params), slot["key"])
+                if not batch:
+                    slot["count"] = already
+                    break
+                slot["spill"].extend(batch)
+            taken = slot["spill"][:extra]
+            del slot["spill"][:extra]
+            slot["raws"].extend(taken)
+            return len(taken)
+
+        added = await asyncio.gather(*(
+            _top_up(slot, extra) for slot, extra in zip(slots, shares) if extra > 0
+        ))
+        if not sum(added):
+            return
+
+
+async def _fetch_partitioned_async(
+    fetch_page: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+    query: str,
+    allocations: List[Tuple[str, int, int]],
+    common_params: Dict[str, Any],
+    *,
+    page_size: int = 1000,
+    max_concurrency: int = 8,
+    refill: bool = True,
+    dedupe: Optional["NearDuplicateIndex"] = None,
+    raw_mode: str = "full",
+) -> List[QuestionRecord]:
+    """
+    Fill every set's tossup/bonus allocation from a handful of multi-set /query calls.
+
+    QBReader's setName filter takes a single set, so instead of one request per set this
+    drops the set restriction (keeping the other filters), pages through the matches in
+    large pages and buckets them by setName on the client. Paging stops as soon as every
+    allocation is full. Output order matches the per-set path: by set, tossups first.
+
+    With `refill`, matches that arrived for already-full allocations are kept (up to the
+    total wanted) and used to make up other sets' shortfall, so no extra requests are needed.
+    With `dedupe`, near-duplicates of questions already taken never fill an allocation.
+    """
+    wanted = {"tossup": {s: t for s, t, _ in allocations}, "bonus": {s: b for s, _, b in allocations}}
+    total_wanted = sum(t + b for _, t, b in allocations)
+    buckets: Dict[str, Dict[str, List[Dict[str, Any]]]] = {
+        qtype: {s: [] for s in wanted[qtype]} for qtype in wanted
+    }
+    overflow: Dict[str, Dict[str, List[Dict[str, Any]]]] = {
+        qtype: {s: [] for s in wanted[qtype]} for qtype in wanted
+    }
+
+    async def _drain(qtype: str) -> None:
+        key = "tossups" if qtype == "tossup" else "bonuses"
+        page_param = "tossupPagination" if qtype == "tossup" else "bonusPagination"
+        need = wanted[qtype]
+        bucket = buckets[qtype]
+        spill = overflow[qtype]
+        unfilled = sum(need.values())
+        if unfilled <= 0 and not refill:
+            return
+
+        def _absorb(data: Dict[str, Any]) -> int:
+            taken = 0
+            for raw in _question_array(data, key):
+                set_name = raw.get("setName")
+                if set_name not in bucket:
+                    continue
+                if len(bucket[set_name]) < need[set_name]:
+                    if dedupe is not None and _is_near_duplicate(dedupe, raw, key, query):
+                        continue
+                    bucket[set_name].append(raw)
+                    taken += 1
+                elif refill and len(spill[set_name]) < total_wanted:
+                    # overflow is only checked once it is actually used, below
+                    spill[set_name].append(raw)
+            return taken
+
+        def _params(page: int) -> Dict[str, Any]:
+            params = dict(common_params)
+            params.update({"questionType": qtype, "maxReturnLength": page_size, page_param: page})
+            return params
+
+        first = await fetch_page(_params(1))
+        unfilled -= _absorb(first)
+        obj = first.get(key, {})
+        total = obj.get("count", 0) if isinstance(obj, dict) else 0
+        # the API caps maxReturnLength; a short first page with more matches left is that cap
+        served = len(_question_array(first, key))
+        per_page = served if 0 < served < min(page_size, total) else page_size
+        last_page = math.ceil(total / per_page) if total else 1
+
+        # remaining pages go out a window at a time so we can stop once everything is filled
+        next_page = 2
+        while unfilled > 0 and next_page <= last_page:
+            window = range(next_page, min(last_page, next_page + max_concurrency - 1) + 1)
+            for data in await asyncio.gather(*(fetch_page(_params(p)) for p in window)):
+                unfilled -= _absorb(data)
+            next_page = window.stop
+
+    await asyncio.gather(_drain("tossup"), _drain("bonus"))
+
+    if refill:
+        # every page that could help has been read by now, so the shortfall comes from overflow
+        order = [(qtype, s) for s, _, _ in allocations for qtype in ("tossup", "bonus")]
+        if dedupe is not None:
+            for qtype, s in order:
+                key = "tossups" if qtype == "tossup" else "bonuses"
+                overflow[qtype][s] = [
+                    raw for raw in overflow[qtype][s] if not _is_near_duplicate(dedupe, raw, key, query)
+                ]
+        have = sum(len(buckets[qtype][s]) for qtype, s in order)
+        shares = _spread_evenly(total_wanted - have, [len(overflow[qtype][s]) for qtype, s in order])
+        for (qtype, set_name), extra in zip(order, shares):
+            buckets[qtype][set_name].extend(overflow[qtype][set_name][:extra])
+
+    results: List[QuestionRecord] = []
+    with metrics.span("normalize", trace=False):
+        for set_name, _, _ in allocations:
+            results.extend(_normalize_tossups(buckets["tossup"][set_name], raw_mode))
+            results.extend(_normalize_bonuses(buckets["bonus"][set_name], query, raw_mode))
+    metrics.inc("qbt_questions_normalized_total", len(results))
+    return results
+
+
+async def get_top_n_questions_async(
+    query: str,
+    set_list: List[str],
+    n: int,
+    base_url: str = "https://www.qbreader.org/api",
+    *,
+    case_sensitive: bool = False,
+    exact_phrase: bool = False,
+    difficulty: Optional[Union[int, str, List[Union[int, str]]]] = None,
+    category: Optional[Union[str, List[str]]] = None,
+    request_timeout: int = 15,
+    max_concurrency: int = 8,
+    client: Optional["QBReaderClient"] = None,
+    mirror: Optional["QuestionMirror"] = None,
+    batch_sets: bool = False,
+    batch_page_size: int = 1000,
+    refill: bool = True,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    dedupe_threshold: Optional[float] = None,
+    raw_mode: str = "full",
+    deadline: Optional[Deadline] = None,
+    hedge_after: float = DEFAULT_HEDGE_AFTER,
+    ) -> List[QuestionRecord]:
+    """
+    Async version of get_top_n_questions: every per-set/per-type /query call is
+    issued at once (at most `max_concurrency` in flight) instead of one after another.
+
+    Results are returned in the same order as the sequential version (grouped by set,
+    tossups before bonuses). All calls share `client` (default: the process-wide
+    QBReaderClient), so they reuse its connection pool, rate limit and retry policy.
+    With `mirror` set, pages are answered from the local QuestionMirror instead (offline).
+
+    With `batch_sets`, a multi-set selection is served by a few large unrestricted
+    queries (pages of `batch_page_size`) split up per set locally, instead of two
+    requests per set. Worth it for big selections; for a couple of sets the per-set
+    requests are smaller.
+
+    With `refill` (default), sets that come up short of their share are made up from
+    sets that still have unread matches (via pagination), so the result reaches `n`
+    whenever enough matches exist, without fetching more than is used.
+
+    Pass `semaphore` to share one in-flight request limit across several concurrent
+    calls (it replaces the per-call `max_concurrency` limit).
+
+    With `dedupe_threshold` (e.g. 0.8), a question whose word-shingle Jaccard similarity
+    to an earlier one reaches the threshold is dropped (MinHash/LSH, see
+    near_duplicates), and with `refill` the freed slots are filled from the remaining
+    matches so the result still holds `n` distinct questions when enough exist.
+
+    `raw_mode` controls how each record keeps the original API object: "full" (dict),
+    "lazy" (compact JSON, decoded on access) or "none" (dropped) -- see question_record.
+
+    With `deadline`, no request runs past it: one still unanswered after `hedge_after`
+    seconds (sooner as the deadline nears) is sent a second time, and pages that haven't
+    arrived by the deadline are skipped. The result is then a deadline.PartialResult
+    (check with is_partial) whose `skipped` lists the params of the missing pages.
+    """
+    if n <= 0:
+        return []
+
+    # If no sets were provided, treat as a single 'undefined' set
+    if not set_list:
+        set_list = ["undefined"]
+
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    dedupe = None
+    if dedupe_threshold is not None:
+        from near_duplicates import NearDuplicateIndex
+        dedupe = NearDuplicateIndex(dedupe_threshold)
+
+    async def _fetch_page(params: Dict[str, Any]) -> Dict[str, Any]:
+        if mirror is not None:
+            return await mirror.query_async(params)
+        async with semaphore:
+            timeout = _request_timeout(request_timeout, deadline)
+            return await _fetch_query_page_async(base_url, params, timeout=timeout, client=client)
+
+    skipped: List[Dict[str, Any]] = []
+    _fetch_one = _with_deadline(_fetch_page, deadline, hedge_after, skipped)
+
+    if batch_sets and "undefined" not in set_list:
+        results = await _fetch_partitioned_async(
+            _fetch_one,
+            query,
+            _allocate(set_list, n),
+            _build_common_params(query, "undefined", case_sensitive, exact_phrase, difficulty, category),
+            page_size=batch_page_size,
+            max_concurrency=max_concurrency,
+            refill=refill,
+            dedupe=dedupe,
+            raw_mode=raw_mode,
+        )
+    else:
+        planned = _plan_query_requests(
+            query, set_list, n,
+            case_sensitive=case_sensitive,
+            exact_phrase=exact_phrase,
+            difficulty=difficulty,
+            category=category,
+        )
+        # gather preserves input order, so pages line up with `planned`
+        pages = await asyncio.gather(*(_fetch_one(p) for p in planned))
+
+        if refill or dedupe is not None:
+            slots = []
+            for params, data in zip(planned, pages):
+                is_tossup = params["questionType"] == "tossup"
+                key = "tossups" if is_tossup else "bonuses"
+                raws = _question_array(data, key)
+                obj = data.get(key, {})
+                slots.append({
+                    "params": params,
+                    "key": key,
+                    "page_param": "tossupPagination" if is_tossup else "bonusPagination",
+                    "raws": list(raws),
+                    "count": obj.get("count", len(raws)) if isinstance(obj, dict) else len(raws),
+                    "next_page": 2,
+                    "spill": [],
+                })
+            while True:
+                if refill:
+                    await _refill_shortfall_async(_fetch_one, slots, n)
+                # refilled questions can be duplicates too, so repeat until nothing changes
+                if dedupe is None or not _drop_near_duplicates(slots, dedupe, query) or not refill:
+                    break
+            pages = [{slot["key"]: {"questionArray": slot["raws"]}} for slot in slots]
+
+        results = []
+        for params, data in zip(planned, pages):
+            results.extend(_normalize_page(data, params, query, raw_mode))
 
     # Final safety: if API returned more than requested due to per-set rounding or API behavior,
     # trim to n elements (preserve order as returned: grouped by set and type).
@@ -249,18 +664,225 @@ def get_top_n_questions(
     if len(results) > n:
         results = results[:n]
 
+    if skipped:
+        print(f"Deadline reached: {len(skipped)} requests skipped, returning a partial result")
+        return PartialResult(results, skipped)
     return results
 
 
+def get_top_n_questions(
+    query: str,
+    set_list: List[str],
+    n: int,
+    base_url: str = "https://www.qbreader.org/api",
+    *,
+    case_sensitive: bool = False,
+    exact_phrase: bool = False,
+    # optional: filter by difficulty (int, string, or list of ints/strings)
+    difficulty: Optional[Union[int, str, List[Union[int, str]]]] = None,
+    # optional: filter by category (string or list of strings); pass exact category names (e.g., "Literature")
+    category: Optional[Union[str, List[str]]] = None,
+    # optional: if you want to override per-request maxReturnLength cap
+    request_timeout: int = 15,
+    max_concurrency: int = 8,
+    client: Optional["QBReaderClient"] = None,
+    mirror: Optional["QuestionMirror"] = None,
+    batch_sets: bool = False,
+    refill: bool = True,
+    dedupe_threshold: Optional[float] = None,
+    raw_mode: str = "full",
+    deadline: Optional[Deadline] = None,
+    hedge_after: float = DEFAULT_HEDGE_AFTER,
+    ) -> List[QuestionRecord]:
+    """
+    Pull the top `n` questions whose ANSWER contains `query`, evenly split across
+    the provided set_list and evenly between tossups and bonuses per-set.
+
+    Synchronous wrapper around get_top_n_questions_async (the requests are sent
+    concurrently). Don't call this from inside a running event loop; await
+    get_top_n_questions_async instead.
+
+    Parameters:
+        query: search string to look for inside answerlines (searchType=answer).
+        set_list: list of set names (each will be queried separately).
+        n: total number of questions desired across all sets and types.
+        base_url: QBReader API base.
+        case_sensitive, exact_phrase: forwarded to API.
+        request_timeout: per-request timeout in seconds.
+        max_concurrency: max number of /query requests in flight at once.
+        client: QBReaderClient to send requests through (default: shared client).
+        mirror: QuestionMirror to answer from locally instead of the network.
+        batch_sets: fetch many sets with a few multi-set queries and split them locally.
+        refill: make up sets that under-deliver from sets that still have matches.
+        dedupe_threshold: drop near-duplicate questions at this similarity (None = keep all).
+        raw_mode: keep each API object as "full" dict, "lazy" JSON bytes, or "none".
+        deadline: Deadline for the whole call; late requests are hedged, then skipped.
+        hedge_after: seconds before a slow request is duplicated (with a deadline).
+
+    Returns:
+        List of QuestionRecords (dict-like mappings with keys type, id, answer, question,
+        setName and, unless raw_mode="none", raw) -- a PartialResult if the deadline
+        cut retrieval short.
+    """
+    client = client or get_default_client()
+    # runs on the client's background loop, so its aiohttp pool stays open between calls
+    return client.run(get_top_n_questions_async(
+        query,
+        set_list,
+        n,
+        base_url,
+        case_sensitive=case_sensitive,
+        exact_phrase=exact_phrase,
+        difficulty=difficulty,
+        category=category,
+        request_timeout=request_timeout,
+        max_concurrency=max_concurrency,
+        client=client,
+        mirror=mirror,
+        batch_sets=batch_sets,
+        refill=refill,
+        dedupe_threshold=dedupe_threshold,
+        raw_mode=raw_mode,
+        deadline=deadline,
+        hedge_after=hedge_after,
+    ))
+
+
+async def aiter_questions(
+    query: str,
+    set_list: List[str],
+    n: int,
+    base_url: str = "https://www.qbreader.org/api",
+    *,
+    case_sensitive: bool = False,
+    exact_phrase: bool = False,
+    difficulty: Optional[Union[int, str, List[Union[int, str]]]] = None,
+    category: Optional[Union[str, List[str]]] = None,
+    request_timeout: int = 15,
+    max_concurrency: int = 8,
+    client: Optional["QBReaderClient"] = None,
+    mirror: Optional["QuestionMirror"] = None,
+    sentences: Optional[int] = None,
+    dedupe_threshold: Optional[float] = None,
+    raw_mode: str = "full",
+) -> AsyncIterator[Union[QuestionRecord, Tuple[QuestionRecord, str]]]:
+    """
+    Async-iterator version of get_top_n_questions that yields each normalized question
+    as soon as its page arrives, so later stages can start before the slowest set answers.
+
+    Questions come out in arrival order (not grouped by set) and stop after `n`; there is
+    no shortfall refill. With `sentences` set, yields (question, first_n_sentences(question
+    text, sentences)) pairs instead of bare question dicts. With `dedupe_threshold`,
+    near-duplicates of questions already yielded are skipped.
+    """
+    if n <= 0:
+        return
+    if not set_list:
+        set_list = ["undefined"]
+
+    planned = _plan_query_requests(
+        query, set_list, n,
+        case_sensitive=case_sensitive,
+        exact_phrase=exact_phrase,
+        difficulty=difficulty,
+        category=category,
+    )
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    dedupe = None
+    if dedupe_threshold is not None:
+        from near_duplicates import NearDuplicateIndex
+        dedupe = NearDuplicateIndex(dedupe_threshold)
+
+    async def _fetch_one(params: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        if mirror is not None:
+            return params, await mirror.query_async(params)
+        async with semaphore:
+            return params, await _fetch_query_page_async(base_url, params, timeout=request_timeout, client=client)
+
+    tasks = [asyncio.ensure_future(_fetch_one(p)) for p in planned]
+    emitted = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            params, data = await next_done
+            for question in _normalize_page(data, params, query, raw_mode):
+                if emitted >= n:
+                    return
+                if dedupe is not None and dedupe.add(question["id"] or id(question), question["question"] or "") is not None:
+                    continue
+                emitted += 1
+                if sentences:
+                    yield question, first_n_sentences(question.get("question"), n=sentences)
+                else:
+                    yield question
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def iter_questions(
+    query: str,
+    set_list: List[str],
+    n: int,
+    base_url: str = "https://www.qbreader.org/api",
+    *,
+    case_sensitive: bool = False,
+    exact_phrase: bool = False,
+    difficulty: Optional[Union[int, str, List[Union[int, str]]]] = None,
+    category: Optional[Union[str, List[str]]] = None,
+    request_timeout: int = 15,
+    max_concurrency: int = 8,
+    client: Optional["QBReaderClient"] = None,
+    mirror: Optional["QuestionMirror"] = None,
+    sentences: Optional[int] = None,
+    dedupe_threshold: Optional[float] = None,
+    raw_mode: str = "full",
+) -> Iterator[Union[QuestionRecord, Tuple[QuestionRecord, str]]]:
+    """
+    Generator version of aiter_questions for synchronous callers (same arguments/yields).
+
+    Drives the async generator on the client's background loop one item at a time, so
+    requests already in flight keep going in between and the connection pool is reused
+    by later calls. Don't call this from inside a running event loop.
+    """
+    client = client or get_default_client()
+    agen = aiter_questions(
+        query,
+        set_list,
+        n,
+        base_url,
+        case_sensitive=case_sensitive,
+        exact_phrase=exact_phrase,
+        difficulty=difficulty,
+        category=category,
+        request_timeout=request_timeout,
+        max_concurrency=max_concurrency,
+        client=client,
+        mirror=mirror,
+        sentences=sentences,
+        dedupe_threshold=dedupe_threshold,
+        raw_mode=raw_mode,
+    )
+    try:
+        while True:
+            try:
+                yield client.run(agen.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        client.run(agen.aclose())
+
+
 def find_matches(available_sets: List[str], query: str) -> List[str]:
     """
     Return all sets from `available_sets` whose name contains `query`
-    (case-insensitive).
+    (case-insensitive), in set-list order. Served from the set-name index; for ranked
+    search with year/level filters and typo tolerance use set_index.SetNameIndex.search.
     """
-    q = (query or "").strip().lower()
-    if not q:
+    from set_index import get_set_index
+
+    if not (query or "").strip():
         return []
-    return [s for s in available_sets if q in s.lower()]
+    return get_set_index(available_sets).containing(query.strip())
 
 
 
@@ -292,6 +914,13 @@ def select_params(available_sets: List[str]) -> Optional[tuple]:
         "Other Academic", "Pop Culture"
     ]
 
+    from set_index import get_set_index
+
+    # built once per set-list snapshot and cached on disk, so searches are instant
+    set_index = get_set_index(available_sets)
+    AUTO_ADD_LIMIT = 5
+    SHOW_LIMIT = 15
+
     chosen_sets: List[str] = []
     chosen_difficulties: List[str] = []
     chosen_categories: List[str] = []
@@ -302,7 +931,8 @@ def select_params(available_sets: List[str]) -> Optional[tuple]:
 
     # --- Sets selection (search-style, allow 'all' or 'done') ---
     print("\n--- Select Sets ---")
-    print("You may search sets by typing a substring; matching sets will be added automatically.")
+    print("You may search sets by typing a substring; a handful of matches are added automatically,")
+    print("otherwise you pick from the best ones. Years ('2019', '2015-2019') and levels ('hs', 'college') narrow the search.")
     print("Type 'all' to select ALL sets (this will return None for sets meaning search all).")
     print("Type 'done' to finish selection (if you type 'done' with nothing selected, the whole function returns None).")
 
@@ -321,10 +951,26 @@ def select_params(available_sets: List[str]) -> Optional[tuple]:
             # skip sets selection
             break
 
-        matches = find_matches(available_sets, user)
-        if not matches:
+        hits = set_index.search(user)
+        if not hits:
             print(f"No matches found for '{user}'. Try another substring or type 'all' or 'done'.")
             continue
+        matches = [h.name for h in hits]
+        if hits[0].fuzzy or len(matches) > AUTO_ADD_LIMIT:
+            # too many (or only approximate) hits to add blindly: show the best and let the user pick
+            shown = matches[:SHOW_LIMIT]
+            print(("No exact matches; closest sets:" if hits[0].fuzzy else
+                   f"{len(matches)} matches, best first (showing {len(shown)}):"))
+            for i, name in enumerate(shown, 1):
+                print(f"  {i}. {name}")
+            pick = _prompt_list(f"Add which? (numbers like '1,3', 'all' for all {len(matches)}, Enter for none): ")
+            if pick.lower() == "all":
+                pass
+            elif not pick:
+                continue
+            else:
+                nums = [int(p) for p in re.split(r"[,\s]+", pick) if p.isdigit()]
+                matches = [shown[i - 1] for i in nums if 1 <= i <= len(shown)]
         added = 0
         for m in matches:
             if chosen_sets is None:
@@ -473,19 +1119,143 @@ def _strip_html(text: str) -> str:
     t = _RE_WHITESPACE.sub(" ", t)
     return t.strip()
 
-# sentence-finding regex:
-# - Lazy-match from start up to a sentence end punctuation [.?!]
-# - require that the punctuation is followed by either end-of-string OR whitespace + capital/quote/ digit
-_SENTENCE_RE = re.compile(r"""
-    (               # capture one sentence
-      .*?           # minimal text
-      [\.!?]        # sentence-ending punctuation
-    )
-    (?=             # only accept if followed by:
-      \s+["'(\[]?[A-Z0-9]   # whitespace then optional quote/parens then uppercase/digit (next sentence start)
-      |$            # or end of string
-    )
-""", re.VERBOSE | re.DOTALL)
+# sentence segmentation: one left-to-right walk over the raw HTML that drops tags and
+# finds sentence boundaries at the same time (no lazy-match/lookahead re-tries). The
+# walk goes token by token -- a tag, a cluster of terminal punctuation, or a run of
+# anything else -- so the Python loop only runs a few times per sentence. A boundary is
+# terminal punctuation [.!?] (plus any closing quotes/brackets) followed by whitespace,
+# an optional opening quote/bracket and an uppercase letter or digit. After a known
+# abbreviation, an uppercase single-letter initial ("J. S. Bach") or a dotted acronym
+# ("U.S.", "e.g.") the "." only ends the sentence when the next word is a common
+# sentence opener ("... in D.C. He ...", "vitamin C. This ..."). Quote entities
+# (&quot;, &rdquo;, ...) count as quotes and &nbsp; as whitespace; other entities are
+# left as they are.
+#
+# Known misses: a sentence that ends in an initial or acronym and is followed by one
+# opening with a name or a word outside _SENTENCE_OPENERS ("... left the U.S. Lincoln
+# won ...") stays joined to it, and an initial before a surname that is also an opener
+# ("Y. He") splits.
+_CLOSE_ENTITY = r"&(?:quot|rdquo|rsquo|apos|#34|#39|#8221|#8217);"
+_OPEN_ENTITY = r"&(?:quot|ldquo|lsquo|apos|#34|#39|#8220|#8216);"
+_CLOSERS_RE = re.compile(rf"(?:[\"')\]”’]|{_CLOSE_ENTITY})+$")
+_LEADING_RE = re.compile(rf"(?:\s|&nbsp;|&#160;|[\"'(\[“‘]|{_OPEN_ENTITY})*")
+_OPENERS_AND_AMP = frozenset("\"'([“‘&")
+_SPACE_RE = re.compile(r"(?:\s|&nbsp;|&#160;)+")
+_FIRST_WORD_RE = re.compile(r"[A-Za-z]+")
+_TOKEN_RE = re.compile(rf"(<[^>]+>)|([.!?]+(?:[\"')\]”’]|{_CLOSE_ENTITY})*)|([^<.!?]+|<)")
+_TOKEN_NO_TAGS_RE = re.compile(rf"()([.!?]+(?:[\"')\]”’]|{_CLOSE_ENTITY})*)|([^.!?]+)")
+_ABBREVIATIONS = frozenset({
+    "mr", "mrs", "ms", "dr", "st", "mt", "ft", "jr", "sr", "vs", "no", "vol", "op",
+    "prof", "rev", "fr", "gen", "col", "lt", "sgt", "capt", "cmdr", "adm", "sen", "rep",
+    "gov", "pres", "inc", "co", "corp", "ltd", "bros", "approx", "ca", "cf", "al", "ch",
+    "fig", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+    "c", "p", "pp", "v",
+})
+# words that start sentences but (almost) never names, so they end an "abbreviation"
+_SENTENCE_OPENERS = frozenset({
+    "the", "this", "these", "that", "those", "he", "she", "it", "its", "his", "her",
+    "they", "their", "in", "on", "at", "for", "after", "before", "during", "when",
+    "while", "one", "name", "identify", "give", "next", "later", "then", "however",
+    "although", "with", "from", "many", "some", "another", "both", "each", "despite",
+})
+
+
+def _ends_sentence(word: str) -> str:
+    """
+    Whether `word` (ending in terminal punctuation, closers included) ends a sentence:
+    "hard" (it does before any capitalised word), "soft" (an abbreviation, initial or
+    acronym dot: only before a sentence opener) or "" (no terminal punctuation).
+    """
+    core = word
+    if word[-1] not in ".!?":
+        closers = _CLOSERS_RE.search(word)
+        core = word[:closers.start()] if closers else word
+    if not core or core[-1] != ".":
+        return "hard" if core else ""
+    stem = core.rstrip(".")
+    if stem[:1] in _OPENERS_AND_AMP:
+        stem = stem[_LEADING_RE.match(stem).end():]
+    if not stem or core.endswith(".."):
+        return "hard"
+    if len(stem) == 1 and stem.isupper():
+        return "soft"
+    return "soft" if "." in stem or stem.lower() in _ABBREVIATIONS else "hard"
+
+
+def _iter_tokens(text: str):
+    # tags can only end at or before the last ">"; tokenizing the rest without the tag
+    # alternative keeps a stray "<" from re-scanning to the end of the string
+    last_gt = text.rfind(">")
+    yield from _TOKEN_RE.finditer(text, 0, last_gt + 1)
+    yield from _TOKEN_NO_TAGS_RE.finditer(text, last_gt + 1)
+
+
+def _split_sentences(html_text: str, limit: Optional[int] = None) -> List[str]:
+    """
+    Split `html_text` into cleaned sentences (tags removed, whitespace collapsed) in a
+    single linear pass. Stops after `limit` sentences if given; trailing text without
+    terminal punctuation counts as a final sentence.
+    """
+    sentences: List[str] = []
+    buf: List[str] = []        # raw pieces of the current sentence
+    held = ""                  # whitespace/openers seen while a boundary is undecided
+    word = ""                  # current word (may span tags, e.g. "<i>U.S.</i>")
+    # 0: inside a sentence, 1: just saw terminal punctuation, 2: punctuation + whitespace
+    state = 0
+    soft = False               # the punctuation was an abbreviation/initial/acronym dot
+    for m in _iter_tokens(html_text or ""):
+        if m.group(1):
+            continue
+        punct = m.group(2)
+        if punct:
+            if held:
+                buf.append(held)
+                held = ""
+            buf.append(punct)
+            word += punct
+            kind = _ends_sentence(word)
+            state = 1 if kind else 0
+            soft = kind == "soft"
+            continue
+
+        run = m.group(3)
+        starts_sentence = False
+        if state and (state == 2 or run[0].isspace() or (run[0] == "&" and _SPACE_RE.match(run))):
+            body = run.lstrip()
+            if body[:1] in _OPENERS_AND_AMP:
+                body = body[_LEADING_RE.match(body).end():]
+            if not body:
+                held += run
+                state = 2
+                continue
+            if body[0].isupper() or body[0].isdigit():
+                first = _FIRST_WORD_RE.match(body)
+                if not soft or (first is not None and first.group().lower() in _SENTENCE_OPENERS):
+                    sentence = _RE_WHITESPACE.sub(" ", "".join(buf)).strip()
+                    if sentence:
+                        sentences.append(sentence)
+                        if limit is not None and len(sentences) >= limit:
+                            return sentences
+                    buf = []
+                    starts_sentence = True
+        if held:
+            run = held + run
+            held = ""
+        space = _SPACE_RE.match(run) if starts_sentence and run[0] == "&" else None
+        buf.append(run[space.end():] if space else run)  # no leading &nbsp; on a new sentence
+        state = 0
+
+        if run[-1].isspace():
+            word = ""
+        else:
+            last = run.rsplit(None, 1)
+            word = last[-1] if len(last) > 1 or run[0].isspace() else word + run
+
+    tail = _RE_WHITESPACE.sub(" ", "".join(buf) + held).strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
 
 def first_n_sentences(html_text: str, n: int = 2) -> str:
     """
@@ -493,30 +1263,110 @@ def first_n_sentences(html_text: str, n: int = 2) -> str:
     Strips HTML, collapses whitespace, and heuristically tokenizes sentences.
     If fewer than `n` sentences are present, returns the whole cleaned text.
     """
-    s = _strip_html(html_text)
-    if not s:
+    if not html_text or n <= 0:
         return ""
-    sentences: List[str] = []
-    for m in _SENTENCE_RE.finditer(s):
-        sentences.append(m.group(1).strip())
-        if len(sentences) >= n:
-            break
-    if sentences:
-        return " ".join(sentences)
-    # fallback: if regex failed to find sentence boundaries, split on newline or return prefix
-    parts = re.split(r"\.\s+|\?\s+|!\s+", s)
-    if len(parts) <= n:
-        return s
-    # re-add punctuation from original by taking substring
-    # conservative fallback: return first n parts joined with ". "
-    return ". ".join(p.strip() for p in parts[:n]) + (". " if not s.endswith((".", "?", "!")) else "")
+    with metrics.span("first_n_sentences", trace=False):
+        return " ".join(_split_sentences(html_text, limit=n))
+
+
+def first_n_sentences_batch(html_texts: Iterable[Optional[str]], n: int = 2) -> List[str]:
+    """first_n_sentences over many questions at once, in input order."""
+    return [first_n_sentences(t, n) for t in html_texts]
 
 #TODO: implement function that goes from 2 sentence questions -> most valuable parts summary and 3 practice questions (made from just this stuff)
 # return json format {overall_summary: , 
 #                     power_summary: ,
 #                     hard_qs: ,
 #                     related entities: []}
-def extract_larger_trends(query, unfiltered_sentences, filtered_sentences, client):
+
+GEMINI_MODEL = "gemini-2.5-flash-lite"
+# bump whenever the prompt text in extract_larger_trends changes, so cached answers to
+# the old prompt stop being served
+TREND_PROMPT_VERSION = 3
+# estimated tokens allowed for the question data in the trend prompt (the template
+# itself adds roughly 400 more); see prompt_builder.build_prompt_sections
+DEFAULT_PROMPT_TOKEN_BUDGET = 6000
+
+_TREND_CACHE: Optional[ResponseCache] = None
+
+
+class TrendReply(NamedTuple):
+    """What extract_larger_trends returns; indexable like the old (text, cache_hit) pair."""
+    text: str
+    cache_hit: bool
+    partial: bool = False  # the deadline cut the Gemini reply short (or prevented the call)
+
+
+def get_trend_cache() -> ResponseCache:
+    """Shared on-disk cache of Gemini trend extractions (30-day TTL, LRU-capped)."""
+    global _TREND_CACHE
+    if _TREND_CACHE is None:
+        _TREND_CACHE = ResponseCache(
+            DEFAULT_CACHE_PATH.with_name("gemini.sqlite3"),
+            ttls={"gemini": 30 * 24 * 3600},
+            max_entries=5000,
+        )
+    return _TREND_CACHE
+
+
+def _trend_cache_key(
+    query: str,
+    unfiltered_sentences: List[str],
+    filtered_sentences: List[str],
+    model: str,
+    token_budget: Optional[int] = None,
+    clue_prefilter: Optional[int] = None,
+) -> str:
+    """Content hash of everything that determines the Gemini output."""
+    def _norm(items: List[str]) -> List[str]:
+        return [_RE_WHITESPACE.sub(" ", str(x or "")).strip() for x in items]
+
+    parts = [model, TREND_PROMPT_VERSION, token_budget, query.strip(),
+             _norm(unfiltered_sentences), _norm(filtered_sentences)]
+    if clue_prefilter:
+        parts.append(["clue_prefilter", clue_prefilter])
+    blob = json.dumps(parts, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def extract_larger_trends(
+    query,
+    unfiltered_sentences,
+    filtered_sentences,
+    client,
+    *,
+    cache: Optional[ResponseCache] = None,
+    use_cache: bool = True,
+    token_budget: Optional[int] = DEFAULT_PROMPT_TOKEN_BUDGET,
+    on_field: Optional[Callable[[str, Any], None]] = None,
+    clue_prefilter: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
+) -> Optional[TrendReply]:
+    """
+    Ask Gemini for summaries/hard questions/related entities built from the questions.
+
+    The question data goes through prompt_builder: power clues are sent once, the
+    regular section only carries the clues after them, near-duplicate clues are
+    dropped, and the data is capped at `token_budget` estimated tokens (None = no cap),
+    keeping the earliest clues. With `clue_prefilter=k`, clue_ranker picks the top k
+    clue phrases locally first and later clues mentioning none of them are not sent.
+
+    The reply is streamed: `on_field(name, value)` is called for each of
+    overall_summary / power_summary / hard_questions / related_entities as soon as it
+    is complete (default: print it). Use parse_gemini_response on the returned text
+    for the whole result.
+
+    Identical inputs (same model, prompt version, query and whitespace-normalized
+    sentences) are answered from the trend cache instead of calling Gemini again.
+
+    With `deadline`, Gemini is not called once it has passed, and a reply still
+    streaming at the deadline is cut off there: the fields completed so far are kept
+    (the rest repaired/defaulted as for truncated output), the reply is marked partial
+    and not cached.
+
+    Returns:
+        TrendReply(text, cache_hit, partial), or None if an input is missing.
+    """
     if not query:
         print("Missing query, exiting")
         return
@@ -531,15 +1381,23 @@ def extract_larger_trends(query, unfiltered_sentences, filtered_sentences, clien
     
     if len(filtered_sentences) != len(unfiltered_sentences):
         print(f"Warning, unequeal length sentence groups:\nUnfiltered: {len(unfiltered_sentences)}\nFiltered: {len(filtered_sentences)}")
-    # turn filtered sentences and unfiltered into a str seperated by "\n"
-    filtered_sentences_str = filtered_sentences[0]
-    unfiltered_sentences_str = unfiltered_sentences[0]
+    from prompt_builder import build_prompt_sections, estimate_tokens
 
-    for q in unfiltered_sentences[1:]:
-        unfiltered_sentences_str += f"\n{q}"
-    
-    for q in filtered_sentences[1:]:
-        filtered_sentences_str += f"\n{q}"
+    keep_phrases = None
+    if clue_prefilter:
+        from clue_ranker import rank_clues
+        ranked = rank_clues(unfiltered_sentences, filtered_sentences, query=query, top_k=clue_prefilter)
+        keep_phrases = [c.phrase for c in ranked] or None
+
+    # one line per question: power clues, then the rest of each question (deduplicated, budgeted)
+    sections = build_prompt_sections(
+        unfiltered_sentences, filtered_sentences, token_budget=token_budget, keep_phrases=keep_phrases,
+    )
+    if sections.dropped_duplicates or sections.dropped_for_budget or sections.dropped_unranked:
+        print(f"Prompt: ~{sections.tokens} data tokens, dropped {sections.dropped_duplicates} duplicate, "
+              f"{sections.dropped_unranked} unranked and {sections.dropped_for_budget} over-budget clues")
+    filtered_sentences_str = sections.power_text
+    unfiltered_sentences_str = sections.later_text
 
     prompt = f"""Based on this information about {query}, please generate the following:
                 1. Overall Summary: a string overall summary based on both the power and regular questions, which gives the reader context on the query and their interactions. I want this summary to almost read like a mini wikipedia article, so please include 4-6 sentences that make a detailed summary. 
@@ -568,18 +1426,71 @@ def extract_larger_trends(query, unfiltered_sentences, filtered_sentences, clien
                 {filtered_sentences_str}
                 
 
-                Regular Questions (the same questions, but not filtered to power parts):
+                Regular Questions (the rest of the same questions, continuing after the power parts; each line's [Q<n>] label matches the power line of the question it continues):
                 {unfiltered_sentences_str}
                 """
-    
-
-    # get response from gemini -> send to parse function
-    response = client.models.generate_content(
-    model="gemini-2.5-flash-lite",
-    contents=prompt,
-    )
 
-    print(response.text)
+    if on_field is None:
+        on_field = _print_trend_field
+    parser = TrendStreamParser()
+
+    if use_cache:
+        cache = cache or get_trend_cache()
+        key = _trend_cache_key(
+            query, unfiltered_sentences, filtered_sentences, GEMINI_MODEL, token_budget, clue_prefilter,
+        )
+        cached = cache.get("gemini", key)
+        metrics.inc("qbt_gemini_cache_total", result="miss" if cached is None else "hit")
+        if cached is not None:
+            for name, value in parser.feed(cached):
+                on_field(name, value)
+            return TrendReply(cached, True)
+
+    if deadline is not None and deadline.expired:
+        print("Deadline reached before the Gemini call, returning a partial result")
+        return TrendReply("", False, True)
+
+    # stream the response from gemini; each field is handed on as soon as it is complete
+    chunks: List[str] = []
+    partial = False
+    usage = None
+
+    def _stream():
+        return client.models.generate_content_stream(model=GEMINI_MODEL, contents=prompt)
+
+    with metrics.span("gemini", model=GEMINI_MODEL) as span:
+        try:
+            for chunk in iter_until(_stream, deadline):
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                text = chunk.text or ""
+                chunks.append(text)
+                for name, value in parser.feed(text):
+                    on_field(name, value)
+        except DeadlineExceeded:
+            print("Deadline reached while Gemini was answering, returning a partial result")
+            partial = True
+        full_text = "".join(chunks)
+        if metrics.enabled():
+            # the API's own counts when it sends usage metadata, else ~4 characters per token
+            prompt_tokens = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+            response_tokens = getattr(usage, "candidates_token_count", None) or estimate_tokens(full_text)
+            metrics.inc("qbt_gemini_tokens_total", prompt_tokens, kind="prompt")
+            metrics.inc("qbt_gemini_tokens_total", response_tokens, kind="response")
+            span.set(prompt_tokens=prompt_tokens, response_tokens=response_tokens, partial=partial)
+
+    # anything the incremental pass couldn't finish (truncated/malformed output) is repaired here
+    emitted = set(parser.fields)
+    for name, value in parser.close().items():
+        if name not in emitted:
+            on_field(name, value)
+
+    if use_cache and full_text and not partial:
+        cache.set("gemini", key, full_text)
+    return TrendReply(full_text, False, partial)
+
+
+def _print_trend_field(name: str, value: Any) -> None:
+    print(json.dumps({name: value}, indent=4, ensure_ascii=False))
 
 
 def get_api_key(var_name: str = "GEMINI_API_KEY", env_path: str = ".env") -> str:
@@ -601,18 +1512,27 @@ def get_api_key(var_name: str = "GEMINI_API_KEY", env_path: str = ".env") -> str
 
 
 def get_gemini_client():
+    from google import genai
+
     api_key = get_api_key()
     client = genai.Client(api_key=api_key)
     return client
 
 
-def parse_gemini_response(response):
-    # take in messy response, filter to after first instance of { and use prior knowledge to repair to:
-    # this format:  {{\"overall_summary\": "",
-    #               \"power_summary\": "",
-    #               \"hard_questions\": ["", "", ""],
-    #               \"related_entities\": ["", "", "", "", ""]}}
-    pass
+def parse_gemini_response(response) -> Dict[str, Any]:
+    """
+    Turn a (possibly messy) Gemini reply -- text or a response object with .text -- into
+    {"overall_summary", "power_summary", "hard_questions", "related_entities"}, repairing
+    fences, trailing commas and truncation; missing fields get empty defaults.
+    """
+    text = response if isinstance(response, str) else (getattr(response, "text", None) or "")
+    parser = TrendStreamParser()
+    parser.feed(text)
+    return parser.close()
+
+
+# upper bound on one interactive run, from the query being entered to the last Gemini field
+CLI_DEADLINE_SECONDS = 90
 
 
 def main():
@@ -620,8 +1540,11 @@ def main():
     """
     Per your instruction, only call the get_set_list helper here and use select_params to collect filters.
     """
+    from set_list_snapshot import get_set_list_snapshot
+
     base = "https://www.qbreader.org/api"
-    all_sets = get_set_list(base)
+    # served from .qb_cache/set_list.json (refreshed in the background) so the prompt shows up at once
+    all_sets = get_set_list_snapshot(base)
     print(f"Found {len(all_sets)} sets (showing up to first 30):")
     for s in all_sets[:30]:
         print(" -", s)
@@ -645,27 +1568,37 @@ def main():
             query = user_query
         exact_phrase = bool(exact_flag)
 
-    results = get_top_n_questions(
+    from adaptive_retrieval import get_questions_adaptive
+
+    # one time budget from here on, shared by retrieval and Gemini
+    deadline = Deadline(CLI_DEADLINE_SECONDS)
+
+    # fetches 5 at a time and stops once new questions stop bringing new clues (10..60 questions)
+    adaptive = get_questions_adaptive(
         query,
         selected_sets,
-        n=20,
+        base,
         difficulty=selected_diff,
         category=selected_cat,
         exact_phrase=exact_phrase,
+        dedupe_threshold=0.8,  # reused tossups would otherwise eat slots and prompt tokens
+        raw_mode="none",
+        deadline=deadline,
     )
+    results = adaptive.questions
+    first_few_sentences = adaptive.first_sentences  # first two sentences of each
+    print(f"Adaptive retrieval: {len(results)} questions in {adaptive.requests} requests "
+          f"(stopped: {adaptive.stop_reason}, ~{adaptive.prompt_tokens} prompt tokens)")
 
     print(f"Returned {len(results)} questions")
     """for r in results[:10]:
         # print the question text (not the answerline)
         print(r["type"], "\n", r.get("setName"), "\n", r.get("id"), "\n", r.get("question"), "\n", r.get("answer"))"""
 
-    first_few_sentences = []
-    for res in results:
-        first_few_sentences.append(first_n_sentences(res.get("question"), n=2))  # filter to first two sentences
-    unfiltered_qs = []
-
     client = get_gemini_client()
-    extract_larger_trends(query=query, unfiltered_sentences=[res.get("question") for res in results], filtered_sentences=first_few_sentences, client=client)
+    reply = extract_larger_trends(query=query, unfiltered_sentences=[res.get("question") for res in results], filtered_sentences=first_few_sentences, client=client, deadline=deadline)
+    if adaptive.partial or (reply is not None and reply.partial):
+        print(f"[PARTIAL RESULT] the {CLI_DEADLINE_SECONDS}s deadline was reached; the output above is incomplete")
 
 
 if __name__ == "__main__":
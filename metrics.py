@@ -0,0 +1,261 @@
+"""
+Per-stage timings and counters for the pipeline, exportable as JSON lines or
+Prometheus text.
+
+Off by default, and then every call below returns at once (span() hands back one shared
+no-op object), so the instrumentation can stay in hot paths. Switch it on with
+enable(), or by setting QB_METRICS before the first import:
+
+    QB_METRICS=1                    collect in memory (export with to_prometheus/write_jsonl)
+    QB_METRICS=trace.jsonl          ... and also append one JSON line per finished span
+
+Recorded:
+    qbt_stage_duration_seconds{stage}     histogram per stage: set_list, qbreader_request
+                                          (label endpoint), normalize, first_n_sentences,
+                                          gemini
+    qbt_qbreader_bytes_total{endpoint}    response bytes received from QBReader
+    qbt_qbreader_cache_total{endpoint,result}   response cache hits / misses
+    qbt_qbreader_retries_total{endpoint}  attempts after the first (429/5xx/connection)
+    qbt_questions_normalized_total        questions out of normalization
+    qbt_gemini_tokens_total{kind}         prompt / response tokens (from the API's usage
+                                          metadata when present, else estimated)
+    qbt_gemini_cache_total{result}        trend cache hits / misses
+
+    with metrics.span("gemini") as sp:
+        ...
+        sp.set(prompt_tokens=1234)      # extra fields for the trace line
+    metrics.inc("qbt_qbreader_bytes_total", len(body), endpoint="query")
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import IO, Any, Dict, Optional, Tuple, Union
+
+# seconds; Prometheus-style cumulative buckets (+Inf is implied)
+DURATION_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_HELP = {
+    "qbt_stage_duration_seconds": "Time spent per pipeline stage.",
+    "qbt_qbreader_bytes_total": "Response bytes received from QBReader.",
+    "qbt_qbreader_cache_total": "QBReader response cache lookups by result.",
+    "qbt_qbreader_retries_total": "QBReader request attempts after the first.",
+    "qbt_questions_normalized_total": "Questions produced by normalization.",
+    "qbt_gemini_tokens_total": "Gemini tokens by kind (prompt/response).",
+    "qbt_gemini_cache_total": "Trend cache lookups by result.",
+}
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+_enabled = False
+_lock = threading.Lock()
+_counters: Dict[str, Dict[_LabelKey, float]] = {}
+_histograms: Dict[str, Dict[_LabelKey, list]] = {}  # [bucket counts..., +Inf count, sum]
+_trace: Optional[IO[str]] = None
+
+
+def _key(labels: Dict[str, Any]) -> _LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """Times one stage; on exit records the duration (and writes a trace line if tracing)."""
+
+    __slots__ = ("name", "labels", "attrs", "trace", "start")
+
+    def __init__(self, name: str, labels: Dict[str, Any], trace: bool):
+        self.name = name
+        self.labels = labels
+        self.attrs: Dict[str, Any] = {}
+        self.trace = trace
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        seconds = time.perf_counter() - self.start
+        _observe("qbt_stage_duration_seconds", seconds, dict(self.labels, stage=self.name))
+        if self.trace and _trace is not None:
+            line = {"ts": round(time.time(), 6), "span": self.name, "seconds": round(seconds, 6)}
+            line.update(self.labels)
+            line.update(self.attrs)
+            if exc_type is not None:
+                line["error"] = exc_type.__name__
+            _write_trace(line)
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(trace_path: Union[str, Path, None] = None) -> None:
+    """Start collecting; with `trace_path`, also append a JSON line per finished span."""
+    global _enabled, _trace
+    with _lock:
+        if trace_path is not None and _trace is None:
+            _trace = open(trace_path, "a", encoding="utf-8")
+        _enabled = True
+
+
+def disable() -> None:
+    global _enabled, _trace
+    with _lock:
+        _enabled = False
+        if _trace is not None:
+            _trace.close()
+            _trace = None
+
+
+def reset() -> None:
+    """Drop everything collected so far (collection stays on/off as it was)."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def span(name: str, trace: bool = True, **labels: Any) -> Union[Span, _NoopSpan]:
+    """Context manager timing one stage (trace=False: histogram only, for per-item stages)."""
+    if not _enabled:
+        return _NOOP
+    return Span(name, labels, trace)
+
+
+def inc(name: str, value: float = 1, **labels: Any) -> None:
+    if not _enabled:
+        return
+    key = _key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+
+
+def _observe(name: str, value: float, labels: Dict[str, Any]) -> None:
+    key = _key(labels)
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        counts = series.get(key)
+        if counts is None:
+            counts = series[key] = [0] * (len(DURATION_BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[len(DURATION_BUCKETS)] += 1
+        counts[-1] += value
+
+
+def _write_trace(line: Dict[str, Any]) -> None:
+    text = json.dumps(line, default=str) + "\n"
+    with _lock:
+        if _trace is not None:
+            _trace.write(text)
+            _trace.flush()
+
+
+# --- export ---------------------------------------------------------------------
+
+def snapshot() -> Dict[str, Any]:
+    """{"counters": {name: [{labels, value}]}, "histograms": {name: [{labels, count, sum, buckets}]}}"""
+    with _lock:
+        counters = {
+            name: [{"labels": dict(k), "value": v} for k, v in sorted(series.items())]
+            for name, series in sorted(_counters.items())
+        }
+        histograms = {}
+        for name, series in sorted(_histograms.items()):
+            rows = []
+            for k, counts in sorted(series.items()):
+                cumulative, buckets = 0, {}
+                for bound, c in zip(DURATION_BUCKETS, counts):
+                    cumulative += c
+                    buckets[str(bound)] = cumulative
+                total = cumulative + counts[len(DURATION_BUCKETS)]
+                buckets["+Inf"] = total
+                rows.append({"labels": dict(k), "count": total, "sum": counts[-1], "buckets": buckets})
+            histograms[name] = rows
+    return {"counters": counters, "histograms": histograms}
+
+
+def write_jsonl(dest: Union[str, Path, IO[str]]) -> None:
+    """One JSON line per series (plus a timestamp), appended to a path or written to a file."""
+    snap = snapshot()
+    ts = round(time.time(), 3)
+    lines = [
+        {"ts": ts, "metric": name, "type": "counter", **row}
+        for name, rows in snap["counters"].items() for row in rows
+    ] + [
+        {"ts": ts, "metric": name, "type": "histogram", **row}
+        for name, rows in snap["histograms"].items() for row in rows
+    ]
+    text = "".join(json.dumps(line) + "\n" for line in lines)
+    if isinstance(dest, (str, Path)):
+        with open(dest, "a", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        dest.write(text)
+
+
+def _labels_text(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for k, v in labels.items()
+    )
+    return "{" + body + "}"
+
+
+def _number(value: float) -> str:
+    """Exact sample value: integers without exponent or rounding, other floats by repr."""
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def to_prometheus() -> str:
+    """Everything collected, in the Prometheus text exposition format."""
+    snap = snapshot()
+    out = []
+    for name, rows in snap["counters"].items():
+        out.append(f"# HELP {name} {_HELP.get(name, name)}")
+        out.append(f"# TYPE {name} counter")
+        for row in rows:
+            out.append(f"{name}{_labels_text(row['labels'])} {_number(row['value'])}")
+    for name, rows in snap["histograms"].items():
+        out.append(f"# HELP {name} {_HELP.get(name, name)}")
+        out.append(f"# TYPE {name} histogram")
+        for row in rows:
+            for bound, count in row["buckets"].items():
+                out.append(f"{name}_bucket{_labels_text(dict(row['labels'], le=bound))} {count}")
+            out.append(f"{name}_sum{_labels_text(row['labels'])} {_number(row['sum'])}")
+            out.append(f"{name}_count{_labels_text(row['labels'])} {row['count']}")
+    return "\n".join(out) + "\n"
+
+
+_env = os.environ.get("QB_METRICS", "").strip()
+if _env and _env not in ("0", "false", "no"):
+    enable(None if _env in ("1", "true", "yes") else _env)
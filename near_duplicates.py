@@ -0,0 +1,157 @@
+"""
+Near-duplicate question detection with MinHash + LSH.
+
+The same tossup gets reused across mirrors, packet editions and sets with only small
+edits (a changed pronoun, an added clue, different markup). NearDuplicateIndex keeps a
+MinHash signature of each question's word shingles and buckets the signatures by LSH
+band, so checking a new question only compares it against the few questions that share
+a bucket -- roughly linear overall instead of comparing every pair. The band shape is
+picked so a pair right at the threshold shares a bucket with probability >= 0.99 (more
+above it), and bucket candidates are confirmed with the exact shingle Jaccard
+similarity, so there are no false positives.
+"""
+
+import re
+import zlib
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from extract_and_filter import _strip_html
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 64
+# chance that a pair exactly at the threshold lands in a shared bucket
+DEFAULT_RECALL = 0.99
+
+# prime just above 2**32, so (a*x + b) % _PRIME is a universal hash of 32-bit x
+_PRIME = np.uint64(4294967311)
+_RE_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_question_text(text: Optional[str]) -> str:
+    """Lowercase, markup and punctuation stripped, single-spaced."""
+    return _RE_NON_WORD.sub(" ", _strip_html(text or "").lower()).strip()
+
+
+def _shingles(text: str, size: int) -> np.ndarray:
+    """CRC32 hashes of the distinct `size`-word shingles of normalized `text`."""
+    words = normalize_question_text(text).split()
+    if len(words) <= size:
+        grams = {" ".join(words)} if words else set()
+    else:
+        grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def _lsh_shape(threshold: float, num_perm: int, recall: float = DEFAULT_RECALL) -> Tuple[int, int]:
+    """
+    (bands, rows) with the most rows per band (fewest false candidates) for which a pair
+    with Jaccard `threshold` still collides in some band with probability >= `recall`:
+    1 - (1 - threshold**rows)**bands. The S-curve midpoint then sits well below the
+    threshold (12 bands of 5 rows -> ~0.61 for 0.8 and 64 permutations).
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if 1.0 - (1.0 - threshold ** rows) ** bands >= recall:
+            best = (bands, rows)
+    return best
+
+
+class NearDuplicateIndex:
+    """
+    Incremental near-duplicate filter.
+
+    add(key, text) returns the key of an already-added question whose word-shingle
+    Jaccard similarity with `text` is >= `threshold`, or None (and then remembers the
+    new question). Keys can be anything hashable, e.g. question ids. A match is found
+    with probability >= `recall` at exactly the threshold, rising quickly above it;
+    nothing below the threshold is ever reported.
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        num_perm: int = DEFAULT_NUM_PERM,
+        shingle_size: int = 3,
+        seed: int = 1,
+        recall: float = DEFAULT_RECALL,
+    ):
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError("threshold must be in (0, 1]")
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # a < 2**31 and x < 2**32 keep a*x + b inside uint64
+        self._a = rng.integers(1, 2**31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**31, size=num_perm, dtype=np.uint64)
+        self.bands, self.rows = _lsh_shape(threshold, num_perm, recall)
+        self._buckets: List[Dict[bytes, List[Hashable]]] = [{} for _ in range(self.bands)]
+        self._shingle_sets: Dict[Hashable, frozenset] = {}
+
+    def __len__(self) -> int:
+        return len(self._shingle_sets)
+
+    def signature(self, shingles: np.ndarray) -> np.ndarray:
+        if not len(shingles):
+            return np.full(len(self._a), np.iinfo(np.uint64).max, dtype=np.uint64)
+        # (num_perm, n_shingles) hash table, min over shingles per permutation
+        hashed = (np.outer(self._a, shingles) + self._b[:, None]) % _PRIME
+        return hashed.min(axis=1)
+
+    def find(self, text: str) -> Optional[Hashable]:
+        """Key of an indexed near-duplicate of `text`, without adding it."""
+        return self._lookup(*self._prepare(text))[0]
+
+    def add(self, key: Hashable, text: str) -> Optional[Hashable]:
+        shingles, sig = self._prepare(text)
+        match, band_keys = self._lookup(shingles, sig)
+        if match is not None:
+            return match
+        self._shingle_sets[key] = frozenset(shingles.tolist())
+        for band, band_key in zip(self._buckets, band_keys):
+            band.setdefault(band_key, []).append(key)
+        return None
+
+    def _prepare(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        shingles = _shingles(text, self.shingle_size)
+        return shingles, self.signature(shingles)
+
+    def _lookup(self, shingles: np.ndarray, sig: np.ndarray) -> Tuple[Optional[Hashable], List[bytes]]:
+        band_keys = [sig[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+        mine = frozenset(shingles.tolist())
+        checked = set()
+        for band, band_key in zip(self._buckets, band_keys):
+            for other in band.get(band_key, ()):
+                if other in checked:
+                    continue
+                checked.add(other)
+                theirs = self._shingle_sets[other]
+                union = len(mine | theirs)
+                if union and len(mine & theirs) / union >= self.threshold:
+                    return other, band_keys
+                if not union:
+                    return other, band_keys  # both empty
+        return None, band_keys
+
+
+def dedupe_questions(
+    questions: Iterable[Dict[str, Any]],
+    threshold: float = DEFAULT_THRESHOLD,
+    *,
+    index: Optional[NearDuplicateIndex] = None,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Split normalized question dicts into (kept, near-duplicates), keeping the first of
+    each group in input order. Pass `index` to dedupe against questions seen earlier.
+    """
+    index = index or NearDuplicateIndex(threshold)
+    kept, dropped = [], []
+    for i, q in enumerate(questions):
+        key = q.get("id") or f"#{len(index)}:{i}"
+        if index.add(key, q.get("question") or "") is None:
+            kept.append(q)
+        else:
+            dropped.append(q)
+    return kept, dropped
@@ -0,0 +1,166 @@
+"""
+Background prefetching at lower priority than live requests.
+
+Prefetcher runs speculative jobs (e.g. retrieval for the related_entities Gemini just
+suggested) from a bounded priority queue, only while no live request is in progress,
+and keeps the results in a small LRU so a follow-up request can be answered at once.
+
+    prefetcher = Prefetcher(run_job)          # run_job(params) -> awaitable result
+    prefetcher.start()
+    prefetcher.submit(key, params, priority=i)
+    async with prefetcher.live():             # around every live request
+        result = prefetcher.warm(key) or await compute(...)
+    await prefetcher.aclose()
+"""
+
+import asyncio
+import contextlib
+import itertools
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+
+class Prefetcher:
+    """
+    Parameters:
+        run: coroutine function computing one job's result from its params.
+        max_queue: queued jobs beyond this are rejected (submit returns False).
+        workers: jobs run at once (each still waits for live traffic to clear).
+        max_warm: finished results kept (least recently used are evicted).
+        warm_ttl: seconds a finished result stays usable.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[Dict[str, Any]], Awaitable[Any]],
+        *,
+        max_queue: int = 16,
+        workers: int = 1,
+        max_warm: int = 256,
+        warm_ttl: float = 600.0,
+    ):
+        self._run = run
+        self._queue: "asyncio.PriorityQueue[Tuple[int, int, Hashable, Dict[str, Any]]]" = \
+            asyncio.PriorityQueue(maxsize=max_queue)
+        self._seq = itertools.count()
+        self._workers = workers
+        self._tasks: list = []
+        self._queued: Set[Hashable] = set()
+        self._running: Dict[Hashable, asyncio.Task] = {}
+        self._warm: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.max_warm = max_warm
+        self.warm_ttl = warm_ttl
+        self._live = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.stats = {"submitted": 0, "rejected": 0, "completed": 0, "failed": 0, "cancelled": 0, "hits": 0}
+
+    # --- live traffic gate ---
+
+    @contextlib.asynccontextmanager
+    async def live(self) -> AsyncIterator[None]:
+        """Mark a live request in progress; no new prefetch job starts until it ends."""
+        self._live += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self._live -= 1
+            if self._live == 0:
+                self._idle.set()
+
+    # --- queue ---
+
+    def submit(self, key: Hashable, params: Dict[str, Any], priority: int = 0) -> bool:
+        """Queue a job (lower priority runs first). False if full, already known, or warm."""
+        if key in self._queued or key in self._running or self.warm(key, count_hit=False) is not None:
+            return False
+        try:
+            self._queue.put_nowait((priority, next(self._seq), key, params))
+        except asyncio.QueueFull:
+            self.stats["rejected"] += 1
+            return False
+        self._queued.add(key)
+        self.stats["submitted"] += 1
+        return True
+
+    def cancel(self, key: Optional[Hashable] = None, *, running: bool = True) -> int:
+        """
+        Drop a queued job and cancel it if running (key=None: all of them). With
+        running=False a job that has already started is left to finish, e.g. because a
+        live request is about to join it. Returns how many were dropped or cancelled.
+        """
+        keys = set(self._queued) | set(self._running) if key is None else {key}
+        dropped = 0
+        for k in keys:
+            if k in self._queued:
+                self._queued.discard(k)  # the worker skips it when it comes up
+                dropped += 1
+            task = self._running.get(k)
+            if task is not None and running:
+                task.cancel()
+                dropped += 1
+        self.stats["cancelled"] += dropped
+        return dropped
+
+    def warm(self, key: Hashable, count_hit: bool = True) -> Optional[Any]:
+        """A finished, unexpired result for `key`, or None."""
+        entry = self._warm.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.warm_ttl:
+            del self._warm[key]
+            return None
+        self._warm.move_to_end(key)
+        if count_hit:
+            self.stats["hits"] += 1
+        return entry[1]
+
+    # --- workers ---
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(max(1, self._workers))]
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, key, params = await self._queue.get()
+            try:
+                if key not in self._queued:
+                    continue  # cancelled while queued
+                await self._idle.wait()
+                if key not in self._queued:
+                    continue
+                self._queued.discard(key)
+                task = asyncio.ensure_future(self._run(params))
+                self._running[key] = task
+                try:
+                    result = await task
+                except asyncio.CancelledError:
+                    if not task.cancelled():
+                        raise  # the worker itself is being stopped
+                    continue
+                except Exception:
+                    self.stats["failed"] += 1
+                    continue
+                finally:
+                    self._running.pop(key, None)
+                self._warm[key] = (time.monotonic(), result)
+                self._warm.move_to_end(key)
+                while len(self._warm) > self.max_warm:
+                    self._warm.popitem(last=False)
+                self.stats["completed"] += 1
+            finally:
+                self._queue.task_done()
+
+    async def join(self) -> None:
+        """Wait until every queued job has been run or skipped."""
+        await self._queue.join()
+
+    async def aclose(self) -> None:
+        self.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
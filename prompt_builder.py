@@ -0,0 +1,171 @@
+"""
+Token-budgeted data sections for the Gemini trend prompt.
+
+The filtered (power) sentences are prefixes of the unfiltered questions, so sending both
+in full repeats most of the text. build_prompt_sections() instead sends each question's
+power clues once plus only the clues that come after them, drops near-identical clues
+(reused tossups, mirrored packets), and stops adding clues once an estimated token
+budget is spent -- earliest clues first, since those matter most for buzzing.
+
+Each line is labelled with its question's number ("[Q3] ..."), so a question's later
+clues can be matched to its power clues even when one of the two lost all its clues.
+"""
+
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from extract_and_filter import DEFAULT_PROMPT_TOKEN_BUDGET, _split_sentences
+
+# word-set Jaccard at or above which two clues count as the same clue
+NEAR_DUPLICATE_JACCARD = 0.8
+
+_RE_WORD = re.compile(r"[a-z0-9]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English prose)."""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def _clue_words(sentence: str) -> FrozenSet[str]:
+    return frozenset(_RE_WORD.findall(sentence.lower()))
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+@dataclass
+class PromptSections:
+    """Per-question clue lines for the prompt plus what was left out."""
+    power_lines: List[str] = field(default_factory=list)
+    later_lines: List[str] = field(default_factory=list)
+    tokens: int = 0
+    dropped_duplicates: int = 0     # near-duplicates, wherever they fell relative to the budget
+    dropped_for_budget: int = 0     # distinct clues left out because the budget ran out
+    dropped_unranked: int = 0
+
+    @property
+    def power_text(self) -> str:
+        return "\n".join(self.power_lines)
+
+    @property
+    def later_text(self) -> str:
+        return "\n".join(self.later_lines)
+
+
+def _label(question_index: int) -> str:
+    return f"[Q{question_index + 1}] "
+
+
+def _split_question(unfiltered: str, filtered: Optional[str]) -> Tuple[List[str], List[str]]:
+    """(power sentences, later sentences) for one question, without repeating the power part."""
+    power = _split_sentences(filtered or "")
+    full = _split_sentences(unfiltered or "")
+    if full[:len(power)] == power:
+        return power, full[len(power):]
+    seen = set(power)
+    return power, [s for s in full if s not in seen]
+
+
+def question_tokens(unfiltered: str, filtered: Optional[str], question_index: int = 0) -> int:
+    """
+    Estimated prompt tokens for one question as build_prompt_sections charges them
+    before deduplication: its power and later clues, each sent once, plus line labels.
+    """
+    power, later = _split_question(unfiltered, filtered)
+    tokens = sum(estimate_tokens(s) + 1 for s in power + later)
+    tokens += estimate_tokens(_label(question_index)) * (bool(power) + bool(later))
+    return tokens
+
+
+def build_prompt_sections(
+    unfiltered_sentences: Sequence[str],
+    filtered_sentences: Sequence[str],
+    token_budget: Optional[int] = DEFAULT_PROMPT_TOKEN_BUDGET,
+    similarity: float = NEAR_DUPLICATE_JACCARD,
+    keep_phrases: Optional[Sequence[str]] = None,
+) -> PromptSections:
+    """
+    Choose which clues go into the prompt.
+
+    Clues are considered earliest-first: every question's power clues, then every
+    question's first later clue, then the second, and so on. A clue is skipped if it is
+    a near-duplicate (word Jaccard >= `similarity`, compared exactly) of one already
+    kept; once the next clue would overflow `token_budget` (None = unlimited) the rest
+    are dropped.
+
+    With `keep_phrases` (e.g. from clue_ranker.rank_clues), later clues that mention
+    none of those phrases are left out; power clues are always considered.
+
+    Returns:
+        PromptSections with one power line and one later-clue line per question that
+        kept anything, in question order, each starting with "[Q<n>] " (n = the
+        question's 1-based position in the input).
+    """
+    split = [
+        _split_question(u, filtered_sentences[i] if i < len(filtered_sentences) else None)
+        for i, u in enumerate(unfiltered_sentences)
+    ]
+
+    # (section, depth, question, sentence) -- sorting puts early clues first
+    candidates = []
+    for qi, (power, later) in enumerate(split):
+        candidates.extend((0, depth, qi, s) for depth, s in enumerate(power))
+        candidates.extend((1, depth, qi, s) for depth, s in enumerate(later))
+    candidates.sort(key=lambda c: (c[0], c[1], c[2]))
+
+    out = PromptSections()
+    if keep_phrases is not None:
+        wanted = [f" {' '.join(_RE_WORD.findall(p.lower()))} " for p in keep_phrases]
+        before = len(candidates)
+        candidates = [
+            c for c in candidates
+            if c[0] == 0 or any(w in f" {' '.join(_RE_WORD.findall(c[3].lower()))} " for w in wanted)
+        ]
+        out.dropped_unranked = before - len(candidates)
+
+    # kept clues' word sets by size: Jaccard >= s needs s*|a| <= |b| <= |a|/s, so only
+    # those sizes are compared -- exact, and far fewer pairs than all of them
+    dedupe = 0 < similarity <= 1
+    kept_words: Dict[int, List[FrozenSet[str]]] = {}
+    kept: List[Tuple[int, int, int, str]] = []
+    lines = set()  # (section, question) pairs that already have a line (and paid for its label)
+    over_budget = False
+    for cand in candidates:
+        if dedupe:
+            words = _clue_words(cand[3])
+            lo, hi = math.floor(similarity * len(words)), math.ceil(len(words) / similarity)
+            if any(
+                _jaccard(words, other) >= similarity
+                for size, group in kept_words.items() if lo <= size <= hi
+                for other in group
+            ):
+                out.dropped_duplicates += 1
+                continue
+            kept_words.setdefault(len(words), []).append(words)
+        if over_budget:
+            out.dropped_for_budget += 1
+            continue
+        cost = estimate_tokens(cand[3]) + 1
+        if (cand[0], cand[2]) not in lines:
+            cost += estimate_tokens(_label(cand[2]))
+        if token_budget is not None and out.tokens + cost > token_budget:
+            over_budget = True  # earliest clues first: everything after this is dropped too
+            out.dropped_for_budget += 1
+            continue
+        out.tokens += cost
+        lines.add((cand[0], cand[2]))
+        kept.append(cand)
+
+    power_by_q: List[List[str]] = [[] for _ in split]
+    later_by_q: List[List[str]] = [[] for _ in split]
+    for section, depth, qi, sentence in sorted(kept, key=lambda c: (c[2], c[0], c[1])):
+        (power_by_q if section == 0 else later_by_q)[qi].append(sentence)
+    out.power_lines = [_label(qi) + " ".join(p) for qi, p in enumerate(power_by_q) if p]
+    out.later_lines = [_label(qi) + " ".join(l) for qi, l in enumerate(later_by_q) if l]
+    return out
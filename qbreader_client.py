@@ -0,0 +1,379 @@
+"""
+Shared HTTP client for the QBReader API.
+
+One QBReaderClient holds:
+  - a keep-alive connection pool (requests.Session for sync calls, aiohttp.ClientSession
+    for async calls), so repeated calls skip the TCP+TLS handshake
+  - a background event loop for sync callers of the async API (run()), so the aiohttp
+    pool outlives each call instead of closing with a per-call asyncio.run loop
+  - a token-bucket rate limiter shared by sync and async calls
+  - exponential-backoff retry (tenacity) on 429/5xx and connection errors that honours
+    the server's Retry-After header
+  - an optional ResponseCache consulted before any request goes out
+
+Most callers should just use get_default_client().
+"""
+
+import asyncio
+import atexit
+import email.utils
+import json
+import os
+import threading
+import time
+from typing import Any, Awaitable, Dict, Optional, TypeVar
+
+import aiohttp
+import requests
+import tenacity
+from requests.adapters import HTTPAdapter
+
+import metrics
+from response_cache import ResponseCache, make_key
+
+DEFAULT_BASE_URL = "https://www.qbreader.org/api"
+
+T = TypeVar("T")
+
+# statuses worth retrying: throttling + transient server-side failures
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class RetryableStatusError(requests.HTTPError):
+    """A 429/5xx response. Subclasses requests.HTTPError so existing handlers still catch it."""
+
+    def __init__(self, status: int, url: str, retry_after: Optional[float] = None):
+        super().__init__(f"{status} from {url}")
+        self.status = status
+        self.url = url
+        self.retry_after = retry_after
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most `capacity`.
+
+    acquire()/acquire_async() reserve a token up front and then sleep off any debt,
+    so concurrent callers queue fairly instead of spinning.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token (possibly going into debt) and return how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self) -> None:
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class _WaitRetryAfter(tenacity.wait.wait_base):
+    """Use the server's Retry-After when it sent one, otherwise fall back to `fallback`."""
+
+    def __init__(self, fallback: tenacity.wait.wait_base, max_wait: float):
+        self.fallback = fallback
+        self.max_wait = max_wait
+
+    def __call__(self, retry_state: tenacity.RetryCallState) -> float:
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        if isinstance(exc, RetryableStatusError) and exc.retry_after is not None:
+            return min(exc.retry_after, self.max_wait)
+        return self.fallback(retry_state)
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    return isinstance(exc, (
+        RetryableStatusError,
+        requests.ConnectionError,
+        requests.Timeout,
+        aiohttp.ClientConnectionError,
+        asyncio.TimeoutError,
+    ))
+
+
+def _endpoint(url: str) -> str:
+    """Last path segment ("query", "set-list"): the cache namespace and metrics label."""
+    return url.rstrip("/").rsplit("/", 1)[-1]
+
+
+def _count_retry(attempt, url: str) -> None:
+    if attempt.retry_state.attempt_number > 1:
+        metrics.inc("qbt_qbreader_retries_total", endpoint=_endpoint(url))
+
+
+def _count_bytes(span, url: str, size: int, attempt) -> None:
+    if metrics.enabled():
+        metrics.inc("qbt_qbreader_bytes_total", size, endpoint=_endpoint(url))
+        span.set(bytes=size, attempts=attempt.retry_state.attempt_number)
+
+
+class QBReaderClient:
+    """
+    Pooled, rate-limited, retrying JSON client.
+
+    Parameters:
+        rate: sustained requests per second allowed by the token bucket.
+        burst: bucket capacity (requests that may go out back-to-back).
+        max_retries: retries after the first attempt for retryable failures.
+        backoff_base, backoff_max: exponential backoff bounds in seconds (with jitter).
+        pool_size: max keep-alive connections per host.
+        cache: ResponseCache for successful responses, namespaced by endpoint
+            ("query", "set-list", ...). None disables caching.
+    """
+
+    def __init__(
+        self,
+        *,
+        rate: float = 10.0,
+        burst: int = 10,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        pool_size: int = 20,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.bucket = TokenBucket(rate, burst)
+        self.cache = cache
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        # aiohttp sessions are bound to the loop they were created on
+        self._aio_session: Optional[aiohttp.ClientSession] = None
+        self._aio_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # started by run() on first use; pid-tagged because the thread doesn't survive fork
+        self._bg_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._bg_thread: Optional[threading.Thread] = None
+        self._bg_pid = 0
+        self._bg_lock = threading.Lock()
+
+    # --- retry policy ---------------------------------------------------------
+
+    def _retry_kwargs(self) -> Dict[str, Any]:
+        return dict(
+            stop=tenacity.stop_after_attempt(self.max_retries + 1),
+            wait=_WaitRetryAfter(
+                tenacity.wait_exponential_jitter(initial=self.backoff_base, max=self.backoff_max),
+                max_wait=self.backoff_max,
+            ),
+            retry=tenacity.retry_if_exception(_is_retryable),
+            reraise=True,
+        )
+
+    # --- cache ----------------------------------------------------------------
+
+    def _cache_lookup(self, url: str, params: Optional[Dict[str, Any]], refresh: bool):
+        """Return (namespace, key, cached_value_or_None); key is None when caching is off."""
+        if self.cache is None:
+            return None, None, None
+        namespace = _endpoint(url)
+        key = make_key(namespace, url, params)
+        if refresh:
+            return namespace, key, None
+        cached = self.cache.get(namespace, key)
+        metrics.inc("qbt_qbreader_cache_total", endpoint=namespace, result="miss" if cached is None else "hit")
+        return namespace, key, cached
+
+    # --- sync -----------------------------------------------------------------
+
+    def get_json(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: float = 15,
+        *,
+        refresh: bool = False,
+    ) -> Any:
+        """
+        GET `url` and decode JSON, retrying throttled/transient failures.
+        Served from the cache when possible; `refresh=True` skips the cache read.
+        """
+        with metrics.span("qbreader_request", endpoint=_endpoint(url)) as span:
+            namespace, key, cached = self._cache_lookup(url, params, refresh)
+            if cached is not None:
+                span.set(cache_hit=True)
+                return cached
+            for attempt in tenacity.Retrying(**self._retry_kwargs()):
+                with attempt:
+                    _count_retry(attempt, url)
+                    self.bucket.acquire()
+                    resp = self._session.get(url, params=params, timeout=timeout)
+                    if resp.status_code in RETRY_STATUSES:
+                        raise RetryableStatusError(
+                            resp.status_code, url, _parse_retry_after(resp.headers.get("Retry-After"))
+                        )
+                    resp.raise_for_status()
+                    data = resp.json()
+            _count_bytes(span, url, len(resp.content), attempt)
+            if key is not None:
+                self.cache.set(namespace, key, data)
+            return data
+
+    # --- async ----------------------------------------------------------------
+
+    def _async_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._aio_session is None or self._aio_session.closed or self._aio_loop is not loop:
+            connector = aiohttp.TCPConnector(limit_per_host=self.pool_size)
+            self._aio_session = aiohttp.ClientSession(connector=connector)
+            self._aio_loop = loop
+        return self._aio_session
+
+    async def get_json_async(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: float = 15,
+        *,
+        refresh: bool = False,
+    ) -> Any:
+        """
+        Async twin of get_json, sharing this client's aiohttp pool, rate limiter and cache.
+        Cache reads and writes run on a worker thread: a hit still commits its LRU touch,
+        and a WAL commit can stall the loop for milliseconds.
+        """
+        with metrics.span("qbreader_request", endpoint=_endpoint(url)) as span:
+            namespace, key, cached = await asyncio.to_thread(self._cache_lookup, url, params, refresh)
+            if cached is not None:
+                span.set(cache_hit=True)
+                return cached
+            session = self._async_session()
+            async for attempt in tenacity.AsyncRetrying(**self._retry_kwargs()):
+                with attempt:
+                    _count_retry(attempt, url)
+                    await self.bucket.acquire_async()
+                    async with session.get(
+                        url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)
+                    ) as resp:
+                        if resp.status in RETRY_STATUSES:
+                            raise RetryableStatusError(
+                                resp.status, url, _parse_retry_after(resp.headers.get("Retry-After"))
+                            )
+                        if resp.status >= 400:
+                            # match the sync path: callers only need to catch requests.HTTPError
+                            raise requests.HTTPError(f"{resp.status} from {url}")
+                        body = await resp.read()
+                        data = json.loads(body)
+            _count_bytes(span, url, len(body), attempt)
+            if key is not None:
+                await asyncio.to_thread(self.cache.set, namespace, key, data)
+            return data
+
+    async def aclose(self) -> None:
+        """Close the aiohttp pool for the current loop (the sync pool stays open)."""
+        if self._aio_session is not None and not self._aio_session.closed:
+            await self._aio_session.close()
+        self._aio_session = None
+        self._aio_loop = None
+
+    # --- sync bridge ----------------------------------------------------------
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._bg_lock:
+            if self._bg_loop is None or self._bg_pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="qbreader-client", daemon=True)
+                thread.start()
+                self._bg_loop, self._bg_thread, self._bg_pid = loop, thread, os.getpid()
+                # forked children get a fresh session on the fresh loop
+                self._aio_session = None
+                self._aio_loop = None
+            return self._bg_loop
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """
+        Run `coro` (typically one of the *_async functions) to completion from sync code,
+        on this client's background loop, so its aiohttp pool is reused by later calls.
+        Don't call it from a coroutine; await the async function instead.
+        """
+        if threading.current_thread() is self._bg_thread:
+            raise RuntimeError("QBReaderClient.run() called from its own event loop")
+        future = asyncio.run_coroutine_threadsafe(coro, self._background_loop())
+        try:
+            return future.result()
+        except BaseException:
+            future.cancel()  # e.g. KeyboardInterrupt: don't leave the work running
+            raise
+
+    def _stop_background_loop(self) -> None:
+        loop = self._bg_loop
+        if loop is None or self._bg_pid != os.getpid() or not loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.aclose(), loop).result(timeout=5)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        self._bg_thread.join(timeout=5)
+        if not loop.is_running():
+            loop.close()
+        self._bg_loop = self._bg_thread = None
+
+    def close(self) -> None:
+        self._stop_background_loop()
+        self._session.close()
+
+    def __enter__(self) -> "QBReaderClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_DEFAULT_CLIENT: Optional[QBReaderClient] = None
+_DEFAULT_CLIENT_LOCK = threading.Lock()
+
+
+def get_default_client() -> QBReaderClient:
+    """Process-wide shared client with the on-disk response cache (created on first use)."""
+    global _DEFAULT_CLIENT
+    with _DEFAULT_CLIENT_LOCK:
+        if _DEFAULT_CLIENT is None:
+            _DEFAULT_CLIENT = QBReaderClient(cache=ResponseCache())
+            # close the background loop's aiohttp pool cleanly before the interpreter exits
+            atexit.register(_DEFAULT_CLIENT._stop_background_loop)
+        return _DEFAULT_CLIENT
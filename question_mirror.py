@@ -0,0 +1,507 @@
+"""
+Local mirror of the QBReader question corpus.
+
+`python question_mirror.py ingest` bulk-downloads every set from /set-list into a SQLite
+database with an FTS5 (trigram) index over answerlines; `python question_mirror.py sync`
+refreshes it, re-downloading only sets that are new or whose per-set fingerprint (counts,
+first/last ids, updatedAt; two tiny requests per set) changed. QuestionMirror.query() then
+answers /query-style params (searchType=answer, caseSensitive, exactPhrase,
+difficulties, categories, setName, pagination) locally and returns the same response
+shape as the API, so get_top_n_questions(..., mirror=QuestionMirror()) runs offline.
+"""
+
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from extract_and_filter import _normalize_bonuses, _normalize_tossups, _strip_html, get_set_list
+from qbreader_client import DEFAULT_BASE_URL, QBReaderClient
+
+DEFAULT_MIRROR_PATH = Path(".qb_cache") / "mirror.sqlite3"
+
+# page size used when pulling whole sets out of /query
+INGEST_PAGE_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    rowid INTEGER PRIMARY KEY,
+    qid TEXT,
+    type TEXT NOT NULL,
+    set_name TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    answer TEXT,
+    question TEXT,
+    answer_text TEXT NOT NULL,
+    difficulty INTEGER,
+    category TEXT,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS questions_set ON questions(set_name, type, seq);
+CREATE INDEX IF NOT EXISTS questions_filters ON questions(type, difficulty, category);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+    answer_text, content='questions', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS questions_ai AFTER INSERT ON questions BEGIN
+    INSERT INTO questions_fts(rowid, answer_text) VALUES (new.rowid, new.answer_text);
+END;
+CREATE TRIGGER IF NOT EXISTS questions_ad AFTER DELETE ON questions BEGIN
+    INSERT INTO questions_fts(questions_fts, rowid, answer_text) VALUES ('delete', old.rowid, old.answer_text);
+END;
+
+CREATE TABLE IF NOT EXISTS sets (
+    name TEXT PRIMARY KEY,
+    tossups INTEGER NOT NULL,
+    bonuses INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    marker TEXT
+);
+
+-- one set's rows while they stream in; moved into `questions` in one short transaction
+CREATE TEMP TABLE IF NOT EXISTS questions_staging (
+    qid TEXT, type TEXT, set_name TEXT, seq INTEGER, answer TEXT, question TEXT,
+    answer_text TEXT, difficulty INTEGER, category TEXT, raw TEXT
+);
+"""
+
+_COLUMNS = "qid, type, set_name, seq, answer, question, answer_text, difficulty, category, raw"
+
+
+def _flag(value: Any) -> bool:
+    """API booleans arrive as "true"/"false" strings."""
+    if isinstance(value, str):
+        return value.strip().lower() == "true"
+    return bool(value)
+
+
+def _csv(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [p.strip() for p in str(value).split(",") if p.strip()]
+
+
+def _answer_text(question_type: str, raw: Dict[str, Any]) -> str:
+    """The text an answer search runs against: sanitized answerline(s), HTML stripped."""
+    if question_type == "tossup":
+        return raw.get("answer_sanitized") or _strip_html(raw.get("answer") or raw.get("answerline") or "")
+    answers = raw.get("answers_sanitized") or raw.get("answers")
+    if not answers:
+        parts = raw.get("parts") or raw.get("questions") or []
+        answers = [p.get("answer") or p.get("answerline") or "" for p in parts if isinstance(p, dict)]
+    if not answers:
+        answers = [raw.get("answer") or raw.get("answerline") or ""]
+    return " | ".join(_strip_html(str(a)) for a in answers)
+
+
+def answer_matches(text: str, query: str, case_sensitive: bool = False, exact_phrase: bool = False) -> bool:
+    """
+    Answer-search semantics used by the mirror: with exact_phrase the whole query must
+    appear contiguously, otherwise every whitespace-separated word must appear somewhere.
+    An empty query matches everything.
+    """
+    if not query:
+        return True
+    if not case_sensitive:
+        text = text.lower()
+        query = query.lower()
+    if exact_phrase:
+        return query in text
+    return all(word in text for word in query.split())
+
+
+def _fts_expression(query: str, exact_phrase: bool) -> Optional[str]:
+    """
+    Trigram MATCH expression that pre-filters candidates (always case-insensitive; the
+    exact check happens in answer_matches). Terms under 3 chars can't use the trigram
+    index, so they're left to the post-filter. Returns None when nothing is indexable.
+    """
+    terms = [query] if exact_phrase else query.split()
+    terms = [t for t in terms if len(t) >= 3]
+    if not terms:
+        return None
+    return " AND ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def _row(set_name: str, question_type: str, seq: int, raw: Dict[str, Any]) -> Tuple[Any, ...]:
+    """One `questions` row (without rowid) for an API question object."""
+    if question_type == "tossup":
+        norm = _normalize_tossups([raw], "none")[0]
+    else:
+        norm = _normalize_bonuses([raw], raw_mode="none")[0]
+    difficulty = raw.get("difficulty")
+    return (
+        norm["id"],
+        question_type,
+        set_name,
+        seq,
+        str(norm["answer"]),
+        norm["question"],
+        _answer_text(question_type, raw),
+        int(difficulty) if isinstance(difficulty, (int, str)) and str(difficulty).isdigit() else None,
+        raw.get("category"),
+        json.dumps(raw, separators=(",", ":")),
+    )
+
+
+class QuestionMirror:
+    """SQLite + FTS5 store of QBReader questions with a /query-compatible reader."""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_MIRROR_PATH):
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        if "marker" not in {row[1] for row in self._conn.execute("PRAGMA table_info(sets)")}:
+            # mirrors built before set fingerprints: the next sync rewrites each set once
+            self._conn.execute("ALTER TABLE sets ADD COLUMN marker TEXT")
+        self._conn.create_function("qb_match", 4, answer_matches, deterministic=True)
+        self._conn.commit()
+
+    # --- writing --------------------------------------------------------------
+
+    def replace_set(
+        self,
+        set_name: str,
+        tossups: Iterable[Dict[str, Any]],
+        bonuses: Iterable[Dict[str, Any]],
+        fetched_at: float,
+        marker: Optional[str] = None,
+    ) -> Tuple[int, int]:
+        """
+        Atomically swap in the questions for one set. Returns (tossups, bonuses) stored.
+
+        `tossups`/`bonuses` may be generators: rows are written to a staging table one
+        page at a time as they are produced, so a whole set never has to sit in memory
+        and the lock is only held per page, never while waiting on the network. The
+        staged rows, the delete of the old ones and the manifest row then go in one
+        short transaction, so an interrupted write leaves the set looking unsynced.
+        """
+        counts = {"tossup": 0, "bonus": 0}
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM questions_staging WHERE set_name = ?", (set_name,))
+        for question_type, raws in (("tossup", tossups), ("bonus", bonuses)):
+            raws = iter(raws)
+            while True:
+                page = list(islice(raws, INGEST_PAGE_SIZE))
+                if not page:
+                    break
+                seq = counts[question_type]
+                rows = [_row(set_name, question_type, seq + i, raw) for i, raw in enumerate(page)]
+                counts[question_type] += len(page)
+                with self._lock, self._conn:
+                    self._conn.executemany(
+                        f"INSERT INTO questions_staging ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                    )
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM questions WHERE set_name = ?", (set_name,))
+            self._conn.execute(
+                f"INSERT INTO questions ({_COLUMNS}) SELECT {_COLUMNS} FROM questions_staging "
+                "WHERE set_name = ? ORDER BY rowid",
+                (set_name,),
+            )
+            self._conn.execute("DELETE FROM questions_staging WHERE set_name = ?", (set_name,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sets (name, tossups, bonuses, fetched_at, marker) VALUES (?, ?, ?, ?, ?)",
+                (set_name, counts["tossup"], counts["bonus"], fetched_at, marker),
+            )
+        return counts["tossup"], counts["bonus"]
+
+    # --- reading --------------------------------------------------------------
+
+    def drop_set(self, set_name: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM questions WHERE set_name = ?", (set_name,))
+            self._conn.execute("DELETE FROM sets WHERE name = ?", (set_name,))
+
+    def stored_sets(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT name FROM sets ORDER BY name")]
+
+    def manifest(self) -> Dict[str, Tuple[int, int]]:
+        """{set_name: (tossups, bonuses)} for every fully-synced set."""
+        with self._lock:
+            return {
+                name: (tossups, bonuses)
+                for name, tossups, bonuses in self._conn.execute("SELECT name, tossups, bonuses FROM sets")
+            }
+
+    def markers(self) -> Dict[str, Optional[str]]:
+        """{set_name: fingerprint from _probe_set} (None for sets stored before they were kept)."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT name, marker FROM sets"))
+
+    def _search(
+        self,
+        question_type: str,
+        params: Dict[str, Any],
+        limit: int,
+        offset: int,
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        query = str(params.get("queryString") or "")
+        case_sensitive = _flag(params.get("caseSensitive", False))
+        exact_phrase = _flag(params.get("exactPhrase", False))
+
+        where = ["q.type = ?"]
+        args: List[Any] = [question_type]
+        join = ""
+        fts = _fts_expression(query, exact_phrase)
+        if fts is not None:
+            join = "JOIN questions_fts f ON f.rowid = q.rowid"
+            where.append("questions_fts MATCH ?")
+            args.append(fts)
+        if query:
+            where.append("qb_match(q.answer_text, ?, ?, ?)")
+            args.extend([query, case_sensitive, exact_phrase])
+        if params.get("setName"):
+            where.append("q.set_name = ?")
+            args.append(str(params["setName"]))
+        difficulties = [int(d) for d in _csv(params.get("difficulties")) if d.isdigit()]
+        if difficulties:
+            where.append(f"q.difficulty IN ({','.join('?' * len(difficulties))})")
+            args.extend(difficulties)
+        categories = _csv(params.get("categories"))
+        if categories:
+            where.append(f"q.category IN ({','.join('?' * len(categories))})")
+            args.extend(categories)
+
+        clause = f"FROM questions q {join} WHERE {' AND '.join(where)}"
+        with self._lock:
+            (count,) = self._conn.execute(f"SELECT COUNT(*) {clause}", args).fetchone()
+            rows = self._conn.execute(
+                f"SELECT q.raw {clause} ORDER BY q.rowid LIMIT ? OFFSET ?", args + [limit, offset]
+            ).fetchall()
+        return count, [json.loads(r[0]) for r in rows]
+
+    def query(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a /query params dict locally, returning the API's response shape."""
+        question_type = str(params.get("questionType") or "all")
+        limit = int(params.get("maxReturnLength") or 25)
+        out: Dict[str, Any] = {
+            "tossups": {"count": 0, "questionArray": []},
+            "bonuses": {"count": 0, "questionArray": []},
+        }
+        for qtype, key, page_param in (("tossup", "tossups", "tossupPagination"),
+                                       ("bonus", "bonuses", "bonusPagination")):
+            if question_type not in ("all", qtype):
+                continue
+            page = max(1, int(params.get(page_param) or 1))
+            count, raws = self._search(qtype, params, limit, (page - 1) * limit)
+            out[key] = {"count": count, "questionArray": raws}
+        return out
+
+    async def query_async(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Same as query(); lets the mirror stand in wherever an async page fetch is awaited."""
+        return self.query(params)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# --- ingestion ----------------------------------------------------------------
+
+def _iter_set_questions(
+    client: QBReaderClient,
+    base_url: str,
+    set_name: str,
+    question_type: str,
+    page_size: int = INGEST_PAGE_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield every tossup or bonus of one set out of /query, one page in memory at a time.
+
+    Pages until the count the server reports is reached (or, without a count, until an
+    empty page). A short first page means the server caps maxReturnLength below
+    `page_size`; later pages then ask for the capped size so page offsets line up.
+    """
+    key = "tossups" if question_type == "tossup" else "bonuses"
+    page_param = "tossupPagination" if question_type == "tossup" else "bonusPagination"
+    url = f"{base_url.rstrip('/')}/query"
+    seen = 0
+    page = 1
+    while True:
+        params = {
+            "queryString": "",
+            "setName": set_name,
+            "questionType": question_type,
+            "maxReturnLength": page_size,
+            page_param: page,
+        }
+        data = client.get_json(url, params=params, timeout=60).get(key, {})
+        batch = data.get("questionArray", []) if isinstance(data, dict) else []
+        yield from batch
+        seen += len(batch)
+        total = data.get("count") if isinstance(data, dict) else None
+        if not batch or (total is not None and seen >= int(total)):
+            return
+        if page == 1 and len(batch) < page_size:
+            page_size = len(batch)
+        page = seen // page_size + 1
+
+
+def _probe_set(client: QBReaderClient, base_url: str, set_name: str) -> str:
+    """
+    A fingerprint of one set as the server has it now, from at most two one-question requests.
+
+    The fingerprint covers each type's count, the _id of its first and last question and
+    the newest updatedAt among them. That catches sets that were added to, trimmed or
+    re-uploaded (new ids), but not an in-place edit to a question in the middle of a set
+    that leaves counts and ids alone; `sync(full=True)` is the fallback for that.
+    """
+    url = f"{base_url.rstrip('/')}/query"
+    params: Dict[str, Any] = {"queryString": "", "setName": set_name, "questionType": "all", "maxReturnLength": 1}
+    pages = [client.get_json(url, params=params, timeout=30)]
+    counts = []
+    for key, page_param in (("tossups", "tossupPagination"), ("bonuses", "bonusPagination")):
+        obj = pages[0].get(key, {})
+        counts.append(int(obj.get("count", 0)) if isinstance(obj, dict) else 0)
+        params[page_param] = max(1, counts[-1])
+    if max(counts) > 1:
+        pages.append(client.get_json(url, params=params, timeout=30))
+    parts = []
+    for key, count in zip(("tossups", "bonuses"), counts):
+        sample = [q for page in pages if isinstance(page.get(key), dict)
+                  for q in page[key].get("questionArray", [])]
+        newest = max((str(q.get("updatedAt") or "") for q in sample), default="")
+        parts.append([count, [q.get("_id") for q in sample], newest])
+    return json.dumps(parts, separators=(",", ":"))
+
+
+def _store_set(
+    mirror: QuestionMirror, client: QBReaderClient, base_url: str, set_name: str, marker: Optional[str] = None
+) -> Tuple[int, int]:
+    """
+    Stream one set's pages into `mirror`. The fingerprint is taken before the download, so
+    a set that changes mid-download looks changed again to the next sync.
+    """
+    if marker is None:
+        marker = _probe_set(client, base_url, set_name)
+    return mirror.replace_set(
+        set_name,
+        _iter_set_questions(client, base_url, set_name, "tossup"),
+        _iter_set_questions(client, base_url, set_name, "bonus"),
+        time.time(),
+        marker,
+    )
+
+
+def ingest(
+    mirror: QuestionMirror,
+    base_url: str = DEFAULT_BASE_URL,
+    sets: Optional[List[str]] = None,
+    client: Optional[QBReaderClient] = None,
+) -> Dict[str, Tuple[int, int]]:
+    """
+    Download `sets` (default: everything in /set-list) into `mirror`.
+
+    Uses its own uncached client by default so whole-set pages don't flood the response cache.
+    Returns {set_name: (tossups, bonuses)}.
+    """
+    client = client or QBReaderClient()
+    if sets is None:
+        sets = get_set_list(base_url, client=client)
+    stored: Dict[str, Tuple[int, int]] = {}
+    for i, set_name in enumerate(sets, 1):
+        stored[set_name] = _store_set(mirror, client, base_url, set_name)
+        print(f"[{i}/{len(sets)}] {set_name}: {stored[set_name][0]} tossups, {stored[set_name][1]} bonuses")
+    return stored
+
+
+def sync(
+    mirror: QuestionMirror,
+    base_url: str = DEFAULT_BASE_URL,
+    client: Optional[QBReaderClient] = None,
+    prune: bool = True,
+    full: bool = False,
+) -> Dict[str, str]:
+    """
+    Bring `mirror` up to date with /set-list, downloading only what changed.
+
+    Each listed set is probed with two one-question requests (see _probe_set) and
+    re-fetched only when it is missing from the manifest or its fingerprint changed.
+    With `full`, every set is re-fetched regardless, which also picks up in-place edits
+    the probe can't see. Each set is committed on its own, so re-running an interrupted
+    sync picks up where it stopped. With `prune`, sets no longer listed are dropped.
+
+    Returns:
+        {set_name: "new" | "changed" | "unchanged" | "removed"}
+    """
+    client = client or QBReaderClient()
+    markers = mirror.markers()
+    status: Dict[str, str] = {}
+    current = get_set_list(base_url, client=client)
+    for i, set_name in enumerate(current, 1):
+        marker = _probe_set(client, base_url, set_name)
+        if set_name in markers and not full and markers[set_name] == marker:
+            status[set_name] = "unchanged"
+            continue
+        status[set_name] = "new" if set_name not in markers else "changed"
+        counts = _store_set(mirror, client, base_url, set_name, marker)
+        print(f"[{i}/{len(current)}] {set_name} ({status[set_name]}): {counts[0]} tossups, {counts[1]} bonuses")
+
+    if prune:
+        listed = set(current)
+        for set_name in markers:
+            if set_name not in listed:
+                mirror.drop_set(set_name)
+                status[set_name] = "removed"
+
+    changed = sum(1 for v in status.values() if v != "unchanged")
+    print(f"Sync done: {changed} of {len(status)} sets updated")
+    return status
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build and query a local QBReader mirror.")
+    parser.add_argument("--db", default=str(DEFAULT_MIRROR_PATH), help="mirror database path")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_ingest = sub.add_parser("ingest", help="download sets into the mirror")
+    p_ingest.add_argument("sets", nargs="*", help="set names (default: all sets)")
+
+    p_sync = sub.add_parser("sync", help="fetch only new/changed sets")
+    p_sync.add_argument("--no-prune", action="store_true", help="keep sets that left /set-list")
+    p_sync.add_argument("--full", action="store_true",
+                        help="re-download every set, catching in-place edits the cheap check can't see")
+
+    p_search = sub.add_parser("search", help="answer search against the mirror")
+    p_search.add_argument("query")
+    p_search.add_argument("--type", default="all", choices=["all", "tossup", "bonus"])
+    p_search.add_argument("-n", type=int, default=10)
+    p_search.add_argument("--exact", action="store_true")
+    p_search.add_argument("--case-sensitive", action="store_true")
+
+    args = parser.parse_args(argv)
+    mirror = QuestionMirror(args.db)
+    if args.command == "ingest":
+        ingest(mirror, args.base_url, sets=args.sets or None)
+    elif args.command == "sync":
+        sync(mirror, args.base_url, prune=not args.no_prune, full=args.full)
+    else:
+        data = mirror.query({
+            "queryString": args.query,
+            "questionType": args.type,
+            "maxReturnLength": args.n,
+            "exactPhrase": str(args.exact).lower(),
+            "caseSensitive": str(args.case_sensitive).lower(),
+        })
+        for qtype, key in (("tossup", "tossups"), ("bonus", "bonuses")):
+            print(f"{key}: {data[key]['count']} matches")
+            for raw in data[key]["questionArray"]:
+                print("  -", raw.get("setName"), "|", _answer_text(qtype, raw))
+    mirror.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Compact question records.
+
+QuestionRecord replaces the per-question dicts built by _normalize_tossups /
+_normalize_bonuses. It stores the six normalized fields in __slots__ (no per-instance
+dict), interns the heavily repeated setName/type strings, and can hold the original API
+object in one of three ways:
+
+    "full"  the parsed dict, as before (default)
+    "lazy"  zlib-compressed compact JSON, decoded each time .raw is read
+    "none"  dropped; .raw is None and "raw" is not a key
+
+It is a MutableMapping, so existing code using q["question"], q.get("setName"),
+q["score"] = ..., dict(q) or ** unpacking keeps working: the normalized fields and raw
+are written through to the slots, any other key goes to a small per-record dict created
+on first use, and only type/id/answer/question/setName can't be deleted. It is not a
+dict, so json.dumps needs to_dict() (or json.dumps(q, default=dict)).
+"""
+
+import json
+import sys
+import zlib
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Optional
+
+RAW_MODES = ("full", "lazy", "none")
+
+_FIELDS = ("type", "id", "answer", "question", "setName")
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class QuestionRecord(MutableMapping):
+    """One normalized tossup or bonus (type, id, answer, question, setName, raw)."""
+
+    __slots__ = ("type", "id", "answer", "question", "setName", "_raw", "_extra")
+
+    def __init__(
+        self,
+        type: str,
+        id: Any,
+        answer: Any,
+        question: Any,
+        setName: Optional[str],
+        raw: Optional[Dict[str, Any]] = None,
+        raw_mode: str = "full",
+    ):
+        if raw_mode not in RAW_MODES:
+            raise ValueError(f"raw_mode must be one of {RAW_MODES}, got {raw_mode!r}")
+        self.type = _intern(type)
+        self.id = id
+        self.answer = answer
+        self.question = question
+        self.setName = _intern(setName)
+        if raw is None or raw_mode == "none":
+            self._raw = None
+        elif raw_mode == "lazy":
+            # level 1: most of the size win (question text is stored twice) at a fraction of the cost
+            self._raw = zlib.compress(json.dumps(raw, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), 1)
+        else:
+            self._raw = raw
+        self._extra: Optional[Dict[str, Any]] = None
+
+    @property
+    def raw(self) -> Optional[Dict[str, Any]]:
+        if isinstance(self._raw, bytes):
+            return json.loads(zlib.decompress(self._raw))
+        return self._raw
+
+    # MutableMapping interface -- the same keys the old dicts had, plus any added ones
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELDS:
+            return getattr(self, key)
+        if key == "raw" and self._raw is not None:
+            return self.raw
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in _FIELDS:
+            setattr(self, key, _intern(value) if key in ("type", "setName") else value)
+        elif key == "raw":
+            self._raw = value
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in _FIELDS:
+            raise TypeError(f"QuestionRecord field {key!r} can't be deleted")
+        if key == "raw" and self._raw is not None:
+            self._raw = None
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from _FIELDS
+        if self._raw is not None:
+            yield "raw"
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return len(_FIELDS) + (self._raw is not None) + len(self._extra or ())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return (f"QuestionRecord(type={self.type!r}, id={self.id!r}, setName={self.setName!r}, "
+                f"answer={self.answer!r})")
@@ -0,0 +1,146 @@
+"""
+SQLite-backed response cache.
+
+Entries are keyed by a hash of (namespace, url, canonicalised params) and stored as JSON.
+Each namespace (e.g. "query", "set-list") gets its own TTL, the table is capped at
+`max_entries` with least-recently-used eviction, and hit/miss counters are kept per
+instance.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+DEFAULT_CACHE_PATH = Path(".qb_cache") / "responses.sqlite3"
+
+# seconds; the set list changes when new packets are uploaded, question pages far less often
+DEFAULT_TTLS: Dict[str, float] = {
+    "set-list": 24 * 3600,
+    "query": 7 * 24 * 3600,
+}
+DEFAULT_TTL = 24 * 3600
+
+
+def canonical_params(params: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Drop None values and stringify the rest so {"n": 5} and {"n": "5"} key the same."""
+    if not params:
+        return {}
+    return {str(k): str(v) for k, v in sorted(params.items()) if v is not None}
+
+
+def make_key(namespace: str, url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Stable cache key for one request."""
+    blob = json.dumps([namespace, url, canonical_params(params)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent JSON cache with per-namespace TTLs and LRU eviction.
+
+    Parameters:
+        path: SQLite file (parent dirs are created); ":memory:" for a throwaway cache.
+        ttls: namespace -> TTL seconds, merged over DEFAULT_TTLS.
+        default_ttl: TTL for namespaces not in `ttls`.
+        max_entries: evict least-recently-used rows beyond this many.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_CACHE_PATH,
+        *,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = DEFAULT_TTL,
+        max_entries: int = 20000,
+    ):
+        self.path = str(path)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.ttls = dict(DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                   key TEXT PRIMARY KEY,
+                   namespace TEXT NOT NULL,
+                   value TEXT NOT NULL,
+                   created REAL NOT NULL,
+                   last_access REAL NOT NULL
+               )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_access)")
+        self._conn.commit()
+
+    def ttl_for(self, namespace: str) -> float:
+        return self.ttls.get(namespace, self.default_ttl)
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        """Return the cached value for `key`, or `default` if missing/expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_for(namespace):
+                if row is not None:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return default
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        """Store `value` (must be JSON-serialisable) and evict LRU rows over the cap."""
+        now = time.time()
+        blob = json.dumps(value, separators=(",", ":"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, namespace, value, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, namespace, blob, now, now),
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        with self._lock:
+            if namespace is None:
+                self._conn.execute("DELETE FROM entries")
+            else:
+                self._conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "entries": count,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
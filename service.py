@@ -0,0 +1,465 @@
+"""
+Long-running local HTTP service for the retrieval / sentence / trend pipeline.
+
+    python service.py [--host 127.0.0.1] [--port 8080] [--base-url URL]
+
+Endpoints (JSON in, JSON out):
+    GET  /health      liveness plus cache and coalescing counters
+    GET  /metrics     per-stage timings and counters, Prometheus text format (see metrics;
+                      collected with --metrics or QB_METRICS set)
+    GET  /sets        set names (from the local set-list snapshot)
+    POST /questions   {"query", "sets"?, "n"?, "difficulty"?, "category"?, "exact_phrase"?,
+                       "case_sensitive"?, "dedupe_threshold"?, "sentences"?, "deadline"?}
+                      -> {"questions": [...], "partial"} (with "first_sentences" when sentences > 0)
+    POST /sentences   {"texts": [...], "n"?} -> {"sentences": [...]}
+    POST /trends      same body as /questions -> {"trends": {...}, "cache_hit", "questions", "partial"}
+
+Every request runs against a deadline ("deadline" seconds in the body, capped by the
+server's --deadline): slow QBReader pages are hedged and then skipped, a Gemini reply
+still streaming is cut off, and the response says "partial": true instead of hanging.
+
+Unlike the CLI, the process keeps one QBReaderClient (connection pool, rate limit,
+response cache) and one Gemini client for its whole life. Identical requests (same
+body) that arrive while the first is still running share its result instead of
+recomputing it (single-flight); the shared work runs under the server's --deadline and
+each request waits for it only until its own deadline. With prefetch_related on, the
+related_entities of every finished /trends answer are fetched in the background (same
+sets/difficulty/category) at a lower priority than live requests, so the follow-up
+search is answered from warm results, or joins the prefetch if it is still running.
+create_app() takes the QBReader base URL, client and Gemini client factory as
+arguments, so it can be pointed at local stand-ins.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from aiohttp import web
+
+import metrics
+from deadline import Deadline, PartialResult, is_partial
+from extract_and_filter import (
+    extract_larger_trends,
+    first_n_sentences_batch,
+    get_gemini_client,
+    get_top_n_questions_async,
+    parse_gemini_response,
+)
+from prefetch import Prefetcher
+from qbreader_client import DEFAULT_BASE_URL, QBReaderClient, get_default_client
+from set_list_snapshot import get_set_list_snapshot
+
+DEFAULT_N = 20
+MAX_N = 500
+DEFAULT_DEADLINE = 30.0  # seconds per request
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one in-flight task.
+
+    Callers that arrive while a task for their key is running await that task; once it
+    finishes the key is forgotten, so later calls compute afresh (caching is the
+    response/trend caches' job). A caller that goes away doesn't cancel the shared task.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, key=key: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _as_list(value: Any) -> Optional[list]:
+    if value is None or value == "" or value == []:
+        return None
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+def _int_field(body: Dict[str, Any], name: str, default: int) -> int:
+    """body[name] as an int (`default` if missing/null), or BadRequest."""
+    value = body.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise BadRequest(f"'{name}' must be an integer")
+
+
+def retrieval_params(body: Dict[str, Any]) -> Dict[str, Any]:
+    """Validated, normalized retrieval arguments from a request body."""
+    query = str(body.get("query") or "").strip()
+    if not query:
+        raise BadRequest("'query' is required")
+    n = _int_field(body, "n", DEFAULT_N)
+    if not 1 <= n <= MAX_N:
+        raise BadRequest(f"'n' must be between 1 and {MAX_N}")
+    threshold = body.get("dedupe_threshold", 0.8)
+    if threshold:
+        try:
+            threshold = float(threshold)
+        except (TypeError, ValueError):
+            raise BadRequest("'dedupe_threshold' must be a number")
+        if not 0.0 < threshold <= 1.0:
+            raise BadRequest("'dedupe_threshold' must be in (0, 1]")
+    return {
+        "query": query,
+        "set_list": _as_list(body.get("sets")),
+        "n": n,
+        "difficulty": _as_list(body.get("difficulty")),
+        "category": _as_list(body.get("category")),
+        "exact_phrase": bool(body.get("exact_phrase", False)),
+        "case_sensitive": bool(body.get("case_sensitive", False)),
+        "dedupe_threshold": threshold or None,
+    }
+
+
+def request_deadline(body: Dict[str, Any], default: Optional[float]) -> Deadline:
+    """The request's Deadline: its "deadline" (seconds), never longer than the server's."""
+    seconds = body.get("deadline")
+    if seconds is None:
+        return Deadline(default)
+    try:
+        seconds = float(seconds)
+    except (TypeError, ValueError):
+        raise BadRequest("'deadline' must be a number of seconds")
+    if seconds <= 0:
+        raise BadRequest("'deadline' must be positive")
+    return Deadline(seconds if default is None else min(seconds, default))
+
+
+def _flight_key(endpoint: str, params: Dict[str, Any]) -> str:
+    """Single-flight (and prefetch) key: the request alone, not its deadline."""
+    return endpoint + json.dumps(params, sort_keys=True, default=str)
+
+
+class PipelineService:
+    """Shared state behind the HTTP handlers; also usable directly from async code."""
+
+    def __init__(
+        self,
+        *,
+        base_url: str = DEFAULT_BASE_URL,
+        client: Optional[QBReaderClient] = None,
+        gemini_client_factory: Callable[[], Any] = get_gemini_client,
+        max_concurrency: int = 8,
+        gemini_concurrency: int = 4,
+        prefetch_related: bool = False,
+        prefetch_queue: int = 16,
+        deadline: Optional[float] = DEFAULT_DEADLINE,
+    ):
+        self.base_url = base_url
+        self.deadline = deadline
+        self.client = client or get_default_client()
+        self._gemini_factory = gemini_client_factory
+        self._gemini = None
+        self._gemini_lock = asyncio.Lock()
+        self.qb_semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self.gemini_semaphore = asyncio.Semaphore(max(1, gemini_concurrency))
+        self.flights = SingleFlight()
+        self.prefetcher: Optional[Prefetcher] = None
+        if prefetch_related:
+            self.prefetcher = Prefetcher(self._prefetch, max_queue=prefetch_queue)
+            self.prefetcher.start()
+
+    async def gemini(self) -> Any:
+        """The one Gemini client, created (and genai imported) on first use."""
+        async with self._gemini_lock:
+            if self._gemini is None:
+                self._gemini = await asyncio.to_thread(self._gemini_factory)
+        return self._gemini
+
+    def _shared_deadline(self) -> Deadline:
+        """Deadline for work shared through single-flight: the server's, the longest any request gets."""
+        return Deadline(self.deadline)
+
+    async def _join(self, key: str, fn: Callable[[], Awaitable[Any]], deadline: Optional[Deadline]) -> Any:
+        """
+        Start or join the single flight for `key`, waiting for it no longer than `deadline`
+        (asyncio.TimeoutError after that). The shared work itself runs on for the others.
+        """
+        timeout = deadline.wait_timeout() if deadline is not None else None
+        return await asyncio.wait_for(self.flights.do(key, fn), timeout)
+
+    def _live(self):
+        return self.prefetcher.live() if self.prefetcher is not None else contextlib.nullcontext()
+
+    def _warm(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if self.prefetcher is None:
+            return None
+        return self.prefetcher.warm(_flight_key("questions", params))
+
+    async def _fetch_questions(self, params: Dict[str, Any], deadline: Optional[Deadline] = None) -> list:
+        records = await get_top_n_questions_async(
+            params["query"],
+            params["set_list"],
+            params["n"],
+            self.base_url,
+            case_sensitive=params["case_sensitive"],
+            exact_phrase=params["exact_phrase"],
+            difficulty=params["difficulty"],
+            category=params["category"],
+            client=self.client,
+            semaphore=self.qb_semaphore,
+            dedupe_threshold=params["dedupe_threshold"],
+            raw_mode="none",
+            deadline=deadline,
+        )
+        dicts = [r.to_dict() for r in records]
+        return PartialResult(dicts, records.skipped) if is_partial(records) else dicts
+
+    async def _prefetch(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        questions = await self.flights.do(
+            _flight_key("questions", params), lambda: self._fetch_questions(params, self._shared_deadline())
+        )
+        firsts = first_n_sentences_batch((q.get("question") for q in questions), n=2)
+        return {"questions": questions, "first_sentences": firsts}
+
+    def prefetch_related(self, params: Dict[str, Any], trends: Optional[Dict[str, Any]]) -> int:
+        """Queue retrieval for each related entity (in Gemini's order) with `params`' filters."""
+        if self.prefetcher is None or not trends:
+            return 0
+        queued = 0
+        for rank, entity in enumerate(trends.get("related_entities") or []):
+            entity = str(entity or "").strip()
+            if not entity or entity.lower() == params["query"].lower():
+                continue
+            related = dict(params, query=entity)
+            queued += self.prefetcher.submit(_flight_key("questions", related), related, priority=rank)
+        return queued
+
+    async def questions(self, params: Dict[str, Any], deadline: Optional[Deadline] = None) -> list:
+        """
+        Questions for `params`: a PartialResult if the shared fetch's deadline cut retrieval
+        short, or an empty one if this request's `deadline` ran out before it finished.
+        """
+        warm = self._warm(params)
+        if warm is not None:
+            return warm["questions"]
+        key = _flight_key("questions", params)
+        if self.prefetcher is not None:
+            # asked for for real: a speculative job that hasn't started is dropped, one that
+            # is running is joined below through single-flight
+            self.prefetcher.cancel(key, running=False)
+        async with self._live():
+            try:
+                return await self._join(key, lambda: self._fetch_questions(params, self._shared_deadline()), deadline)
+            except asyncio.TimeoutError:
+                return PartialResult([], [params])
+
+    async def trends(self, params: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """Trend extraction for `params`, shared like questions(); partial if `deadline` runs out first."""
+        shared = self._shared_deadline()
+
+        async def _extract() -> Dict[str, Any]:
+            warm = self._warm(params)
+            if warm is not None:
+                questions, filtered = warm["questions"], warm["first_sentences"]
+            else:
+                questions = await self.questions(params, shared)
+                filtered = first_n_sentences_batch((q.get("question") for q in questions), n=2)
+            unfiltered = [q.get("question") for q in questions]
+            result = {"trends": None, "cache_hit": False, "questions": len(questions), "partial": is_partial(questions)}
+            if not questions:
+                return result
+            gemini = await self.gemini()
+            try:
+                # waiting for a Gemini slot counts against the deadline too
+                await asyncio.wait_for(self.gemini_semaphore.acquire(), timeout=shared.wait_timeout())
+            except asyncio.TimeoutError:
+                return dict(result, partial=True)
+            try:
+                reply = await asyncio.to_thread(
+                    extract_larger_trends,
+                    params["query"],
+                    unfiltered,
+                    filtered,
+                    gemini,
+                    on_field=lambda name, value: None,
+                    deadline=shared,
+                )
+            finally:
+                self.gemini_semaphore.release()
+            if reply is None:
+                return result
+            trends = parse_gemini_response(reply.text) if reply.text or not reply.partial else None
+            if not reply.partial:
+                self.prefetch_related(params, trends)
+            return dict(result, trends=trends, cache_hit=reply.cache_hit, partial=result["partial"] or reply.partial)
+
+        async with self._live():
+            try:
+                return await self._join(_flight_key("trends", params), _extract, deadline)
+            except asyncio.TimeoutError:
+                return {"trends": None, "cache_hit": False, "questions": 0, "partial": True}
+
+    async def aclose(self) -> None:
+        if self.prefetcher is not None:
+            await self.prefetcher.aclose()
+        await self.client.aclose()
+
+
+# --- HTTP layer ----------------------------------------------------------------
+
+_SERVICE = web.AppKey("service", PipelineService)
+
+
+async def _json_body(request: web.Request) -> Dict[str, Any]:
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise BadRequest("body must be JSON")
+    if not isinstance(body, dict):
+        raise BadRequest("body must be a JSON object")
+    return body
+
+
+@web.middleware
+async def _errors(request: web.Request, handler):
+    try:
+        return await handler(request)
+    except BadRequest as exc:
+        return web.json_response({"error": str(exc)}, status=400)
+    except web.HTTPException:
+        raise
+    except Exception as exc:  # upstream (QBReader/Gemini) failures
+        return web.json_response({"error": f"{type(exc).__name__}: {exc}"}, status=502)
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    service = request.app[_SERVICE]
+    cache = service.client.cache
+    return web.json_response({
+        "ok": True,
+        "requests_started": service.flights.started,
+        "requests_coalesced": service.flights.coalesced,
+        "response_cache": cache.stats() if cache is not None else None,
+        "prefetch": dict(service.prefetcher.stats) if service.prefetcher is not None else None,
+    })
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(text=metrics.to_prometheus(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Metrics-Enabled": str(metrics.enabled()).lower()})
+
+
+async def handle_sets(request: web.Request) -> web.Response:
+    service = request.app[_SERVICE]
+    sets = await asyncio.to_thread(get_set_list_snapshot, service.base_url)
+    return web.json_response({"sets": sets})
+
+
+async def handle_questions(request: web.Request) -> web.Response:
+    body = await _json_body(request)
+    params = retrieval_params(body)
+    sentences = _int_field(body, "sentences", 0)
+    service = request.app[_SERVICE]
+    questions = await service.questions(params, request_deadline(body, service.deadline))
+    partial = is_partial(questions)
+    if sentences > 0:
+        firsts = first_n_sentences_batch((q.get("question") for q in questions), n=sentences)
+        questions = [dict(q, first_sentences=s) for q, s in zip(questions, firsts)]
+    return web.json_response({"questions": questions, "partial": partial})
+
+
+async def handle_sentences(request: web.Request) -> web.Response:
+    body = await _json_body(request)
+    texts = body.get("texts")
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        raise BadRequest("'texts' must be a list of strings")
+    n = _int_field(body, "n", 2)
+    return web.json_response({"sentences": first_n_sentences_batch(texts, n=n)})
+
+
+async def handle_trends(request: web.Request) -> web.Response:
+    body = await _json_body(request)
+    service = request.app[_SERVICE]
+    return web.json_response(await service.trends(retrieval_params(body), request_deadline(body, service.deadline)))
+
+
+def create_app(
+    *,
+    base_url: str = DEFAULT_BASE_URL,
+    client: Optional[QBReaderClient] = None,
+    gemini_client_factory: Callable[[], Any] = get_gemini_client,
+    max_concurrency: int = 8,
+    gemini_concurrency: int = 4,
+    prefetch_related: bool = False,
+    deadline: Optional[float] = DEFAULT_DEADLINE,
+) -> web.Application:
+    """Build the aiohttp app; the PipelineService is created on startup (inside the loop)."""
+    app = web.Application(middlewares=[_errors])
+
+    async def _lifecycle(app: web.Application):
+        app[_SERVICE] = PipelineService(
+            base_url=base_url,
+            client=client,
+            gemini_client_factory=gemini_client_factory,
+            max_concurrency=max_concurrency,
+            gemini_concurrency=gemini_concurrency,
+            prefetch_related=prefetch_related,
+            deadline=deadline,
+        )
+        yield
+        await app[_SERVICE].aclose()
+
+    app.cleanup_ctx.append(_lifecycle)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/sets", handle_sets)
+    app.router.add_post("/questions", handle_questions)
+    app.router.add_post("/sentences", handle_sentences)
+    app.router.add_post("/trends", handle_trends)
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the QBReader/Gemini pipeline over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--qb-concurrency", type=int, default=8)
+    parser.add_argument("--gemini-concurrency", type=int, default=4)
+    parser.add_argument("--prefetch-related", action="store_true",
+                        help="fetch each answer's related entities in the background")
+    parser.add_argument("--deadline", type=float, default=DEFAULT_DEADLINE,
+                        help="seconds a request may take before a partial result is returned (0 = no limit)")
+    parser.add_argument("--metrics", nargs="?", const=True, default=None, metavar="TRACE.jsonl",
+                        help="collect stage metrics for /metrics (and append span traces to the file)")
+    args = parser.parse_args()
+    if args.metrics is not None:
+        metrics.enable(None if args.metrics is True else args.metrics)
+    web.run_app(
+        create_app(
+            base_url=args.base_url,
+            max_concurrency=args.qb_concurrency,
+            gemini_concurrency=args.gemini_concurrency,
+            prefetch_related=args.prefetch_related,
+            deadline=args.deadline or None,
+        ),
+        host=args.host,
+        port=args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Trigram index over set names for ranked, typo-tolerant set search.
+
+SetNameIndex.search("2019 hs regionals") splits the query into
+    years   "2019", or a range like "2015-2019" -- the set's own year must match
+    levels  ms / middle school, hs / high school, college, open -- recognised from the
+            name itself or well-known tournament names (HSNCT, ACF, ...)
+    words   everything else; each must appear in the name
+and ranks the hits (whole phrase present, word-boundary and prefix matches, shorter
+names first). When no name contains every word, names sharing enough trigrams with
+the words are returned instead as fuzzy matches ("regionls" -> "... Regionals").
+
+SetNameIndex.containing("regionals") is the plain case-insensitive substring lookup
+(what extract_and_filter.find_matches has always done), served from the same postings.
+
+The index is built once per set-list snapshot (keyed by its digest) and saved as JSON
+under .qb_cache/set_index/, so later runs load it instead of rebuilding.
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple, Union
+
+from set_list_snapshot import set_list_digest
+
+DEFAULT_INDEX_DIR = Path(".qb_cache") / "set_index"
+INDEX_VERSION = 2
+
+# a fuzzy match needs at least this share of the query word's trigrams
+FUZZY_MIN_CONTAINMENT = 0.5
+
+_RE_YEAR = re.compile(r"^(19[89]\d|20\d\d)$")
+_RE_YEAR_RANGE = re.compile(r"\b(19[89]\d|20\d\d)\s*(?:-|–|\.\.)\s*(19[89]\d|20\d\d)\b")
+_RE_WORD = re.compile(r"[a-z0-9]+")
+
+# query words that ask for a level, and the name words/phrases that indicate one
+_LEVEL_QUERY = {
+    "ms": "ms", "middle": "ms",
+    "hs": "hs", "high": "hs", "highschool": "hs",
+    "college": "college", "collegiate": "college", "undergrad": "college",
+    "open": "open",
+}
+_LEVEL_MARKERS: Dict[str, Tuple[str, ...]] = {
+    "ms": ("ms", "middle school", "msnct", "middle"),
+    "hs": ("hs", "high school", "hsnct", "nasat", "pace nsc", "bhsat", "hsapq"),
+    "college": ("college", "collegiate", "acf", "icct", "eft", "cct", "ict"),
+    "open": ("open",),
+}
+_QUERY_FILLER = frozenset({"school"})
+
+
+@dataclass
+class SetMatch:
+    name: str
+    score: float
+    fuzzy: bool = False
+
+
+def _trigrams(word: str) -> Set[str]:
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _inner_trigrams(word: str) -> Set[str]:
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+def _name_levels(lowered: str) -> FrozenSet[str]:
+    words = f" {' '.join(_RE_WORD.findall(lowered))} "
+    return frozenset(level for level, markers in _LEVEL_MARKERS.items()
+                     if any(f" {m} " in words for m in markers))
+
+
+def _parse_query(query: str) -> Tuple[Optional[Tuple[int, int]], Set[str], List[str]]:
+    """(year range or None, wanted levels, remaining words) for a search string."""
+    text = (query or "").strip().lower()
+    years: Optional[Tuple[int, int]] = None
+    m = _RE_YEAR_RANGE.search(text)
+    if m:
+        lo, hi = sorted((int(m.group(1)), int(m.group(2))))
+        years = (lo, hi)
+        text = text[:m.start()] + " " + text[m.end():]
+    levels: Set[str] = set()
+    words: List[str] = []
+    for w in _RE_WORD.findall(text):
+        if years is None and _RE_YEAR.match(w):
+            years = (int(w), int(w))
+        elif w in _LEVEL_QUERY:
+            levels.add(_LEVEL_QUERY[w])
+        elif w in _QUERY_FILLER and levels:
+            continue  # "high school" -> hs, not hs + "school"
+        else:
+            words.append(w)
+    return years, levels, words
+
+
+class SetNameIndex:
+    """Trigram postings plus per-name year/level, built from one set list."""
+
+    def __init__(self, set_names: Sequence[str]):
+        self.names: List[str] = list(set_names)
+        self.lowered: List[str] = [n.lower() for n in self.names]
+        self.words: List[Tuple[str, ...]] = [tuple(_RE_WORD.findall(n)) for n in self.lowered]
+        self.years: List[Optional[int]] = []
+        self.levels: List[FrozenSet[str]] = []
+        self.postings: Dict[str, Set[int]] = {}
+        for i, (low, words) in enumerate(zip(self.lowered, self.words)):
+            year = next((int(w) for w in words if _RE_YEAR.match(w)), None)
+            self.years.append(year)
+            self.levels.append(_name_levels(low))
+            for w in words:
+                for tri in _trigrams(w):
+                    self.postings.setdefault(tri, set()).add(i)
+        self.exact: Set[str] = set(self.names)
+        self.digest = set_list_digest(self.names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # -- persistence --
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Write the names and the trigram postings as JSON (plain data, nothing executable)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "version": INDEX_VERSION,
+            "digest": self.digest,
+            "names": self.names,
+            "years": self.years,
+            "levels": [sorted(levels) for levels in self.levels],
+            "postings": {tri: sorted(ids) for tri, ids in self.postings.items()},
+        }
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> Optional["SetNameIndex"]:
+        """The saved index, or None if it is missing, unreadable, stale or malformed."""
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+            if data.get("version") != INDEX_VERSION:
+                return None
+            names = [str(n) for n in data["names"]]
+            if set_list_digest(names) != data["digest"]:
+                return None
+            index = cls.__new__(cls)
+            index.names = names
+            index.lowered = [n.lower() for n in names]
+            index.words = [tuple(_RE_WORD.findall(n)) for n in index.lowered]
+            index.years = [None if y is None else int(y) for y in data["years"]]
+            index.levels = [frozenset(levels) for levels in data["levels"]]
+            index.postings = {tri: set(ids) for tri, ids in data["postings"].items()}
+            index.exact = set(names)
+            index.digest = data["digest"]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+        if not len(index.years) == len(index.levels) == len(names):
+            return None
+        return index
+
+    # -- search --
+
+    def _filtered(self, years: Optional[Tuple[int, int]], levels: Set[str]) -> Optional[Set[int]]:
+        if years is None and not levels:
+            return None
+        keep = set()
+        for i, (year, name_levels) in enumerate(zip(self.years, self.levels)):
+            if years is not None and (year is None or not years[0] <= year <= years[1]):
+                continue
+            if levels and not levels <= name_levels:
+                continue
+            keep.add(i)
+        return keep
+
+    def _containing(self, word: str, pool: Optional[Set[int]]) -> Set[int]:
+        tris = _inner_trigrams(word)
+        if tris:
+            # every trigram of the word must be in the name; the substring check confirms order
+            cands: Optional[Set[int]] = None
+            for tri in sorted(tris, key=lambda t: len(self.postings.get(t, ()))):
+                posting = self.postings.get(tri)
+                if not posting:
+                    return set()
+                cands = set(posting) if cands is None else cands & posting
+                if not cands:
+                    return set()
+            if pool is not None:
+                cands &= pool
+        else:
+            cands = set(range(len(self.names))) if pool is None else set(pool)
+        return {i for i in cands if word in self.lowered[i]}
+
+    def containing(self, text: str) -> List[str]:
+        """Names containing `text` as a case-insensitive substring, in set-list order."""
+        text = (text or "").lower()
+        cands: Optional[Set[int]] = None
+        for w in sorted(set(_RE_WORD.findall(text)), key=len, reverse=True):
+            cands = self._containing(w, cands)  # every word of the text is in a matching name
+            if not cands:
+                return []
+        pool = range(len(self.names)) if cands is None else sorted(cands)
+        return [self.names[i] for i in pool if text in self.lowered[i]]
+
+    def _score(self, i: int, words: List[str], phrase: str) -> float:
+        name = self.lowered[i]
+        rest = " ".join(w for w in self.words[i] if not _RE_YEAR.match(w))
+        score = 1.0
+        if len(words) > 1 and phrase in name:
+            score += 0.5
+        if any(nw.startswith(words[0]) for nw in self.words[i]):
+            score += 0.25
+        if rest.startswith(phrase):
+            score += 0.25
+        score += 0.25 * min(1.0, len(phrase) / max(1, len(rest)))
+        return score
+
+    def _fuzzy(self, words: List[str], pool: Optional[Set[int]], min_containment: float) -> Dict[int, float]:
+        """Mean best trigram containment of each query word, for names above the cut-off."""
+        per_word: List[Dict[int, float]] = []
+        for w in words:
+            tris = _trigrams(w)
+            counts: Dict[int, int] = {}
+            for tri in tris:
+                for i in self.postings.get(tri, ()):
+                    if pool is None or i in pool:
+                        counts[i] = counts.get(i, 0) + 1
+            per_word.append({i: c / len(tris) for i, c in counts.items()})
+        scores = {}
+        for i in set().union(*per_word) if per_word else ():
+            sim = sum(pw.get(i, 0.0) for pw in per_word) / len(per_word)
+            if sim >= min_containment:
+                scores[i] = sim
+        return scores
+
+    def search(
+        self,
+        query: str,
+        limit: Optional[int] = None,
+        *,
+        fuzzy: bool = True,
+        min_containment: float = FUZZY_MIN_CONTAINMENT,
+    ) -> List[SetMatch]:
+        """
+        Ranked set names for `query`, best first.
+
+        Exact matches (every word is a substring of the name) score >= 1. Only if there
+        are none, and `fuzzy` is on, trigram-similar names are returned with scores < 1.
+        """
+        years, levels, words = _parse_query(query)
+        if years is None and not levels and not words:
+            return []
+        pool = self._filtered(years, levels)
+
+        is_fuzzy = False
+        if not words:
+            scored = {i: 1.0 for i in pool or ()}
+        else:
+            cands = pool
+            for w in sorted(words, key=len, reverse=True):
+                cands = self._containing(w, cands)
+                if not cands:
+                    break
+            phrase = " ".join(words)
+            scored = {i: self._score(i, words, phrase) for i in cands or ()}
+            if not scored and fuzzy:
+                scored = {i: 0.99 * sim for i, sim in self._fuzzy(words, pool, min_containment).items()}
+                is_fuzzy = True
+
+        # best score, then newest year, then the set list's own order
+        ranked = sorted(scored, key=lambda i: (-scored[i], -(self.years[i] or 0), i))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [SetMatch(self.names[i], scored[i], is_fuzzy) for i in ranked]
+
+    def resolve(self, term: str) -> Optional[str]:
+        """`term` if it is an exact set name, else the best-ranked match (or None)."""
+        if term in self.exact:
+            return term
+        best = self.search(term, limit=1)
+        return best[0].name if best else None
+
+
+_loaded: Dict[str, SetNameIndex] = {}
+
+
+def get_set_index(
+    set_names: Sequence[str],
+    index_dir: Union[str, Path, None] = DEFAULT_INDEX_DIR,
+) -> SetNameIndex:
+    """
+    The index for this exact set list: from memory, else from `index_dir`, else built
+    (and saved there, replacing indexes of older snapshots). index_dir=None skips disk.
+    """
+    digest = set_list_digest(list(set_names))
+    index = _loaded.get(digest)
+    if index is not None:
+        return index
+    path = Path(index_dir) / f"{digest}.json" if index_dir is not None else None
+    if path is not None:
+        index = SetNameIndex.load(path)
+    if index is None:
+        index = SetNameIndex(set_names)
+        if path is not None:
+            try:
+                index.save(path)
+                # older snapshots, and pickles from before the JSON format (never loaded)
+                for old in [*path.parent.glob("*.json"), *path.parent.glob("*.pickle")]:
+                    if old != path:
+                        old.unlink()
+            except OSError:
+                pass  # a read-only checkout still gets the in-memory index
+    _loaded[digest] = index
+    return index
@@ -0,0 +1,115 @@
+"""
+Local snapshot of the QBReader set list, so the CLI can show its first prompt without
+waiting on the network.
+
+get_set_list_snapshot() returns the saved list straight away and, once it is older than
+`refresh_after` seconds, starts a background thread that fetches a fresh list and
+atomically replaces the snapshot for the next run. Only the very first run (no snapshot
+yet, or a different base URL) blocks on /set-list.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from extract_and_filter import get_set_list
+
+DEFAULT_SNAPSHOT_PATH = Path(".qb_cache") / "set_list.json"
+DEFAULT_REFRESH_AFTER = 6 * 60 * 60  # seconds
+
+_refreshing: Dict[Path, threading.Thread] = {}
+_lock = threading.Lock()
+
+
+def set_list_digest(sets: List[str]) -> str:
+    """Short content hash identifying one version of the set list."""
+    return hashlib.sha256("\n".join(sets).encode("utf-8")).hexdigest()[:16]
+
+
+def load_snapshot(path: Union[str, Path] = DEFAULT_SNAPSHOT_PATH) -> Optional[Dict[str, Any]]:
+    """The saved snapshot ({"base_url", "fetched_at", "digest", "sets"}), or None."""
+    try:
+        snap = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(snap, dict) or not isinstance(snap.get("sets"), list):
+        return None
+    return snap
+
+
+def save_snapshot(
+    sets: List[str],
+    base_url: str,
+    path: Union[str, Path] = DEFAULT_SNAPSHOT_PATH,
+) -> Dict[str, Any]:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    snap = {"base_url": base_url, "fetched_at": time.time(), "digest": set_list_digest(sets), "sets": sets}
+    # write-then-rename so a reader (or a killed background refresh) never sees half a file
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(snap), encoding="utf-8")
+    os.replace(tmp, path)
+    return snap
+
+
+def refresh_snapshot(
+    base_url: str = "https://www.qbreader.org/api",
+    path: Union[str, Path] = DEFAULT_SNAPSHOT_PATH,
+) -> Dict[str, Any]:
+    """Fetch the set list now (bypassing the response cache) and save it."""
+    return save_snapshot(get_set_list(base_url, refresh=True), base_url, path)
+
+
+def _refresh_in_background(base_url: str, path: Path) -> Optional[threading.Thread]:
+    def _run() -> None:
+        try:
+            refresh_snapshot(base_url, path)
+        except Exception:
+            pass  # keep serving the old snapshot; the next start tries again
+        finally:
+            with _lock:
+                _refreshing.pop(path, None)
+
+    with _lock:
+        if path in _refreshing:
+            return _refreshing[path]
+        thread = threading.Thread(target=_run, name="set-list-refresh", daemon=True)
+        _refreshing[path] = thread
+    thread.start()
+    return thread
+
+
+def get_set_list_snapshot(
+    base_url: str = "https://www.qbreader.org/api",
+    *,
+    path: Union[str, Path] = DEFAULT_SNAPSHOT_PATH,
+    refresh_after: float = DEFAULT_REFRESH_AFTER,
+    background: bool = True,
+) -> List[str]:
+    """
+    Set names from the local snapshot, fetching synchronously only if there is none.
+
+    A snapshot older than `refresh_after` seconds is still returned, and a background
+    refresh is started (or, with background=False, it is refreshed before returning).
+    """
+    path = Path(path)
+    snap = load_snapshot(path)
+    if snap is None or snap.get("base_url") != base_url:
+        return refresh_snapshot(base_url, path)["sets"]
+    if time.time() - float(snap.get("fetched_at", 0)) > refresh_after:
+        if not background:
+            return refresh_snapshot(base_url, path)["sets"]
+        _refresh_in_background(base_url, path)
+    return snap["sets"]
+
+
+def wait_for_refresh(path: Union[str, Path] = DEFAULT_SNAPSHOT_PATH, timeout: Optional[float] = None) -> None:
+    """Block until a background refresh of `path` (if any) finishes."""
+    with _lock:
+        thread = _refreshing.get(Path(path))
+    if thread is not None:
+        thread.join(timeout)
@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+
+@pytest.fixture
+def qbreader_stub():
+    """A local QBReader stand-in (benchmarks/stand_ins.py) without added latency."""
+    from stand_ins import StubQBReader
+
+    with StubQBReader(sets=4, matches_per_set=12, latency_ms=0, jitter_ms=0) as stub:
+        yield stub
+
+
+@pytest.fixture(autouse=True)
+def _scratch_cwd(tmp_path, monkeypatch):
+    """Run each test in a fresh directory, so default .qb_cache paths stay out of the repo."""
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,33 @@
+from adaptive_retrieval import get_questions_adaptive
+from prompt_builder import build_prompt_sections
+from qbreader_client import QBReaderClient
+
+
+def test_prompt_token_estimate_matches_the_prompt_builder(qbreader_stub, capsys):
+    client = QBReaderClient(cache=None)
+    try:
+        result = get_questions_adaptive(
+            "x", qbreader_stub.set_names[:2], qbreader_stub.base_url,
+            client=client, max_questions=12, min_novelty=0.0, raw_mode="none",
+        )
+    finally:
+        client.close()
+    assert result.stop_reason == "max_questions" and len(result.questions) == 12
+    texts = [q["question"] for q in result.questions]
+    # similarity above 1 turns deduplication off, matching the per-question estimate
+    sections = build_prompt_sections(texts, result.first_sentences, token_budget=None, similarity=2)
+    assert result.prompt_tokens == sections.tokens
+    assert capsys.readouterr().out == ""
+
+
+def test_token_budget_stops_retrieval(qbreader_stub):
+    client = QBReaderClient(cache=None)
+    try:
+        result = get_questions_adaptive(
+            "x", qbreader_stub.set_names[:1], qbreader_stub.base_url,
+            client=client, max_prompt_tokens=400, min_novelty=0.0, raw_mode="none",
+        )
+    finally:
+        client.close()
+    assert result.stop_reason == "token_budget"
+    assert 0 < result.prompt_tokens <= 400
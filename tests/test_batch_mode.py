@@ -0,0 +1,86 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import batch_mode
+from batch_mode import compact_output, finished_ids, normalize_job, resolve_sets, run_batch
+from set_index import SetNameIndex
+from stand_ins import FakeGenai
+
+SETS = ["2019 ACF Regionals", "2018 ACF Regionals", "2019 HSNCT"]
+
+
+def test_resolve_sets_reports_substitutions_and_rejects_weak_matches():
+    index = SetNameIndex(SETS)
+    names, subs = resolve_sets(index, ["2019 HSNCT", "2018 regionls"])
+    assert names == ["2019 HSNCT", "2018 ACF Regionals"]
+    assert subs == {"2018 regionls": "2018 ACF Regionals"}
+    with pytest.raises(ValueError, match="zzzz"):
+        resolve_sets(index, ["zzzz"])
+    with pytest.raises(ValueError):
+        resolve_sets(index, ["2018 regionls"], min_score=1.0)
+
+
+def test_compact_output_keeps_the_last_line_per_id(tmp_path):
+    out = tmp_path / "results.jsonl"
+    out.write_text(
+        '{"id": "a", "status": "error"}\n{"id": "b", "status": "ok"}\n'
+        '{"id": "a", "status": "ok"}\n{"id": "c", "st',
+        encoding="utf-8",
+    )
+    assert compact_output(out) == 2  # the superseded error and the half-written line
+    assert [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()] == [
+        {"id": "a", "status": "ok"}, {"id": "b", "status": "ok"},
+    ]
+    assert finished_ids(out) == {"a", "b"}
+
+
+def test_rerun_retries_errors_and_leaves_one_line_per_id(qbreader_stub, tmp_path, capsys):
+    index = SetNameIndex(qbreader_stub.set_names)
+    jobs = [normalize_job({"id": "good", "query": "x", "n": 4, "sets": qbreader_stub.set_names[0]}),
+            normalize_job({"id": "bad", "query": "x", "n": 4, "sets": "no such set"})]
+    out = tmp_path / "results.jsonl"
+    kwargs = dict(base_url=qbreader_stub.base_url, use_llm=False, set_index=index)
+
+    first = asyncio.run(run_batch(jobs, out, **kwargs))
+    assert (first["ok"], first["error"]) == (1, 1)
+    jobs[1] = normalize_job({"id": "bad", "query": "x", "n": 4, "sets": "stub set 1"})
+    second = asyncio.run(run_batch(jobs, out, **kwargs))
+    assert (second["skipped"], second["ok"]) == (1, 1)
+
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert sorted((r["id"], r["status"]) for r in records) == [("bad", "ok"), ("good", "ok")]
+    (bad,) = [r for r in records if r["id"] == "bad"]
+    assert bad["set_substitutions"] == {"stub set 1": bad["sets"][0]}
+
+
+def test_a_slow_gemini_call_does_not_hold_up_retrieval(qbreader_stub, tmp_path, monkeypatch):
+    jobs = [normalize_job({"id": str(i), "query": f"q{i}", "n": 2, "sets": qbreader_stub.set_names[i]})
+            for i in range(3)]
+    retrieving = []
+    all_retrieving = threading.Event()
+    retrieve = batch_mode.get_top_n_questions_async
+
+    async def counting_retrieve(query, *args, **kwargs):
+        retrieving.append(query)
+        if len(retrieving) == len(jobs):
+            all_retrieving.set()
+        return await retrieve(query, *args, **kwargs)
+
+    class SlowGenai(FakeGenai):
+        overlapped = []
+
+        def generate_content_stream(self, model, contents):
+            # the first reply only comes once every job has started retrieving
+            if not self.overlapped:
+                self.overlapped.append(all_retrieving.wait(2))
+            return super().generate_content_stream(model, contents)
+
+    monkeypatch.setattr(batch_mode, "get_top_n_questions_async", counting_retrieve)
+    monkeypatch.setattr(batch_mode, "get_gemini_client", lambda: SlowGenai(first_chunk_ms=0, chunk_ms=0))
+    counts = asyncio.run(run_batch(jobs, tmp_path / "out.jsonl", base_url=qbreader_stub.base_url,
+                                   qb_concurrency=1, gemini_concurrency=1))
+    assert counts["ok"] == 3
+    assert SlowGenai.overlapped == [True]
@@ -0,0 +1,62 @@
+import clue_ranker
+from clue_ranker import ClueBackground, rank_clues, summarize_clues
+
+QUESTIONS = [
+    "This scientist explained the photoelectric effect. He later studied Brownian motion. "
+    "For 10 points, name this physicist Einstein.",
+    "The photoelectric effect was explained by this man. His Brownian motion paper followed. "
+    "For 10 points, name this Einstein.",
+    "Brownian motion was the topic of one paper by this thinker. He also wrote on the "
+    "photoelectric effect. For 10 points, name this Einstein.",
+]
+POWER = [
+    "This scientist explained the photoelectric effect.",
+    "The photoelectric effect was explained by this man.",
+    "Brownian motion was the topic of one paper by this thinker.",
+]
+
+
+def _phrases(clues):
+    return [c.phrase for c in clues]
+
+
+def test_phrases_in_many_questions_and_early_rank_first():
+    clues = rank_clues(QUESTIONS, POWER, query="Einstein", top_k=None)
+    assert _phrases(clues) == ["photoelectric effect", "explained", "brownian motion", "paper"]
+    top, brownian = clues[0], clues[2]
+    assert (top.questions, top.power_questions) == (3, 2)
+    assert (brownian.questions, brownian.power_questions) == (3, 1)
+    # same support, but "photoelectric effect" is more often in the power part
+    assert top.score > brownian.score
+
+
+def test_query_words_stopwords_and_subsumed_phrases_are_left_out():
+    phrases = _phrases(rank_clues(QUESTIONS, POWER, query="Einstein", top_k=None))
+    assert not any("einstein" in p for p in phrases)
+    assert "for 10 points" not in phrases and "name" not in phrases
+    # same support as "photoelectric effect", so the single words add nothing
+    assert "photoelectric" not in phrases and "effect" not in phrases
+
+
+def test_min_questions_top_k_and_background():
+    assert rank_clues(QUESTIONS, POWER, query="Einstein", min_questions=4) == []
+    assert len(rank_clues(QUESTIONS, POWER, query="Einstein", top_k=1)) == 1
+    # "photoelectric effect" is everywhere in the background, so it drops to last
+    background = ClueBackground().fit(["the photoelectric effect"] * 50 + ["a paper"])
+    ranked = rank_clues(QUESTIONS, POWER, query="Einstein", background=background)
+    assert _phrases(ranked)[-1] == "photoelectric effect"
+    assert " 2. brownian motion  (3/3 questions, 1 in power" in summarize_clues(ranked, 3)
+
+
+def test_phrase_ids_that_overflow_int64_fall_back_to_exact_rows(monkeypatch):
+    # 4-grams over a ~40k-word vocabulary: 5 * 40001**4 is past 2**63
+    filler = " ".join(f"w{i}" for i in range(40000))
+    questions = [f"{filler}. Quantum lattice entropy tensor here.", "Quantum lattice entropy tensor again."]
+    assert not clue_ranker._packed_ids_fit(40010, 4)
+    clues = rank_clues(questions, ngram_range=(1, 4), top_k=3)
+    assert [(c.phrase, c.questions) for c in clues] == [("quantum lattice entropy tensor", 2)]
+
+    # both id schemes rank small inputs identically
+    packed = rank_clues(QUESTIONS, POWER, query="Einstein", top_k=None)
+    monkeypatch.setattr(clue_ranker, "_packed_ids_fit", lambda base, max_n: False)
+    assert rank_clues(QUESTIONS, POWER, query="Einstein", top_k=None) == packed
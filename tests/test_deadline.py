@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+import pytest
+
+from deadline import Deadline, DeadlineExceeded, hedged, iter_until
+
+
+def _slow(items, delay):
+    for item in items:
+        time.sleep(delay)
+        yield item
+
+
+def test_iter_until_without_limit_waits_for_a_slow_stream():
+    # Deadline(None) is what the service builds for --deadline 0 ("no limit")
+    assert list(iter_until(lambda: _slow("abc", 0.05), Deadline(None))) == ["a", "b", "c"]
+
+
+def test_iter_until_raises_at_the_deadline():
+    out = []
+    with pytest.raises(DeadlineExceeded):
+        for item in iter_until(lambda: _slow("abc", 0.2), Deadline(0.3)):
+            out.append(item)
+    assert out == ["a"]
+
+
+def test_hedged_without_limit_returns_the_result():
+    async def call():
+        await asyncio.sleep(0.05)
+        return 42
+
+    assert asyncio.run(hedged(call, Deadline(None), hedge_after=0.01)) == 42
+
+
+def test_hedged_second_copy_wins_when_the_first_is_slow():
+    delays = [1.0, 0.01]
+
+    async def call():
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        return delay
+
+    assert asyncio.run(hedged(call, Deadline(2), hedge_after=0.05)) == 0.01
@@ -0,0 +1,38 @@
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def collecting():
+    metrics.enable()
+    metrics.reset()
+    yield
+    metrics.reset()
+    metrics.disable()
+
+
+def test_prometheus_counters_keep_every_digit(collecting):
+    metrics.inc("qbt_qbreader_bytes_total", 12345678, endpoint="query")
+    metrics.inc("qbt_gemini_tokens_total", 0.1, kind="prompt")
+    text = metrics.to_prometheus()
+    assert 'qbt_qbreader_bytes_total{endpoint="query"} 12345678\n' in text
+    assert 'qbt_gemini_tokens_total{kind="prompt"} 0.1\n' in text
+
+
+def test_histogram_buckets_are_cumulative(collecting):
+    for _ in range(3):
+        with metrics.span("normalize", trace=False):
+            pass
+    (row,) = metrics.snapshot()["histograms"]["qbt_stage_duration_seconds"]
+    assert row["labels"] == {"stage": "normalize"}
+    assert row["count"] == row["buckets"]["+Inf"] == 3
+
+
+def test_disabled_collects_nothing():
+    metrics.disable()
+    metrics.reset()
+    metrics.inc("qbt_questions_normalized_total", 5)
+    with metrics.span("normalize"):
+        pass
+    assert metrics.snapshot() == {"counters": {}, "histograms": {}}
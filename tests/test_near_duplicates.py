@@ -0,0 +1,38 @@
+import random
+
+from near_duplicates import NearDuplicateIndex, dedupe_questions
+
+BASE = ("This physicist's 1905 papers introduced the light quantum and special relativity, "
+        "and he later explained Brownian motion. For 10 points, name this scientist.")
+
+
+def test_lightly_edited_copy_is_a_duplicate():
+    index = NearDuplicateIndex(0.8)
+    assert index.add("a", BASE) is None
+    assert index.add("b", "<b>" + BASE.replace("This physicist's", "This physicist’s") + "</b>") == "a"
+    assert index.find("An unrelated question about the Treaty of Westphalia.") is None
+    assert len(index) == 1
+
+
+def test_dedupe_questions_keeps_the_first_of_each_group():
+    questions = [
+        {"id": "1", "question": BASE},
+        {"id": "2", "question": "A question about the Congress of Vienna and Metternich."},
+        {"id": "3", "question": BASE + " "},
+    ]
+    kept, dropped = dedupe_questions(questions)
+    assert [q["id"] for q in kept] == ["1", "2"]
+    assert [q["id"] for q in dropped] == ["3"]
+
+
+def test_pairs_just_above_the_threshold_are_found():
+    # 50-word sets with 5 words swapped: Jaccard 45/55 ~= 0.82, just above 0.8
+    rng = random.Random(7)
+    vocab = [f"w{i}" for i in range(5000)]
+    found = 0
+    for seed in range(300):
+        words = rng.sample(vocab, 55)
+        index = NearDuplicateIndex(0.8, shingle_size=1, seed=seed)
+        index.add("a", " ".join(words[:50]))
+        found += index.find(" ".join(words[:45] + words[50:])) == "a"
+    assert found >= 294  # >= 98%; the midpoint-at-threshold shape found ~75%
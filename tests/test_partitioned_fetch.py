@@ -0,0 +1,51 @@
+from collections import Counter
+
+from extract_and_filter import _allocate, get_top_n_questions
+from qbreader_client import QBReaderClient
+
+
+def _fetch(stub, sets, n, **kwargs):
+    client = QBReaderClient(cache=None, rate=1000, burst=1000)
+    try:
+        return get_top_n_questions("x", sets, n, stub.base_url, client=client, **kwargs)
+    finally:
+        client.close()
+
+
+def _shares(results):
+    return Counter((q["setName"], q["type"]) for q in results)
+
+
+def test_batched_sets_match_the_per_set_path(qbreader_stub, capsys):
+    sets = qbreader_stub.set_names
+    per_set = _fetch(qbreader_stub, sets, 18)
+    sent = qbreader_stub.requests
+    batched = _fetch(qbreader_stub, sets, 18, batch_sets=True)
+    assert [q["id"] for q in batched] == [q["id"] for q in per_set]
+    assert [q["question"] for q in batched] == [q["question"] for q in per_set]
+    # one unrestricted page per question type instead of two requests per set
+    assert qbreader_stub.requests - sent == 2 < sent
+
+
+def test_batched_sets_are_split_by_the_per_set_allocation(qbreader_stub, capsys):
+    # the server caps pages at 5 of the 48 matches per type, and the first page is all set 0
+    qbreader_stub.page_size = 5
+    sets = qbreader_stub.set_names[1:]
+    results = _fetch(qbreader_stub, sets, 11, batch_sets=True, max_concurrency=1)
+    assert _shares(results) == Counter({
+        (s, t): count for s, tossups, bonuses in _allocate(sets, 11)
+        for t, count in (("tossup", tossups), ("bonus", bonuses)) if count
+    })
+    assert [q["setName"] for q in results] == sorted((q["setName"] for q in results), key=sets.index)
+    # paging stops at page 8 of each type, the first holding set 3 (matches 36-47)
+    assert qbreader_stub.requests == 2 * 8
+
+
+def test_batched_shortfall_is_made_up_from_other_sets(qbreader_stub, capsys):
+    sets = qbreader_stub.set_names
+    qbreader_stub._questions(sets[0])["tossups"][1:] = []
+    per_set = _fetch(qbreader_stub, sets, 24)
+    batched = _fetch(qbreader_stub, sets, 24, batch_sets=True)
+    assert len(batched) == len(per_set) == 24
+    assert _shares(batched)[(sets[0], "tossup")] == 1
+    assert Counter(q["id"] for q in batched) == Counter(q["id"] for q in per_set)
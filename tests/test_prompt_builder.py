@@ -0,0 +1,48 @@
+from prompt_builder import build_prompt_sections, estimate_tokens
+
+
+def test_lines_are_labelled_with_their_question():
+    unfiltered = [
+        "Alpha power clue here. Alpha later clue one.",
+        "Beta power clue here. Beta later clue one.",
+    ]
+    filtered = ["Alpha power clue here.", "Beta power clue here."]
+    sections = build_prompt_sections(unfiltered, filtered, token_budget=None)
+    assert sections.power_lines == ["[Q1] Alpha power clue here.", "[Q2] Beta power clue here."]
+    assert sections.later_lines == ["[Q1] Alpha later clue one.", "[Q2] Beta later clue one."]
+
+
+def test_labels_stay_aligned_when_a_question_loses_its_power_line():
+    # question 2's power clue duplicates question 1's, so only its later clue survives
+    unfiltered = [
+        "The same opening clue about a lens. Gamma later clue.",
+        "The same opening clue about a lens. Delta later clue.",
+    ]
+    filtered = ["The same opening clue about a lens.", "The same opening clue about a lens."]
+    sections = build_prompt_sections(unfiltered, filtered, token_budget=None)
+    assert sections.power_lines == ["[Q1] The same opening clue about a lens."]
+    assert sections.later_lines == ["[Q1] Gamma later clue.", "[Q2] Delta later clue."]
+    assert sections.dropped_duplicates == 1
+
+
+def test_budget_and_duplicate_drops_are_counted_separately():
+    powers = [f"Power clue {word} names a famous equation." for word in ("alpha", "beta", "gamma")]
+    unfiltered = [f"{power} The same later clue about relativity." for power in powers]
+    budget = sum(estimate_tokens(p) + 1 + estimate_tokens(f"[Q{i}] ") for i, p in enumerate(powers, 1))
+    sections = build_prompt_sections(unfiltered, powers, token_budget=budget)
+    assert len(sections.power_lines) == 3 and sections.later_lines == []
+    assert sections.tokens == budget
+    assert sections.dropped_for_budget == 1   # the later clue, over budget
+    assert sections.dropped_duplicates == 2   # its copies, found past the cut-off
+
+
+def test_clues_at_the_threshold_are_always_caught_as_duplicates():
+    # 500 clue pairs of 9 distinct words differing in one word: Jaccard 8/10, exactly 0.8
+    unfiltered = []
+    for i in range(500):
+        words = [f"w{i}x{j}" for j in range(9)]
+        edited = words[:-1] + [f"w{i}edit"]
+        unfiltered += [" ".join(words) + ".", " ".join(edited) + "."]
+    sections = build_prompt_sections(unfiltered, [""] * len(unfiltered), token_budget=None)
+    assert sections.dropped_duplicates == 500
+    assert len(sections.later_lines) == 500
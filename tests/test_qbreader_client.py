@@ -0,0 +1,30 @@
+from extract_and_filter import get_top_n_questions, iter_questions
+from qbreader_client import QBReaderClient
+from response_cache import ResponseCache
+
+
+def test_sync_calls_reuse_one_aiohttp_pool(qbreader_stub, capsys):
+    client = QBReaderClient(cache=None)
+    try:
+        first = get_top_n_questions("x", qbreader_stub.set_names[:2], 6, qbreader_stub.base_url, client=client)
+        session = client._aio_session
+        assert session is not None and not session.closed
+        assert list(iter_questions("x", qbreader_stub.set_names[:1], 2, qbreader_stub.base_url, client=client))
+        second = get_top_n_questions("x", qbreader_stub.set_names[:2], 6, qbreader_stub.base_url, client=client)
+        assert client._aio_session is session and not session.closed
+        assert [q["id"] for q in first] == [q["id"] for q in second]
+    finally:
+        client.close()
+    assert session.closed
+
+
+def test_async_cache_hit_skips_the_network(qbreader_stub, capsys):
+    client = QBReaderClient(cache=ResponseCache(":memory:"))
+    try:
+        get_top_n_questions("x", qbreader_stub.set_names[:1], 4, qbreader_stub.base_url, client=client)
+        sent = qbreader_stub.requests
+        get_top_n_questions("x", qbreader_stub.set_names[:1], 4, qbreader_stub.base_url, client=client)
+        assert qbreader_stub.requests == sent
+        assert client.cache.hits > 0
+    finally:
+        client.close()
@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+import question_mirror
+from qbreader_client import QBReaderClient
+from question_mirror import QuestionMirror, ingest, sync
+
+
+def _mirror_counts(mirror, set_name):
+    data = mirror.query({"queryString": "", "setName": set_name, "maxReturnLength": 100})
+    return data["tossups"]["count"], data["bonuses"]["count"]
+
+
+def test_ingest_pages_past_a_server_side_page_cap(qbreader_stub, capsys):
+    qbreader_stub.page_size = 5  # the server caps maxReturnLength well below INGEST_PAGE_SIZE
+    mirror = QuestionMirror(":memory:")
+    name = qbreader_stub.set_names[0]
+    stored = ingest(mirror, qbreader_stub.base_url, sets=[name], client=QBReaderClient(cache=None))
+    assert stored[name] == (12, 12)
+    assert _mirror_counts(mirror, name) == (12, 12)
+
+
+def test_sync_probes_sets_and_refetches_only_changed_ones(qbreader_stub, capsys):
+    mirror = QuestionMirror(":memory:")
+    client = QBReaderClient(cache=None, rate=1000, burst=1000)
+    assert set(sync(mirror, qbreader_stub.base_url, client=client).values()) == {"new"}
+
+    before = qbreader_stub.requests
+    assert set(sync(mirror, qbreader_stub.base_url, client=client).values()) == {"unchanged"}
+    assert qbreader_stub.requests - before == 2 * len(qbreader_stub.set_names)  # probes only
+
+    name = qbreader_stub.set_names[1]
+    last = qbreader_stub._questions(name)["tossups"][-1]
+    last.update(question="Edited upstream.", updatedAt="2026-10-16T00:00:00Z")
+    status = sync(mirror, qbreader_stub.base_url, client=client)
+    assert [s for s, v in status.items() if v != "unchanged"] == [name]
+    raws = mirror.query({"queryString": "", "setName": name, "questionType": "tossup", "maxReturnLength": 100})
+    assert raws["tossups"]["questionArray"][-1]["question"] == "Edited upstream."
+
+    # an in-place edit to a middle question leaves the fingerprint alone; full=True refetches
+    qbreader_stub._questions(name)["tossups"][5]["question"] = "Edited again."
+    assert sync(mirror, qbreader_stub.base_url, client=client)[name] == "unchanged"
+    assert sync(mirror, qbreader_stub.base_url, client=client, full=True)[name] == "changed"
+    raws = mirror.query({"queryString": "", "setName": name, "questionType": "tossup", "maxReturnLength": 100})
+    assert raws["tossups"]["questionArray"][5]["question"] == "Edited again."
+
+
+def test_replace_set_streams_pages_and_keeps_the_old_set_on_failure(monkeypatch):
+    monkeypatch.setattr(question_mirror, "INGEST_PAGE_SIZE", 2)
+    mirror = QuestionMirror(":memory:")
+    mirror.replace_set("A", [{"_id": "a0", "answer": "Einstein", "question": "Q."}], [], 0.0)
+    staged = []
+
+    def tossups():
+        for i in range(5):
+            staged.append(mirror._conn.execute("SELECT COUNT(*) FROM questions_staging").fetchone()[0])
+            yield {"_id": f"a{i + 1}", "answer": "Bohr", "question": "Q."}
+        raise ConnectionError("dropped mid-set")
+
+    with pytest.raises(ConnectionError):
+        mirror.replace_set("A", tossups(), [], 1.0)
+    assert staged == [0, 0, 2, 2, 4]  # written a page at a time, not held until the end
+    assert _mirror_counts(mirror, "A") == (1, 0)
+    assert mirror.replace_set("A", iter([{"_id": "a9", "answer": "Bohr", "question": "Q."}]), [], 2.0) == (1, 0)
+    assert mirror._conn.execute("SELECT COUNT(*) FROM questions_staging").fetchone()[0] == 0
+
+
+def test_readers_are_not_blocked_while_a_set_downloads():
+    mirror = QuestionMirror(":memory:")
+    mirror.replace_set("A", [{"_id": "a1", "answer": "Einstein", "question": "Q."}], [], 0.0)
+    downloading = threading.Event()
+    release = threading.Event()
+
+    def slow_tossups():
+        downloading.set()
+        release.wait(5)
+        yield {"_id": "b1", "answer": "Bohr", "question": "Q."}
+
+    writer = threading.Thread(target=mirror.replace_set, args=("B", slow_tossups(), [], 0.0))
+    writer.start()
+    assert downloading.wait(5)
+    counts = []
+    reader = threading.Thread(target=lambda: counts.append(_mirror_counts(mirror, "A")))
+    reader.start()
+    reader.join(2)
+    finished = not reader.is_alive()
+    release.set()
+    reader.join(5)
+    assert finished and counts == [(1, 0)]
+    writer.join(5)
+    assert _mirror_counts(mirror, "B") == (1, 0)
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+from question_record import QuestionRecord
+
+
+def _record(raw_mode="full"):
+    raw = {"_id": "t1", "question": "<b>Clue</b>.", "answer": "Einstein"}
+    return QuestionRecord("tossup", "t1", "Einstein", "Clue.", "2019 ACF", raw, raw_mode)
+
+
+def test_reads_like_the_old_dicts():
+    q = _record()
+    assert q["question"] == "Clue." and q.get("setName") == "2019 ACF"
+    assert list(q) == ["type", "id", "answer", "question", "setName", "raw"]
+    assert dict(q) == q.to_dict()
+
+
+def test_writes_go_through_to_fields_and_extras():
+    q = _record()
+    q["answer"] = "Albert Einstein"
+    q["score"] = 0.5
+    assert q.answer == "Albert Einstein" and q["score"] == 0.5
+    assert q.to_dict()["score"] == 0.5 and len(q) == 7
+    del q["score"]
+    assert "score" not in q and len(q) == 6
+    with pytest.raises(TypeError):
+        del q["question"]
+
+
+def test_lazy_raw_round_trips_and_serializes():
+    q = _record("lazy")
+    assert q["raw"]["answer"] == "Einstein"
+    assert json.loads(json.dumps(q.to_dict()))["raw"]["_id"] == "t1"
+    assert json.loads(json.dumps(q, default=dict))["id"] == "t1"
@@ -0,0 +1,93 @@
+import asyncio
+
+from extract_and_filter import _fetch_query_page_async, _refill_shortfall_async, get_top_n_questions
+from qbreader_client import QBReaderClient
+
+
+def _fetch(stub, sets, n, **kwargs):
+    client = QBReaderClient(cache=None, rate=1000, burst=1000)
+    try:
+        return get_top_n_questions("x", sets, n, stub.base_url, client=client, **kwargs)
+    finally:
+        client.close()
+
+
+def _keep(stub, set_name, tossups, bonuses):
+    corpus = stub._questions(set_name)
+    corpus["tossups"][tossups:] = []
+    corpus["bonuses"][bonuses:] = []
+
+
+def test_shortfall_is_refilled_across_pages(qbreader_stub, capsys):
+    # one question per set and type, so each refill page holds a single question
+    sets = qbreader_stub.set_names
+    for name in sets[:3]:
+        _keep(qbreader_stub, name, 0, 0)
+    results = _fetch(qbreader_stub, sets, 8)
+    last = sets[3]
+    assert [q["id"] for q in results] == [f"{last}/t{i}" for i in range(4)] + [f"{last}/b{i}" for i in range(4)]
+    # 8 first pages, then pages 2-4 of set 3's tossups and bonuses
+    assert qbreader_stub.requests == 8 + 6
+
+
+def test_refill_stops_when_the_match_count_is_exhausted(qbreader_stub, capsys):
+    sets = qbreader_stub.set_names[:2]
+    _keep(qbreader_stub, sets[0], 0, 0)
+    _keep(qbreader_stub, sets[1], 5, 0)
+    results = _fetch(qbreader_stub, sets, 8)
+    assert [q["id"] for q in results] == [f"{sets[1]}/t{i}" for i in range(5)]
+    # pages of 2 over 5 matches: pages 2 and 3 only, nothing past the count
+    assert qbreader_stub.requests == 4 + 2
+
+
+def _refill_slot(stub, set_name, count, n):
+    """Run _refill_shortfall_async on one tossup slot whose first page (2 questions) is in."""
+    async def run():
+        client = QBReaderClient(cache=None, rate=1000, burst=1000)
+        try:
+            fetched = []
+
+            async def fetch_page(params):
+                fetched.append(params["tossupPagination"])
+                return await _fetch_query_page_async(stub.base_url, params, client=client)
+
+            slot = {
+                "params": {"queryString": "x", "setName": set_name, "questionType": "tossup", "maxReturnLength": 2},
+                "key": "tossups",
+                "page_param": "tossupPagination",
+                "raws": stub._questions(set_name)["tossups"][:2],
+                "count": count,
+                "next_page": 2,
+                "spill": [],
+            }
+            await _refill_shortfall_async(fetch_page, [slot], n)
+            return slot, fetched
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_refill_never_pages_past_the_match_count(qbreader_stub):
+    name = qbreader_stub.set_names[0]
+    _keep(qbreader_stub, name, 5, 0)
+    slot, fetched = _refill_slot(qbreader_stub, name, 5, 10)
+    assert fetched == [2, 3]
+    assert len(slot["raws"]) == 5
+
+
+def test_refill_stops_at_an_empty_page_when_the_count_was_stale(qbreader_stub):
+    # the API counted 9 matches but only 5 are left to page through
+    name = qbreader_stub.set_names[0]
+    _keep(qbreader_stub, name, 5, 0)
+    slot, fetched = _refill_slot(qbreader_stub, name, 9, 10)
+    assert fetched == [2, 3, 4]
+    assert len(slot["raws"]) == 5 and slot["count"] == 6
+
+
+def test_without_refill_short_sets_stay_short(qbreader_stub, capsys):
+    sets = qbreader_stub.set_names[:2]
+    _keep(qbreader_stub, sets[0], 0, 0)
+    results = _fetch(qbreader_stub, sets, 8, refill=False)
+    assert [q["setName"] for q in results] == [sets[1]] * 4
+    assert qbreader_stub.requests == 4
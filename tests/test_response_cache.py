@@ -0,0 +1,32 @@
+from response_cache import ResponseCache, make_key
+
+
+def test_params_are_canonicalised_in_the_key():
+    assert make_key("query", "u", {"n": 5, "x": None}) == make_key("query", "u", {"n": "5"})
+    assert make_key("query", "u", {"n": 5}) != make_key("set-list", "u", {"n": 5})
+
+
+def test_expired_entries_miss(monkeypatch):
+    cache = ResponseCache(":memory:", ttls={"query": 10})
+    now = [1000.0]
+    monkeypatch.setattr("response_cache.time.time", lambda: now[0])
+    cache.set("query", "k", {"a": 1})
+    assert cache.get("query", "k") == {"a": 1}
+    now[0] += 11
+    assert cache.get("query", "k") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_rows_are_evicted(monkeypatch):
+    cache = ResponseCache(":memory:", max_entries=2)
+    now = [1000.0]
+    monkeypatch.setattr("response_cache.time.time", lambda: now[0])
+    for key in ("a", "b"):
+        now[0] += 1
+        cache.set("query", key, key)
+    now[0] += 1
+    cache.get("query", "a")  # "b" is now the least recently used
+    now[0] += 1
+    cache.set("query", "c", "c")
+    assert cache.get("query", "b") is None
+    assert cache.get("query", "a") == "a" and cache.get("query", "c") == "c"
@@ -0,0 +1,42 @@
+import pytest
+
+from extract_and_filter import _split_sentences, first_n_sentences, first_n_sentences_batch
+
+
+@pytest.mark.parametrize("text, expected", [
+    # abbreviations
+    ("Dr. Smith met St. Francis. He left.", ["Dr. Smith met St. Francis.", "He left."]),
+    ("It was 5 vs. 3 in the game. Fans cheered.", ["It was 5 vs. 3 in the game.", "Fans cheered."]),
+    ("See p. 5 for details. Then stop.", ["See p. 5 for details.", "Then stop."]),
+    # initials and dotted acronyms
+    ("J. S. Bach wrote this. He died.", ["J. S. Bach wrote this.", "He died."]),
+    ("John F. Kennedy was shot. He died.", ["John F. Kennedy was shot.", "He died."]),
+    ("The U.S. Congress passed it. It failed.", ["The U.S. Congress passed it.", "It failed."]),
+    # an initial or acronym that really ends the sentence
+    ("Take vitamin C. This helps.", ["Take vitamin C.", "This helps."]),
+    ("He moved to the U.S. He stayed.", ["He moved to the U.S.", "He stayed."]),
+    ("It was in D.C. Later it moved.", ["It was in D.C.", "Later it moved."]),
+    # a lowercase single letter is not an initial
+    ("A &lt; b. C is larger.", ["A &lt; b.", "C is larger."]),
+    # quoted and parenthesised sentence starts; closers stay with their sentence
+    ('He said "Stop." "Why?" she asked.', ['He said "Stop."', '"Why?" she asked.']),
+    ("He left. (Then he came back.) Done.", ["He left.", "(Then he came back.)", "Done."]),
+    # HTML: tags dropped, quote entities and &nbsp; understood, other entities kept
+    ("<b>This man</b> wrote. <i>He</i> died.", ["This man wrote.", "He died."]),
+    ("Tom &amp; Jerry ran. He won.", ["Tom &amp; Jerry ran.", "He won."]),
+    ("It was fine.&quot; He left.", ["It was fine.&quot;", "He left."]),
+    ("The end.&nbsp;Next one.", ["The end.", "Next one."]),
+    ("&ldquo;Go.&rdquo; &ldquo;Now.&rdquo;", ["&ldquo;Go.&rdquo;", "&ldquo;Now.&rdquo;"]),
+    # no split before lowercase, ellipses end a sentence, trailing text is kept
+    ("This is it. and more. Wait... What", ["This is it. and more.", "Wait...", "What"]),
+])
+def test_split_sentences(text, expected):
+    assert _split_sentences(text) == expected
+
+
+def test_first_n_sentences_and_batch():
+    text = "<b>One.</b> Two. Three."
+    assert first_n_sentences(text, 2) == "One. Two."
+    assert first_n_sentences(text, 5) == "One. Two. Three."
+    assert first_n_sentences("", 2) == first_n_sentences(text, 0) == ""
+    assert first_n_sentences_batch([text, None, "A b."], n=1) == ["One.", "", "A b."]
@@ -0,0 +1,133 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from deadline import Deadline, is_partial
+from qbreader_client import QBReaderClient
+from service import PipelineService, _flight_key, create_app, retrieval_params
+from stand_ins import FakeGenai
+
+
+def _questions_twice(stub, first, second):
+    async def run():
+        service = PipelineService(
+            base_url=stub.base_url,
+            client=QBReaderClient(cache=None),
+            gemini_client_factory=lambda: FakeGenai(first_chunk_ms=0, chunk_ms=0),
+        )
+        params = retrieval_params({"query": "x", "sets": stub.set_names[:1], "n": 4})
+        try:
+            results = await asyncio.gather(service.questions(params, first), service.questions(params, second))
+            return service.flights.started, service.flights.coalesced, results
+        finally:
+            await service.aclose()
+
+    return asyncio.run(run())
+
+
+def test_same_request_shares_one_fetch(qbreader_stub, capsys):
+    qbreader_stub.latency_ms = 50
+    assert _questions_twice(qbreader_stub, Deadline(10), Deadline(10))[:2] == (1, 1)
+    assert _questions_twice(qbreader_stub, None, Deadline(None))[:2] == (1, 1)
+
+
+def test_a_short_deadline_only_bounds_its_own_wait(qbreader_stub, capsys):
+    qbreader_stub.latency_ms = 50
+    started, coalesced, (short, long) = _questions_twice(qbreader_stub, Deadline(0.01), Deadline(10))
+    assert (started, coalesced) == (1, 1)
+    assert is_partial(short) and short == []
+    assert not is_partial(long) and len(long) == 4
+
+
+def test_unbounded_trends_stream_completes(qbreader_stub, capsys):
+    # --deadline 0 serves requests with Deadline(None)
+    async def run():
+        service = PipelineService(
+            base_url=qbreader_stub.base_url,
+            client=QBReaderClient(cache=None),
+            gemini_client_factory=lambda: FakeGenai(first_chunk_ms=20, chunk_ms=5),
+        )
+        try:
+            params = retrieval_params({"query": "x", "sets": qbreader_stub.set_names[:1], "n": 4})
+            return await service.trends(params, Deadline(None))
+        finally:
+            await service.aclose()
+
+    result = asyncio.run(run())
+    assert result["partial"] is False and result["trends"]["related_entities"]
+
+
+def _prefetching_service(stub):
+    return PipelineService(
+        base_url=stub.base_url,
+        client=QBReaderClient(cache=None),
+        gemini_client_factory=lambda: FakeGenai(first_chunk_ms=0, chunk_ms=0),
+        prefetch_related=True,
+    )
+
+
+def test_live_request_joins_a_running_prefetch(qbreader_stub, capsys):
+    qbreader_stub.latency_ms = 100
+
+    async def run():
+        service = _prefetching_service(qbreader_stub)
+        try:
+            params = retrieval_params({"query": "related", "sets": qbreader_stub.set_names[:1], "n": 4})
+            assert service.prefetcher.submit(_flight_key("questions", params), params)
+            while service.flights.started == 0:  # wait for the worker to start the fetch
+                await asyncio.sleep(0.005)
+            questions = await service.questions(params, Deadline(10))
+            return questions, service.flights.started, service.flights.coalesced, service.prefetcher.stats
+        finally:
+            await service.aclose()
+
+    questions, started, coalesced, stats = asyncio.run(run())
+    assert len(questions) == 4
+    assert (started, coalesced) == (1, 1)
+    assert stats["cancelled"] == 0
+
+
+def test_live_request_drops_a_queued_prefetch(qbreader_stub, capsys):
+    async def run():
+        service = _prefetching_service(qbreader_stub)
+        try:
+            params = retrieval_params({"query": "related", "sets": qbreader_stub.set_names[:1], "n": 4})
+            async with service.prefetcher.live():  # another live request keeps the job queued
+                assert service.prefetcher.submit(_flight_key("questions", params), params)
+                questions = await service.questions(params, Deadline(10))
+            await service.prefetcher.join()
+            return questions, service.flights.started, service.prefetcher.stats
+        finally:
+            await service.aclose()
+
+    questions, started, stats = asyncio.run(run())
+    assert len(questions) == 4
+    assert started == 1  # the skipped job never fetched
+    assert (stats["cancelled"], stats["completed"]) == (1, 0)
+
+
+def test_malformed_fields_are_rejected_with_400(qbreader_stub, capsys):
+    bad = [
+        ("/questions", {"query": "x", "n": "abc"}),
+        ("/questions", {"query": "x", "n": 4, "sentences": "two"}),
+        ("/questions", {"query": "x", "n": 4, "sentences": [2]}),
+        ("/questions", {"query": "x", "n": 4, "dedupe_threshold": "high"}),
+        ("/questions", {"query": "x", "n": 4, "dedupe_threshold": 5}),
+        ("/sentences", {"texts": ["A b. C d."], "n": "abc"}),
+        ("/sentences", {"texts": ["A b. C d.", 3]}),
+    ]
+
+    async def run():
+        app = create_app(base_url=qbreader_stub.base_url, client=QBReaderClient(cache=None))
+        async with TestClient(TestServer(app)) as http:
+            replies = []
+            for path, body in bad:
+                resp = await http.post(path, json=body)
+                replies.append((resp.status, (await resp.json())["error"]))
+            return replies
+
+    replies = asyncio.run(run())
+    assert [status for status, _ in replies] == [400] * len(bad)
+    assert replies[0][1] == "'n' must be an integer"
+    assert replies[1][1] == "'sentences' must be an integer"
+    assert qbreader_stub.requests == 0  # rejected before anything was fetched
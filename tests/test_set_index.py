@@ -0,0 +1,44 @@
+import json
+import pickle
+
+from extract_and_filter import find_matches
+import set_index
+from set_index import SetNameIndex, get_set_index
+
+SETS = [
+    "2019 ACF Regionals",
+    "2018 ACF Regionals",
+    "2019 HSNCT",
+    "2017 Penn Bowl",
+    "2019 Regionals Mirror",
+]
+
+
+def test_find_matches_is_a_plain_substring_search():
+    assert find_matches(SETS, "regionals") == ["2019 ACF Regionals", "2018 ACF Regionals", "2019 Regionals Mirror"]
+    assert find_matches(SETS, "  ACF Reg ") == ["2019 ACF Regionals", "2018 ACF Regionals"]
+    # no year/level parsing: "2019 regionals" must appear as written
+    assert find_matches(SETS, "2019 regionals") == ["2019 Regionals Mirror"]
+    assert find_matches(SETS, "") == []
+
+
+def test_ranked_search_filters_by_year():
+    assert [m.name for m in SetNameIndex(SETS).search("2019 regionals")] == [
+        "2019 Regionals Mirror", "2019 ACF Regionals",
+    ]
+
+
+def test_index_round_trips_through_json(tmp_path, monkeypatch):
+    monkeypatch.setattr(set_index, "_loaded", {})
+    index = get_set_index(SETS, index_dir=tmp_path)
+    (saved,) = tmp_path.glob("*.json")
+    assert json.loads(saved.read_text(encoding="utf-8"))["names"] == SETS
+    loaded = SetNameIndex.load(saved)
+    assert loaded is not None and loaded.postings == index.postings
+    assert loaded.search("regionls")[0].fuzzy
+
+
+def test_pickles_are_never_loaded(tmp_path):
+    path = tmp_path / "index.json"
+    path.write_bytes(pickle.dumps({"version": 2}))
+    assert SetNameIndex.load(path) is None
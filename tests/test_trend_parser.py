@@ -0,0 +1,44 @@
+from trend_parser import TrendStreamParser
+
+# truncated reply: curly quotes and a raw newline inside a summary, cut off mid-list
+TRUNCATED = (
+    '{"overall_summary": "Clues cite his “miracle year” papers\n'
+    'and the photoelectric effect.", "power_summary": "Early clues: “On the Electrodynamics'
+    ' of Moving Bodies”.", "hard_questions": ["Which 1905 paper?"], '
+    '"related_entities": ["Max Planck", "Niels Bo'
+)
+
+
+def _parse(text, chunk=7):
+    parser = TrendStreamParser()
+    fields = []
+    for i in range(0, len(text), chunk):
+        fields.extend(parser.feed(text[i:i + chunk]))
+    return fields, parser.close()
+
+
+def test_curly_quotes_inside_strings_survive_repair():
+    _, result = _parse(TRUNCATED)
+    assert result["overall_summary"] == (
+        "Clues cite his “miracle year” papers\nand the photoelectric effect."
+    )
+    assert result["power_summary"] == "Early clues: “On the Electrodynamics of Moving Bodies”."
+    assert result["hard_questions"] == ["Which 1905 paper?"]
+    assert result["related_entities"] == ["Max Planck", "Niels Bo"]
+
+
+def test_curly_quotes_as_delimiters_are_repaired():
+    _, result = _parse('{“overall_summary”: “Relativity.”, “related_entities”: [“Bohr”]}')
+    assert result["overall_summary"] == "Relativity."
+    assert result["related_entities"] == ["Bohr"]
+
+
+def test_fields_stream_out_as_they_complete():
+    fields, result = _parse(
+        '```json\n{"overall_summary": "A", "power_summary": "B", '
+        '"hard_questions": ["x", "y",], "related_entities": ["z"]}\n```'
+    )
+    assert [name for name, _ in fields] == [
+        "overall_summary", "power_summary", "hard_questions", "related_entities"
+    ]
+    assert result["hard_questions"] == ["x", "y"]
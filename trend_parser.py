@@ -0,0 +1,233 @@
+"""
+Incremental, repair-tolerant parser for Gemini's trend-extraction JSON.
+
+Expected schema:
+    {"overall_summary": "", "power_summary": "",
+     "hard_questions": ["", "", ""], "related_entities": ["", ...]}
+
+TrendStreamParser is fed text chunks as they stream in and hands back each top-level
+field the moment its value is complete, so the first summary can be shown long before
+generation finishes. close() then repairs whatever is left (code fences, trailing
+commas, raw newlines in strings, an unterminated tail) and fills in missing fields.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+TREND_FIELDS: Dict[str, Any] = {
+    "overall_summary": "",
+    "power_summary": "",
+    "hard_questions": [],
+    "related_entities": [],
+}
+
+_RE_TRAILING_COMMA = re.compile(r",\s*([\]}])")
+_RE_BARE_KEY = re.compile(r"[A-Za-z_][A-Za-z0-9_ ]*")
+
+
+def _scan_value_end(buf: str, pos: int) -> Optional[int]:
+    """
+    Index just past the JSON value starting at buf[pos], or None if the value isn't
+    complete yet. String- and escape-aware; doesn't validate the contents.
+    """
+    ch = buf[pos]
+    if ch == '"':
+        i = pos + 1
+        while i < len(buf):
+            if buf[i] == "\\":
+                i += 2
+                continue
+            if buf[i] == '"':
+                return i + 1
+            i += 1
+        return None
+    if ch in "[{":
+        depth = 0
+        in_str = False
+        i = pos
+        while i < len(buf):
+            c = buf[i]
+            if in_str:
+                if c == "\\":
+                    i += 2
+                    continue
+                if c == '"':
+                    in_str = False
+            elif c == '"':
+                in_str = True
+            elif c in "[{":
+                depth += 1
+            elif c in "]}":
+                depth -= 1
+                if depth == 0:
+                    return i + 1
+            i += 1
+        return None
+    # number / true / false / null: complete once a delimiter shows up
+    for i in range(pos, len(buf)):
+        if buf[i] in ",}\n":
+            return i
+    return None
+
+
+def _repair_strings(text: str) -> Tuple[str, bool, List[str]]:
+    """
+    One pass over `text` that escapes raw newlines/tabs inside strings and turns curly
+    quotes into '"' where they delimit a key or value. Curly quotes inside a string stay
+    as they are (“quoted” text in a summary); a string opened with a curly quote ends at
+    the next quote followed by ":", ",", "]", "}" or the end of the text.
+
+    Returns the repaired text, whether it ends inside a string, and the closers for
+    brackets still open.
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    opener = ""          # the quote that opened the current string; "" outside strings
+    escaped = False
+    for i, c in enumerate(text):
+        if not opener:
+            if c in '"“”':
+                opener = c
+                out.append('"')
+                continue
+            if c in "[{":
+                stack.append("]" if c == "[" else "}")
+            elif c in "]}" and stack:
+                stack.pop()
+            out.append(c)
+            continue
+        if escaped:
+            escaped = False
+        elif c == "\\":
+            escaped = True
+        elif c == '"':
+            opener = ""
+        elif c in "“”" and opener != '"':
+            rest = text[i + 1:].lstrip()
+            if not rest or rest[0] in ":,]}":
+                opener = ""
+                c = '"'
+        elif c in "\n\r\t":
+            c = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}[c]
+        out.append(c)
+    return "".join(out), bool(opener), stack
+
+
+def _loads_lenient(snippet: str) -> Any:
+    """json.loads with the usual LLM-output repairs applied if the strict parse fails."""
+    try:
+        return json.loads(snippet)
+    except json.JSONDecodeError:
+        pass
+    fixed, _, _ = _repair_strings(snippet)
+    return json.loads(_RE_TRAILING_COMMA.sub(r"\1", fixed))
+
+
+def _close_unterminated(text: str) -> str:
+    """Close an unterminated string and any open brackets so a truncated reply parses."""
+    fixed, in_str, stack = _repair_strings(text)
+    tail = ('"' if in_str else "") + "".join(reversed(stack))
+    return _RE_TRAILING_COMMA.sub(r"\1", fixed.rstrip().rstrip(",") + tail)
+
+
+def _coerce(name: str, value: Any) -> Any:
+    """Force known fields into their schema types (string vs list of strings)."""
+    if name not in TREND_FIELDS:
+        return value
+    if isinstance(TREND_FIELDS[name], list):
+        if isinstance(value, list):
+            return [str(v) for v in value]
+        return [str(value)] if value else []
+    if isinstance(value, list):
+        return " ".join(str(v) for v in value)
+    return "" if value is None else str(value)
+
+
+class TrendStreamParser:
+    """
+    Feed streamed text with feed(); each call returns the (field, value) pairs that
+    became complete. close() returns the full, repaired result dict.
+    """
+
+    def __init__(self):
+        self.buf = ""
+        self.pos = -1          # -1 until the opening "{" is found
+        self.key: Optional[str] = None
+        self.fields: Dict[str, Any] = {}
+
+    def _skip(self, chars: str) -> None:
+        while self.pos < len(self.buf) and self.buf[self.pos] in chars:
+            self.pos += 1
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self.buf += chunk or ""
+        done: List[Tuple[str, Any]] = []
+        if self.pos < 0:
+            start = self.buf.find("{")
+            if start < 0:
+                return done
+            self.pos = start + 1
+
+        while True:
+            self._skip(" \t\r\n,")
+            if self.pos >= len(self.buf) or self.buf[self.pos] == "}":
+                return done
+            if self.key is None:
+                # key: "quoted" or a bare word, then ":"
+                if self.buf[self.pos] == '"':
+                    end = _scan_value_end(self.buf, self.pos)
+                    if end is None:
+                        return done
+                    key = _loads_lenient(self.buf[self.pos:end])
+                else:
+                    m = _RE_BARE_KEY.match(self.buf, self.pos)
+                    if not m:
+                        self.pos += 1  # junk between fields
+                        continue
+                    key, end = m.group().strip(), m.end()
+                colon = self.buf.find(":", end)
+                if colon < 0:
+                    return done
+                self.key = str(key)
+                self.pos = colon + 1
+                continue
+
+            self._skip(" \t\r\n")
+            if self.pos >= len(self.buf):
+                return done
+            end = _scan_value_end(self.buf, self.pos)
+            if end is None:
+                return done
+            try:
+                value = _loads_lenient(self.buf[self.pos:end])
+            except json.JSONDecodeError:
+                value = self.buf[self.pos:end].strip().strip('"')
+            value = _coerce(self.key, value)
+            self.fields[self.key] = value
+            done.append((self.key, value))
+            self.key = None
+            self.pos = end
+
+    def close(self) -> Dict[str, Any]:
+        """Repair-parse whatever arrived and return all schema fields (defaults for missing ones)."""
+        if len(self.fields) < len(TREND_FIELDS):
+            start = self.buf.find("{")
+            if start >= 0:
+                text = self.buf[start:]
+                end = text.rfind("}")
+                candidates = [text[:end + 1]] if end >= 0 else []
+                candidates.append(_close_unterminated(text))
+                for candidate in candidates:
+                    try:
+                        parsed = _loads_lenient(candidate)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(parsed, dict):
+                        for k, v in parsed.items():
+                            self.fields.setdefault(k, _coerce(k, v))
+                        break
+        result = {name: self.fields.get(name, default) for name, default in TREND_FIELDS.items()}
+        for k, v in self.fields.items():
+            result.setdefault(k, v)
+        return result